@@ -32,8 +32,22 @@ export "$unlock_env"
 bw sync
 
 # run finance_dl scripts
-# set parallel threads to 1 sine only 1 standalonechrome container
-python -m finance_dl.update --config-module finance_dl_config --log-dir logs update --all --parallelism 1 --force
+# configurations using the standalonechrome container (connect_remote) run one
+# at a time (--remote-slots 1), configurations without a browser run in parallel
+python -m finance_dl.update --config-module finance_dl_config --log-dir logs update --all --parallelism 4 --remote-slots 1 --force
+# with several standalonechrome containers, list each one so that the
+# connect_remote configurations are spread over all of them:
+# ... update --all --parallelism 4 --remote-slots 1 --remote-endpoint http://standalonechrome:4444/wd/hub --remote-endpoint http://standalonechrome2:4444/wd/hub
+
+# alternatively, keep a daemon running with the unlocked vault, which updates
+# configurations as they become due and reloads finance_dl_config.py when it
+# changes (stop with Ctrl+C):
+# python -m finance_dl.update --config-module finance_dl_config --log-dir logs daemon --parallelism 4 --remote-slots 1
+
+# or, to spread the configurations over several hosts that share the logs
+# directory, enqueue them once and run a worker on each host:
+# python -m finance_dl.update --config-module finance_dl_config --log-dir logs enqueue --all
+# python -m finance_dl.update --config-module finance_dl_config --log-dir logs worker --parallelism 4 --exit-when-done
 
 echo "Finished running updates, exiting..."
 exit
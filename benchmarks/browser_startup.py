@@ -0,0 +1,87 @@
+"""Measures the cold-start cost of launching a browser for a scraper.
+
+For each launch profile (and, optionally, a `chrome-headless-shell` binary),
+starts chromedriver and Chrome the same way as `scrape_lib.Scraper` and
+reports the median of each startup phase over several runs:
+
+- spawn: starting the chromedriver process until it accepts connections;
+- session: creating the WebDriver session, which launches Chrome;
+- navigate: loading the first page.
+
+Usage:
+
+    python benchmarks/browser_startup.py --runs 5 \\
+        --headless-shell /path/to/chrome-headless-shell
+"""
+
+import argparse
+import statistics
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+from finance_dl import chromedriver_log
+from finance_dl import scrape_lib
+
+
+def measure_startup(chromedriver_bin, chrome_options, url):
+    times = {}
+    start_time = time.time()
+    service = Service(
+        chromedriver_bin,
+        service_args=chromedriver_log.get_service_args())
+    service.start()
+    try:
+        times['spawn'] = time.time() - start_time
+        start_time = time.time()
+        driver = webdriver.Remote(
+            service.service_url,
+            desired_capabilities=chrome_options.to_capabilities())
+        try:
+            times['session'] = time.time() - start_time
+            start_time = time.time()
+            driver.get(url)
+            times['navigate'] = time.time() - start_time
+        finally:
+            driver.quit()
+    finally:
+        service.stop()
+    return times
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--runs', type=int, default=5)
+    ap.add_argument('--url', default='about:blank')
+    ap.add_argument('--chromedriver-bin',
+                    default='finance-dl-chromedriver-wrapper')
+    ap.add_argument('--headless-shell',
+                    help='Path to a chrome-headless-shell binary to compare.')
+    args = ap.parse_args()
+
+    variants = [(profile, None) for profile in sorted(scrape_lib.LAUNCH_PROFILES)]
+    if args.headless_shell:
+        variants.append(('lean', args.headless_shell))
+    for launch_profile, headless_shell in variants:
+        chrome_options = scrape_lib.get_chrome_options(
+            launch_profile=launch_profile,
+            headless_shell_binary=headless_shell or '')
+        runs = [
+            measure_startup(args.chromedriver_bin, chrome_options, args.url)
+            for _ in range(args.runs)
+        ]
+        phases = ['spawn', 'session', 'navigate']
+        medians = {
+            phase: statistics.median(r[phase] for r in runs)
+            for phase in phases
+        }
+        name = launch_profile + (' + headless-shell' if headless_shell else '')
+        print('%-24s ' % name +
+              ' '.join('%s %6.3fs' % (phase, medians[phase])
+                       for phase in phases) +
+              ' total %6.3fs' % sum(medians.values()))
+
+
+if __name__ == '__main__':
+    main()
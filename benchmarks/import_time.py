@@ -0,0 +1,106 @@
+"""Measures the import time of each `finance_dl` module.
+
+Imports each module in a fresh interpreter with `python -X importtime`, and
+reports the median cumulative import time of the module over several runs,
+together with its most expensive direct dependencies in the last run.
+
+Usage:
+
+    python benchmarks/import_time.py --runs 3 --top 3 \\
+        finance_dl.cli finance_dl.gemini finance_dl.amazon
+
+With no module names, all modules of `finance_dl` are measured.
+"""
+
+import argparse
+import os
+import pkgutil
+import statistics
+import subprocess
+import sys
+from typing import List, NamedTuple
+
+import finance_dl
+
+
+class ImportRecord(NamedTuple):
+    name: str
+    depth: int
+    cumulative_us: int
+
+
+def parse_importtime(stderr: str) -> List[ImportRecord]:
+    """Parses the `-X importtime` output, in which children precede parents."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2][1:]
+        stripped = name.lstrip(' ')
+        records.append(
+            ImportRecord(name=stripped, depth=(len(name) - len(stripped)) // 2,
+                         cumulative_us=int(fields[1])))
+    return records
+
+
+def get_direct_dependencies(records: List[ImportRecord],
+                            index: int) -> List[ImportRecord]:
+    depth = records[index].depth
+    children = []
+    for record in reversed(records[:index]):
+        if record.depth <= depth:
+            break
+        if record.depth == depth + 1:
+            children.append(record)
+    return children
+
+
+def measure(module_name: str):
+    """Returns `(cumulative_us, dependencies)` of importing `module_name`."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module_name],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    records = parse_importtime(result.stderr)
+    for index, record in enumerate(records):
+        if record.name == module_name:
+            return record.cumulative_us, get_direct_dependencies(
+                records, index)
+    raise RuntimeError('No import time reported for %s' % module_name)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('modules', nargs='*')
+    ap.add_argument('--runs', type=int, default=3)
+    ap.add_argument('--top', type=int, default=3,
+                    help='Number of most expensive dependencies to show.')
+    args = ap.parse_args()
+    modules = args.modules or [
+        'finance_dl.' + info.name
+        for info in pkgutil.iter_modules(finance_dl.__path__)
+    ]
+    width = max(len(name) for name in modules)
+    for module_name in modules:
+        try:
+            times = []
+            for _ in range(args.runs):
+                cumulative_us, dependencies = measure(module_name)
+                times.append(cumulative_us)
+        except RuntimeError as e:
+            print('%-*s  failed: %s' % (width, module_name, e))
+            continue
+        dependencies.sort(key=lambda record: -record.cumulative_us)
+        print('%-*s %8.1f ms  %s' % (
+            width, module_name, statistics.median(times) / 1000, ', '.join(
+                '%s %.1f ms' % (record.name, record.cumulative_us / 1000)
+                for record in dependencies[:args.top])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Compares page loads under each resource policy preset.
+
+Loads each URL in a fresh headless Chrome session per policy and reports the
+page-load time, the bytes transferred and the number of resources loaded, as
+well as the bytes and time saved relative to the `'none'` policy.  Use this to
+check which policy a site tolerates before setting `resource_policy` in its
+configuration.
+
+Usage:
+
+    python benchmarks/resource_policy.py https://www.example.com/
+"""
+
+import argparse
+
+from finance_dl import resource_policy
+from finance_dl import scrape_lib
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('urls', nargs='+')
+    ap.add_argument('--policy', action='append',
+                    choices=list(resource_policy.PRESETS),
+                    help='Policies to compare (default: all presets).')
+    args = ap.parse_args()
+    policies = args.policy or list(resource_policy.PRESETS)
+    if 'none' not in policies:
+        policies.insert(0, 'none')
+
+    for url in args.urls:
+        print(url)
+        baseline = None
+        for policy in policies:
+            with scrape_lib.temp_scraper(scrape_lib.Scraper,
+                                         resource_policy=policy) as scraper:
+                scraper.driver.get(url)
+                record = scraper.record_page_load()
+            if baseline is None:
+                baseline = record
+            print('  %12s: %7.2fs %10d bytes %5d resources '
+                  '(saved %7.2fs, %10d bytes)' %
+                  (policy, record.duration, record.transfer_size,
+                   record.num_resources, baseline.duration - record.duration,
+                   baseline.transfer_size - record.transfer_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Benchmarks `scrape_lib.extract_table_data` against per-cell extraction.
+
+Renders a synthetic table in headless Chrome and extracts it once with a single
+`execute_script` call and once by querying each row and cell individually,
+reporting the number of WebDriver round trips and the elapsed time of each, and
+checking that both produce identical output.
+
+Usage:
+
+    python benchmarks/table_extraction.py --rows 300
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from finance_dl import scrape_lib
+
+HEADERS = ['Date', 'Description', 'Amount', 'Balance']
+
+
+def write_table_html(path, num_rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<html><body><table><thead><tr>')
+        f.write(''.join('<th>%s</th>' % h for h in HEADERS))
+        f.write('</tr></thead><tbody>')
+        for i in range(num_rows):
+            f.write('<tr><td>2020-01-%02d</td><td>Item&nbsp;%d</td>'
+                    '<td colspan="2">$%d.00</td></tr>' % (i % 28 + 1, i, i))
+        f.write('</tbody></table></body></html>')
+
+
+def count_round_trips(driver, func):
+    executor = driver.command_executor
+    original_execute = executor.execute
+    num_calls = 0
+
+    def execute(*args, **kwargs):
+        nonlocal num_calls
+        num_calls += 1
+        return original_execute(*args, **kwargs)
+
+    executor.execute = execute
+    try:
+        start_time = time.time()
+        result = func()
+        return result, num_calls, time.time() - start_time
+    finally:
+        executor.execute = original_execute
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rows', type=int, default=300)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        html_path = os.path.join(temp_dir, 'table.html')
+        write_table_html(html_path, args.rows)
+        with scrape_lib.temp_scraper(scrape_lib.Scraper) as scraper:
+            scraper.driver.get('file://' + html_path)
+            table = scraper.driver.find_element(scrape_lib.By.TAG_NAME, 'table')
+            results = {}
+            for name, get_rows in [
+                ('script', scrape_lib.get_table_rows),
+                ('per-element', scrape_lib.get_table_rows_by_element),
+            ]:
+                data, num_calls, duration = count_round_trips(
+                    scraper.driver, lambda: scrape_lib.extract_table_data(
+                        table, HEADERS, get_rows=get_rows))
+                results[name] = data
+                print('%12s: %6d round trips, %7.3fs' % (name, num_calls,
+                                                        duration))
+            if results['script'] != results['per-element']:
+                raise RuntimeError('Extraction methods produced different output')
+            print('Outputs match (%d rows)' % len(results['script']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Measures the per-configuration overhead of `update --worker-pool`.
+
+Runs a number of configurations whose module only imports the given modules
+(by default, the dependencies of the browser-based scrapers), first each in a
+new `finance_dl.cli` process as `update` does by default, and then in a
+`worker_pool.WorkerPool`, and reports the median and total time per
+configuration in each mode.  Since the configurations do no work, the times
+are the overhead of starting a configuration.
+
+Usage:
+
+    python benchmarks/worker_overhead.py --configs 10 \\
+        --imports finance_dl.amazon finance_dl.ofx
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from finance_dl import process_runner
+from finance_dl import worker_pool
+
+DEFAULT_IMPORTS = [
+    'selenium.webdriver', 'seleniumrequests', 'bs4', 'dateutil.parser',
+    'finance_dl.scrape_lib'
+]
+
+NOOP_MODULE = '''
+import importlib
+def run(imports, **kwargs):
+    for name in imports:
+        importlib.import_module(name)
+'''
+
+
+def write_modules(directory, num_configs, imports):
+    with open(os.path.join(directory, 'bench_noop.py'), 'w') as f:
+        f.write(NOOP_MODULE)
+    with open(os.path.join(directory, 'bench_config.py'), 'w') as f:
+        for i in range(num_configs):
+            f.write('def CONFIG_%d():\n    return dict(module=%r, imports=%r)\n'
+                    % (i, 'bench_noop', imports))
+
+
+async def measure_subprocess(num_configs, env):
+    times = []
+    for i in range(num_configs):
+        start_time = time.time()
+        result = await process_runner.run_process([
+            sys.executable, '-m', 'finance_dl.cli', '--config-module',
+            'bench_config', '-c', str(i)
+        ], lambda line: print(line, end=''), env=env)
+        assert result.return_code == 0
+        times.append(time.time() - start_time)
+    return times
+
+
+async def measure_worker_pool(num_configs, env):
+    pool = worker_pool.WorkerPool('bench_config', preload=['bench_noop'],
+                                  env=env)
+    times = []
+    try:
+        for i in range(num_configs):
+            start_time = time.time()
+            result = await pool.run(str(i), lambda line: print(line, end=''))
+            assert result.return_code == 0
+            times.append(time.time() - start_time)
+    finally:
+        await pool.close()
+    return times
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--configs', type=int, default=10)
+    ap.add_argument('--imports', nargs='*', default=DEFAULT_IMPORTS)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_modules(directory, args.configs, args.imports)
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [directory] + sys.path[1:])
+        for name, func in [('subprocess', measure_subprocess),
+                           ('worker-pool', measure_worker_pool)]:
+            times = asyncio.run(func(args.configs, env))
+            print('%-12s first %.3fs  median %.3fs  total %.2fs' %
+                  (name, times[0], statistics.median(times), sum(times)))
+
+
+if __name__ == '__main__':
+    main()
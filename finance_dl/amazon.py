@@ -50,6 +50,18 @@ The following keys may be specified as part of the configuration dict:
   yet; they get replaced with invoices containing the correct information when
   the order is actually fulfilled.
 
+- `resource_policy`: Optional.  Specifies which resources the browser loads,
+  as described in `finance_dl/resource_policy.py`.  Defaults to `'none'`.
+  Since only the text of the invoices is saved, `'lean'`, which blocks images,
+  fonts, media and trackers, may speed up runs; however, the captcha and
+  two-step verification pages shown at login rely on images, so it is only
+  suitable for configurations with a `profile_dir` that stays logged in.
+
+- `time_budget`: Optional.  If specified, the number of seconds after which
+  to stop before the next order group or invoice, leaving the remaining ones
+  to the next run, as described in `finance_dl/time_budget.py`.  Order groups
+  already listed are kept in the checkpoint and not paged through again.
+
 Output format:
 ==============
 
@@ -87,6 +99,7 @@ import re
 import logging
 import os
 import datetime
+import time
 import dateutil.parser
 import bs4
 from selenium.webdriver.common.by import By
@@ -291,15 +304,13 @@ class Scraper(scrape_lib.Scraper):
             return
 
         logger.info('Looking for sign-in link')
-        sign_in_links, = self.wait_and_return(
-            lambda: self.find_visible_elements_by_descendant_partial_text(self.domain.sign_in, 'a')
-        )
+        sign_in_links = self.wait_for_visible(
+            By.XPATH, "//text()[contains(.,%r)]/ancestor::*[self::a][1]" %
+            self.domain.sign_in)
 
         self.click(sign_in_links[0])
         logger.info('Looking for username link')
-        (username, ), = self.wait_and_return(
-            lambda: self.find_visible_elements(By.XPATH, '//input[@type="email"]')
-        )
+        (username, ) = self.wait_for_visible(By.XPATH, '//input[@type="email"]')
         username.send_keys(self.credentials['username'])
         username.send_keys(Keys.ENTER)
 
@@ -307,15 +318,11 @@ class Scraper(scrape_lib.Scraper):
 
     def finish_login(self):
         logger.info('Looking for password link')
-        (password, ), = self.wait_and_return(
-            lambda: self.find_visible_elements(By.XPATH, '//input[@type="password"]')
-        )
+        (password, ) = self.wait_for_visible(By.XPATH, '//input[@type="password"]')
         password.send_keys(self.credentials['password'])
 
         logger.info('Looking for "remember me" checkbox')
-        (rememberMe, ) = self.wait_and_return(
-            lambda: self.find_visible_elements(By.XPATH, '//input[@name="rememberMe"]')[0]
-        )
+        rememberMe = self.wait_for_visible(By.XPATH, '//input[@name="rememberMe"]')[0]
         rememberMe.click()
 
         with self.wait_for_page_load():
@@ -351,7 +358,17 @@ class Scraper(scrape_lib.Scraper):
             if name.endswith('.html')
         ])
 
+        def add_invoice_hrefs(group_hrefs):
+            for href, order_id in group_hrefs:
+                if order_id in order_ids_seen:
+                    logger.info('Skipping already-seen order id: %r', order_id)
+                    continue
+                invoice_hrefs.append((href, order_id))
+                order_ids_seen.add(order_id)
+
         def get_invoice_urls():
+            group_hrefs = []
+            group_order_ids = set()
             initial_iteration = True
             while True:
                 # break when there is no "next page"
@@ -444,15 +461,14 @@ class Scraper(scrape_lib.Scraper):
                     else:
                         (order_id, href) = invoice_link_finder_hidden(invoice_link)
                     if order_id:
-                        if order_id in order_ids_seen:
-                            logger.info('Skipping already-seen order id: %r', order_id)
+                        if order_id in group_order_ids:
                             continue
                         if order_id in order_ids_downloaded:
                             logger.info('Skipping already-downloaded invoice: %r', order_id)
                             continue
                         logger.info('Found order \'{}\''.format(order_id))
-                        invoice_hrefs.append((href, order_id))
-                        order_ids_seen.add(order_id)
+                        group_hrefs.append((href, order_id))
+                        group_order_ids.add(order_id)
 
                 # Find next link
                 next_links = self.find_elements_by_descendant_text_match(
@@ -465,14 +481,19 @@ class Scraper(scrape_lib.Scraper):
                 with self.wait_for_page_load():
                     logging.info("Next page.")
                     next_links[0].click()
+            return group_hrefs
+
+        def is_listed_order_group(option_text):
+            if option_text == self.domain.archived_orders:
+                return False
+            return self.order_groups is None or option_text in self.order_groups
 
-        def retrieve_all_order_groups():
+        def retrieve_all_order_groups(menu):
             order_select_index = 0
 
             while True:
-                (order_filter,), = self.wait_and_return(
-                    lambda: self.find_visible_elements(By.XPATH, '//select[@name="timeFilter"]')
-                )
+                (order_filter,) = self.wait_for_visible(
+                    By.XPATH, '//select[@name="timeFilter"]')
                 order_select = Select(order_filter)
                 num_options = len(order_select.options)
                 if order_select_index >= num_options:
@@ -481,42 +502,67 @@ class Scraper(scrape_lib.Scraper):
                     order_select_index]
                 option_text = option.text.strip()
                 order_select_index += 1
-                if option_text == self.domain.archived_orders:
-                    continue
-                if self.order_groups is not None and option_text not in self.order_groups:
-                    logger.info('Skipping order group: %r', option_text)
+                if not is_listed_order_group(option_text):
+                    if option_text != self.domain.archived_orders:
+                        logger.info('Skipping order group: %r', option_text)
                     continue
-                logger.info('Retrieving order group: %r', option_text)
-                if not option.is_selected():
-                    with self.wait_for_page_load():
-                        order_select.select_by_index(order_select_index - 1)
-                get_invoice_urls()
-
-        if regular:
-            # on co.uk, orders link is hidden behind the menu, hence not directly clickable
-            (orders_link,), = self.wait_and_return(
-                lambda: self.find_elements_by_descendant_text_match(f'. = "{self.domain.your_orders}"', 'a', only_displayed=False)
-            )
-            link = orders_link.get_attribute('href')
-            scrape_lib.retry(lambda: self.driver.get(link), retry_delay=2)
-
-            retrieve_all_order_groups()
+                unit = '%s:%s' % (menu, option_text)
+                if not self.checkpoint.is_done('amazon.order_group', unit):
+                    if self.time_budget.is_exhausted():
+                        self.time_budget.check(
+                            1 + sum(1 for later_option in
+                                    order_select.options[order_select_index:]
+                                    if is_listed_order_group(
+                                        later_option.text.strip())),
+                            'order groups')
+                    logger.info('Retrieving order group: %r', option_text)
+                    if not option.is_selected():
+                        with self.wait_for_page_load():
+                            order_select.select_by_index(order_select_index - 1)
+                # Record each order group separately, so that a run stopped
+                # by its time budget keeps the groups already listed.
+                add_invoice_hrefs(
+                    self.checkpoint.run_step('amazon.order_group',
+                                             get_invoice_urls, unit=unit))
+
+        def find_all_invoices():
+            if regular:
+                # on co.uk, orders link is hidden behind the menu, hence not directly clickable
+                (orders_link,), = self.wait_and_return(
+                    lambda: self.find_elements_by_descendant_text_match(f'. = "{self.domain.your_orders}"', 'a', only_displayed=False)
+                )
+                link = orders_link.get_attribute('href')
+                scrape_lib.retry(lambda: self.driver.get(link), retry_delay=2)
 
-        if digital_orders_menu:
-            # orders in separate Digital Orders list (relevant for .COM)
-            # other domains list digital orders within the regular order list
-            (digital_orders_link,), = self.wait_and_return(
-                lambda: self.find_elements_by_descendant_text_match(
-                    f'contains(., "{self.domain.digital_orders_menu_text}")', 'a', only_displayed=True)
-            )
-            scrape_lib.retry(lambda: self.click(digital_orders_link),
-                             retry_delay=2)
-            retrieve_all_order_groups()
+                retrieve_all_order_groups('regular')
 
+            if digital_orders_menu:
+                # orders in separate Digital Orders list (relevant for .COM)
+                # other domains list digital orders within the regular order list
+                (digital_orders_link,), = self.wait_and_return(
+                    lambda: self.find_elements_by_descendant_text_match(
+                        f'contains(., "{self.domain.digital_orders_menu_text}")', 'a', only_displayed=True)
+                )
+                scrape_lib.retry(lambda: self.click(digital_orders_link),
+                                 retry_delay=2)
+                retrieve_all_order_groups('digital')
+            return invoice_hrefs
+
+        # Paging through all order groups is slow, so if a retry is needed,
+        # reuse the invoice list found by the failed attempt.
+        invoice_hrefs = self.checkpoint.run_step('amazon.invoice_hrefs',
+                                                 find_all_invoices)
+        self.checkpoint.plan('amazon.invoice',
+                             [order_id for _, order_id in invoice_hrefs])
         self.retrieve_invoices(invoice_hrefs)
 
     def retrieve_invoices(self, invoice_hrefs):
-        for href, order_id in invoice_hrefs:
+        pending = [(href, order_id) for href, order_id in invoice_hrefs
+                   if not self.checkpoint.is_done('amazon.invoice', order_id)]
+        for i, (href, order_id) in enumerate(pending):
+            self.time_budget.check(len(pending) - i, 'invoices')
+            self.checkpoint.start('amazon.invoice', order_id)
+            start_time = time.time()
             logger.info('Downloading invoice for order %r', order_id)
             with self.wait_for_page_load():
                 self.driver.get(href)
@@ -602,6 +648,8 @@ class Scraper(scrape_lib.Scraper):
                 # Write with Unicode Byte Order Mark to ensure content will be properly interpreted as UTF-8
                 f.write('\ufeff' + page_source)
             logger.info('  Wrote %s', invoice_path)
+            self.checkpoint.mark_done('amazon.invoice', order_id,
+                                      duration=time.time() - start_time)
 
     def run(self):
         self.login()
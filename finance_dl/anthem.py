@@ -90,10 +90,10 @@ from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.keys import Keys
 from selenium.common.exceptions import NoSuchElementException
 import bs4
-import jsonschema
 from atomicwrites import atomic_write
 
 from . import scrape_lib
+from . import http_client
 from . import google_login
 
 logger = logging.getLogger('anthem')
@@ -103,7 +103,7 @@ netloc_re = r'^([^\.@]+\.)*anthem.com$'
 
 class Scraper(scrape_lib.Scraper):
     def __init__(self, login_url: str, output_directory: str, **kwargs):
-        super().__init__(use_seleniumrequests=True, **kwargs)
+        super().__init__(**kwargs)
         self.login_url = login_url
         self.output_directory = output_directory
 
@@ -145,12 +145,10 @@ class Scraper(scrape_lib.Scraper):
             if not os.path.exists(pdf_path):
                 if not claim['eobLinkUrl'].startswith('https:/'): continue
                 downloads_needed.append((claim['eobLinkUrl'], pdf_path))
-        for i, (url, pdf_path) in enumerate(downloads_needed):
-            logger.info('Downloading EOB %d/%d', i + 1, len(downloads_needed))
-            self.driver.get(url)
-            download_result, = self.wait_and_return(self.get_downloaded_file)
-            with atomic_write(pdf_path, mode='wb', overwrite=True) as f:
-                f.write(download_result[1])
+        logger.info('Downloading %d EOBs', len(downloads_needed))
+        http_client.fetch_all(self.get_http_session(), downloads_needed,
+                              max_workers=self.max_http_connections,
+                              magic=http_client.PDF_MAGIC)
 
     def run(self):
         self.login()
@@ -0,0 +1,210 @@
+"""Plans and runs historical backfills of date-windowed sources concurrently.
+
+A first-time sync of a source that serves data by date range is normally a
+sequence of requests, each limited to the number of days the source returns
+at once.  Instead, `plan_windows` splits the whole range into windows of that
+size up front, and `run_backfill` fetches the windows concurrently, subject to
+a minimum interval between requests to the same source.  Each window is saved
+in the usual on-disk layout of the source by the `fetch` function of its
+module, so the result is the same as for a sequential sync.
+
+Completed windows are recorded in a `Ledger` file next to the data.  Windows
+of a backfill that was interrupted are fetched by the next run, even if later
+windows completed, and completed windows are not fetched again.  A window for
+which the source returned no data is tried again by later runs, up to
+`DEFAULT_MAX_ATTEMPTS` times in total, after which it is no longer pending.
+
+Used by `finance_dl.ofx` and `finance_dl.schwab` when the `backfill_window_days`
+configuration key is specified.
+"""
+
+from typing import Callable, Dict, List, NamedTuple, Optional
+import concurrent.futures
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+from atomicwrites import atomic_write
+
+logger = logging.getLogger('backfill')
+
+# Name of the ledger file within the output directory of an account.
+LEDGER_NAME = '.backfill.json'
+
+DEFAULT_PARALLELISM = 4
+
+# Number of fetches of a window that returned no data after which the window
+# is given up on.
+DEFAULT_MAX_ATTEMPTS = 3
+
+_DATE_FORMAT = '%Y-%m-%d'
+
+
+class Window(NamedTuple):
+    # Both inclusive.
+    start: datetime.date
+    end: datetime.date
+
+
+def plan_windows(start: datetime.date, end: datetime.date, window_days: int,
+                 overlap_days: int = 0) -> List[Window]:
+    """Splits `[start, end]` into windows of at most `window_days` days.
+
+    Consecutive windows overlap by `overlap_days` days.
+    """
+    if window_days <= overlap_days:
+        raise ValueError('window_days must be greater than overlap_days')
+    windows = []
+    while start <= end:
+        window_end = min(end, start + datetime.timedelta(days=window_days - 1))
+        windows.append(Window(start, window_end))
+        if window_end == end:
+            break
+        start = window_end + datetime.timedelta(days=1 - overlap_days)
+    return windows
+
+
+class Ledger(object):
+    """Records the planned windows of a backfill and which have completed.
+
+    :param max_attempts: Number of fetches that returned no data after which a
+        window is no longer pending.
+    """
+
+    def __init__(self, path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Maps each planned window to whether it completed.
+        self.windows: Dict[Window, bool] = {}
+        # Maps windows to the number of fetches that returned no data.
+        self.attempts: Dict[Window, int] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for entry in json.load(f)['windows']:
+                    window = Window(
+                        datetime.datetime.strptime(entry['start'],
+                                                   _DATE_FORMAT).date(),
+                        datetime.datetime.strptime(entry['end'],
+                                                   _DATE_FORMAT).date())
+                    self.windows[window] = entry['done']
+                    self.attempts[window] = entry.get('attempts', 0)
+
+    def _save(self):
+        entries = [
+            dict(start=window.start.strftime(_DATE_FORMAT),
+                 end=window.end.strftime(_DATE_FORMAT), done=done,
+                 attempts=self.attempts.get(window, 0))
+            for window, done in sorted(self.windows.items())
+        ]
+        with atomic_write(self.path, mode='w', encoding='utf-8',
+                          overwrite=True) as f:
+            json.dump(dict(windows=entries), f, indent=1)
+
+    def add(self, windows: List[Window]):
+        """Plans `windows`, unless already recorded."""
+        with self._lock:
+            for window in windows:
+                self.windows.setdefault(window, False)
+            self._save()
+
+    def get_pending(self) -> List[Window]:
+        with self._lock:
+            return sorted(
+                window for window, done in self.windows.items()
+                if not done and
+                self.attempts.get(window, 0) < self.max_attempts)
+
+    def mark_done(self, window: Window):
+        with self._lock:
+            self.windows[window] = True
+            self._save()
+
+    def mark_no_data(self, window: Window) -> int:
+        """Records a fetch of `window` that returned no data.
+
+        :return: The number of such fetches.
+        """
+        with self._lock:
+            self.attempts[window] = self.attempts.get(window, 0) + 1
+            self._save()
+            return self.attempts[window]
+
+
+class RateLimiter(object):
+    """Spaces the starts of requests at least `min_interval` seconds apart."""
+
+    def __init__(self, min_interval: float = 0.0):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.time()
+            delay = max(0.0, self._next_time - now)
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def run_backfill(ledger: Ledger, windows: List[Window],
+                 fetch: Callable[[Window], bool],
+                 parallelism: int = DEFAULT_PARALLELISM,
+                 min_interval: float = 0.0,
+                 should_stop: Optional[Callable[[], bool]] = None) -> int:
+    """Fetches `windows` and any pending windows of `ledger` concurrently.
+
+    :param fetch: Fetches and saves a window, returning `False` if the source
+        returned no data or only part of the window, in which case it is tried
+        again by the next backfill, up to `ledger.max_attempts` times.
+    :param parallelism: Maximum number of windows to fetch at once.
+    :param min_interval: Minimum time in seconds between starting fetches.
+    :param should_stop: Optional function called before starting each window,
+        which stops the backfill, leaving the remaining windows pending, if it
+        returns `True`.
+    :return: The number of windows that completed.
+    :raises: The first exception raised by `fetch`, after all other windows
+        have finished.
+    """
+    ledger.add(windows)
+    pending = ledger.get_pending()
+    if not pending:
+        return 0
+    logger.info('Backfilling %d windows from %s to %s, %d at a time',
+                len(pending), pending[0].start, pending[-1].end, parallelism)
+    limiter = RateLimiter(min_interval)
+    start_time = time.time()
+
+    def run_window(window: Window) -> bool:
+        if should_stop is not None and should_stop():
+            return False
+        limiter.wait()
+        if not fetch(window):
+            num_attempts = ledger.mark_no_data(window)
+            if num_attempts >= ledger.max_attempts:
+                logger.warning(
+                    'No data for window %s -- %s after %d attempts; giving up',
+                    window.start, window.end, num_attempts)
+            else:
+                logger.warning('No data for window %s -- %s', window.start,
+                               window.end)
+            return False
+        ledger.mark_done(window)
+        return True
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, parallelism)) as executor:
+        futures = [executor.submit(run_window, window) for window in pending]
+        concurrent.futures.wait(futures)
+    num_completed = sum(
+        1 for future in futures
+        if future.exception() is None and future.result())
+    logger.info('Backfilled %d of %d windows in %.1fs', num_completed,
+                len(pending), time.time() - start_time)
+    for future in futures:
+        future.result()
+    return num_completed
@@ -0,0 +1,278 @@
+"""Pool of pre-launched Chrome sessions shared across configurations.
+
+Starting chromedriver and Chrome, and shutting them down again, is a large
+fixed cost paid by every browser-based configuration.  When `finance_dl.update`
+is run with `--browser-pool N`, it launches `N` headless Chrome sessions up
+front and leases one to each configuration subprocess it starts.  The
+subprocess attaches to the leased session (see
+`scrape_lib.POOLED_SESSION_ENV_VAR`) instead of launching its own browser.
+
+When a lease is released, the session is reset so that no state of one
+configuration carries over to the next: its tabs are replaced by a new blank
+tab, which starts with empty session storage, all site data (local storage,
+IndexedDB, service workers, cache storage and cookies) of the origins visited
+is cleared, along with all cookies and the HTTP cache, and the download
+directory is emptied.  The origins visited are those in the navigation history
+of the open tabs and those of the cookies set; data of an origin only loaded in
+a frame, or in a tab that was already closed, is not cleared unless it also
+set a cookie.  A session that no longer responds, or cannot be reset, is
+replaced by a freshly launched one.
+
+Configurations that require a dedicated browser (a `profile_dir`, a visible
+browser, a remote webdriver, extra chromedriver arguments or network request
+capture) ignore the leased session and launch their own browser as before.
+"""
+
+from typing import List, Optional, Set
+import asyncio
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from . import scrape_lib
+
+logger = logging.getLogger('browser_pool')
+
+
+def get_visited_origins(driver) -> Set[str]:
+    """Returns the web origins visited by the open tabs or with cookies."""
+    origins = set()
+    for handle in driver.window_handles:
+        driver.switch_to.window(handle)
+        history = scrape_lib.execute_cdp_cmd(driver, 'Page.getNavigationHistory')
+        for entry in history['entries']:
+            url = urllib.parse.urlsplit(entry['url'])
+            if url.scheme in ('http', 'https') and url.netloc:
+                origins.add('%s://%s' % (url.scheme, url.netloc))
+    cookies = scrape_lib.execute_cdp_cmd(driver, 'Network.getAllCookies')
+    for cookie in cookies['cookies']:
+        domain = cookie['domain'].lstrip('.')
+        origins.add('https://' + domain)
+        origins.add('http://' + domain)
+    return origins
+
+
+class PooledSession(object):
+    def __init__(self, scraper: scrape_lib.Scraper, download_dir: str):
+        self.scraper = scraper
+        self.download_dir = download_dir
+        self.num_leases = 0
+
+    @property
+    def driver(self):
+        return self.scraper.driver
+
+    def environ(self) -> dict:
+        """Returns the environment variables that hand this session to a child."""
+        return {
+            scrape_lib.POOLED_SESSION_ENV_VAR:
+            '%s %s' % (self.driver.command_executor._url,
+                       self.driver.session_id)
+        }
+
+    def is_alive(self) -> bool:
+        try:
+            self.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def reset(self):
+        driver = self.driver
+        origins = get_visited_origins(driver)
+        handles = driver.window_handles
+        scrape_lib.execute_cdp_cmd(driver, 'Target.createTarget',
+                                   {'url': 'about:blank'})
+        new_handles = set(driver.window_handles) - set(handles)
+        if len(new_handles) != 1:
+            raise RuntimeError('Failed to open a new tab')
+        for handle in handles:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(new_handles.pop())
+        for origin in sorted(origins):
+            scrape_lib.execute_cdp_cmd(driver, 'Storage.clearDataForOrigin', {
+                'origin': origin,
+                'storageTypes': 'all'
+            })
+        scrape_lib.execute_cdp_cmd(driver, 'Network.clearBrowserCookies')
+        scrape_lib.execute_cdp_cmd(driver, 'Network.clearBrowserCache')
+        scrape_lib.execute_cdp_cmd(driver, 'Browser.setDownloadBehavior', {
+            'behavior': 'allow',
+            'downloadPath': self.download_dir
+        })
+        for name in os.listdir(self.download_dir):
+            path = os.path.join(self.download_dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning('Error quitting pooled browser: %r', e)
+        shutil.rmtree(self.download_dir, ignore_errors=True)
+
+
+class BrowserPool(object):
+    def __init__(self, size: int,
+                 chromedriver_bin: str = 'finance-dl-chromedriver-wrapper'):
+        self.size = size
+        self.chromedriver_bin = chromedriver_bin
+        self._available: List[PooledSession] = []
+        self._num_sessions = 0
+        self._condition = threading.Condition()
+        self._closed = False
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _launch(self) -> PooledSession:
+        download_dir = tempfile.mkdtemp()
+        start_time = time.time()
+        scraper = scrape_lib.Scraper(download_dir=download_dir,
+                                     chromedriver_bin=self.chromedriver_bin,
+                                     headless=True)
+        # Pre-warm the renderer so that the first real navigation is fast.
+        scraper.driver.get('about:blank')
+        logger.info('Launched pooled browser in %.1fs',
+                    time.time() - start_time)
+        return PooledSession(scraper, download_dir)
+
+    def start(self):
+        """Launches all of the sessions in the pool concurrently."""
+        sessions: List[PooledSession] = []
+        errors = []
+
+        def launch():
+            try:
+                session = self._launch()
+            except Exception as e:
+                errors.append(e)
+                return
+            with self._condition:
+                sessions.append(session)
+
+        threads = [threading.Thread(target=launch) for _ in range(self.size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self._condition:
+            self._available.extend(sessions)
+            self._num_sessions += len(sessions)
+            self._condition.notify_all()
+        for e in errors:
+            logger.warning('Failed to launch pooled browser: %r', e)
+        if not sessions:
+            raise RuntimeError('Failed to launch any pooled browser')
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            sessions = list(self._available)
+            self._available.clear()
+        for session in sessions:
+            session.quit()
+
+    def _acquire(self) -> Optional[PooledSession]:
+        start_time = time.time()
+        with self._condition:
+            while not self._available and self._num_sessions > 0:
+                if self._closed:
+                    raise RuntimeError('Browser pool is closed')
+                self._condition.wait()
+            wait_time = time.time() - start_time
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            if not self._available:
+                self.misses += 1
+                return None
+            session = self._available.pop()
+        if session.is_alive():
+            with self._condition:
+                self.hits += 1
+            session.num_leases += 1
+            return session
+        logger.info('Pooled browser is unresponsive; relaunching')
+        session.quit()
+        with self._condition:
+            self.misses += 1
+        try:
+            return self._launch()
+        except Exception as e:
+            logger.warning('Failed to relaunch pooled browser: %r', e)
+            with self._condition:
+                self._num_sessions -= 1
+                self._condition.notify_all()
+            return None
+
+    def _release(self, session: PooledSession):
+        try:
+            session.reset()
+        except Exception as e:
+            # The session may still hold state of the configuration that used
+            # it, so it must not be leased again.
+            logger.info('Failed to reset pooled browser; relaunching: %r', e)
+            session.quit()
+            try:
+                session = self._launch()
+            except Exception as e:
+                logger.warning('Failed to relaunch pooled browser: %r', e)
+                with self._condition:
+                    self._num_sessions -= 1
+                    self._condition.notify_all()
+                return
+        with self._condition:
+            if self._closed:
+                session.quit()
+                return
+            self._available.append(session)
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def lease(self):
+        """Leases a session for the duration of the `with` block.
+
+        Yields `None` if no pooled session is available, in which case the
+        caller should fall back to launching its own browser.
+        """
+        session = self._acquire()
+        try:
+            yield session
+        finally:
+            if session is not None:
+                self._release(session)
+
+    @contextlib.asynccontextmanager
+    async def lease_async(self):
+        """Like `lease`, for use by asyncio tasks.
+
+        Acquiring and resetting sessions may block, so they run in the default
+        executor.
+        """
+        loop = asyncio.get_event_loop()
+        session = await loop.run_in_executor(None, self._acquire)
+        try:
+            yield session
+        finally:
+            if session is not None:
+                await loop.run_in_executor(None, self._release, session)
+
+    def get_summary(self) -> str:
+        num_leases = self.hits + self.misses
+        mean_wait_time = self.total_wait_time / num_leases if num_leases else 0.0
+        return ('browser pool: %d leases, %d hits, %d misses, '
+                'lease wait %.1fs mean / %.1fs max' %
+                (num_leases, self.hits, self.misses, mean_wait_time,
+                 self.max_wait_time))
@@ -0,0 +1,293 @@
+"""Records units of work so that a retried or restarted scraper run can skip them.
+
+`scrape_lib.run_with_scraper` gives every scraper a `Checkpoint` as
+`scraper.checkpoint`, shared across the retries of a single run.  A scraper
+declares a resumable step by wrapping each unit of work (e.g. one invoice or
+one statement) with `Checkpoint.unit`, or by computing an expensive
+intermediate result (e.g. the list of invoices found by paging through an order
+history) with `Checkpoint.run_step`.  On a retry, completed units are reported
+as done and recorded results are returned without recomputing them.
+
+If a path is specified, the checkpoint is also persisted to that file as a
+write-ahead journal, so that a run that is killed can be resumed by the next
+run.  Each line of the journal is a JSON record, appended before the work it
+describes is started (`plan`, `start`) or once it has been committed (`done`):
+
+- `plan`: the units a step is about to work through, such as invoice IDs, so
+  that the next run can replay the unfinished ones (`get_unfinished`) without
+  scanning listing pages again;
+- `start`: a unit is in progress, so that the units in flight when a run
+  stopped are known;
+- `done`: a unit, or a step with its result, completed;
+- `run`, `end`: a run started, or ended without completing (`PARTIAL` if its
+  time budget ran out, `FAILED` if it raised an exception).  A run that was
+  killed has no `end` record.
+
+Results of `run_step` and planned units only describe the listing pages at the
+time they were scanned.  They are reused by the next run if the previous run
+stopped because of its time budget or was killed, but are discarded if it
+failed, so that a persistent failure, such as on one bad invoice, does not keep
+later runs from discovering new work.  The completed units are kept.  After
+`MAX_UNSUCCESSFUL_RUNS` consecutive runs that failed or were killed, the whole
+journal is discarded.
+
+A record cut short by a crash is ignored.  The journal complements the files
+written by the scraper, which remain the record of the data retrieved, and is
+removed once the run completes successfully.  `finance_dl.update` keeps a
+journal for each configuration in its log directory (see `JOURNAL_ENV_VAR`),
+and `update status` reports the work left in it.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('checkpoint')
+
+# Environment variable specifying the journal path used by
+# `scrape_lib.run_with_scraper` if no `checkpoint_path` is configured.
+JOURNAL_ENV_VAR = 'FINANCE_DL_JOURNAL'
+
+# Outcomes of runs that ended without completing.
+PARTIAL = 'partial'
+FAILED = 'failed'
+
+# Number of consecutive runs that failed or were killed after which the
+# journal is discarded.
+MAX_UNSUCCESSFUL_RUNS = 3
+
+
+class Checkpoint(object):
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        # Maps `step` -> `unit` -> `{'duration': float, 'result': Any}`.
+        self.completed: Dict[str, Dict[str, dict]] = {}
+        # Maps `step` -> planned units, in order.
+        self.planned: Dict[str, List[str]] = {}
+        # Maps `step` -> units started, which may also have completed.
+        self.started: Dict[str, Set[str]] = {}
+        # Outcomes of the runs recorded, `None` for a run without an `end`
+        # record.
+        self.runs: List[Optional[str]] = []
+        # Estimated time saved by skipping completed work.
+        self.time_saved = 0.0
+        # Units may be recorded from several threads.
+        self._lock = threading.Lock()
+        # Set if the journal must be rewritten before appending to it, since
+        # it ends with an incomplete line.
+        self._needs_rewrite = False
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.info('Ignoring incomplete record in journal %s',
+                                self.path)
+                    self._needs_rewrite = True
+                    break
+                self._apply(record)
+                if 'op' not in record or not line.endswith('\n'):
+                    self._needs_rewrite = True
+        self._expire()
+
+    def _expire(self):
+        """Discards the records that the previous runs made stale."""
+        num_unsuccessful = 0
+        for outcome in reversed(self.runs):
+            if outcome == PARTIAL:
+                break
+            num_unsuccessful += 1
+        if num_unsuccessful >= MAX_UNSUCCESSFUL_RUNS:
+            logger.info('Discarding journal %s after %d unsuccessful runs',
+                        self.path, num_unsuccessful)
+            self.completed = {}
+            self.planned = {}
+            self.started = {}
+            self.runs = []
+            self._needs_rewrite = True
+        elif self.runs and self.runs[-1] == FAILED:
+            logger.info('Discarding listing results in journal %s, since '
+                        'the previous run failed', self.path)
+            self.planned = {}
+            for entries in self.completed.values():
+                for unit in [
+                        unit for unit, entry in entries.items()
+                        if entry.get('kind') == 'result'
+                ]:
+                    del entries[unit]
+            self._needs_rewrite = True
+
+    def _rewrite(self):
+        records: List[dict] = []
+        for outcome in self.runs:
+            records.append(dict(op='run'))
+            if outcome is not None:
+                records.append(dict(op='end', outcome=outcome))
+        records.extend(
+            dict(op='plan', step=step, units=units)
+            for step, units in self.planned.items())
+        for step, units in self.started.items():
+            records.extend(
+                dict(op='start', step=step, unit=unit) for unit in units)
+        for step, entries in self.completed.items():
+            records.extend(
+                dict(op='done', step=step, unit=unit, **entry)
+                for unit, entry in entries.items())
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        os.replace(self.path + '.tmp', self.path)
+
+    def _apply(self, record: dict):
+        op = record.get('op')
+        if op is None:
+            # Written as a single JSON object before checkpoints were
+            # journaled.
+            self.completed = record
+            return
+        if op == 'run':
+            self.runs.append(None)
+            return
+        if op == 'end':
+            if self.runs:
+                self.runs[-1] = record['outcome']
+            return
+        step = record['step']
+        if op == 'plan':
+            self.planned[step] = record['units']
+        elif op == 'start':
+            self.started.setdefault(step, set()).add(record['unit'])
+        elif op == 'done':
+            entry = {
+                'duration': record['duration'],
+                'result': record['result'],
+            }
+            if 'kind' in record:
+                entry['kind'] = record['kind']
+            self.completed.setdefault(step, {})[record['unit']] = entry
+
+    def _append(self, record: dict):
+        with self._lock:
+            self._apply(record)
+            if self.path is None:
+                return
+            if self._needs_rewrite:
+                self._rewrite()
+                self._needs_rewrite = False
+            # Flushed on close, which is enough to survive the process being
+            # killed.
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def has_records(self) -> bool:
+        return bool(self.completed or self.planned or self.started)
+
+    def begin_run(self):
+        """Records that a run started."""
+        self._append(dict(op='run'))
+
+    def end_run(self, outcome: str):
+        """Records that the current run ended without completing.
+
+        :param outcome: `PARTIAL` or `FAILED`.
+        """
+        self._append(dict(op='end', outcome=outcome))
+
+    def plan(self, step: str, units: Iterable[Any]):
+        """Records the units of `step` that are about to be worked through."""
+        self._append(dict(op='plan', step=step,
+                          units=[str(unit) for unit in units]))
+
+    def get_unfinished(self, step: str) -> List[str]:
+        """Returns the planned units of `step` that have not completed."""
+        completed = self.completed.get(step, {})
+        return [
+            unit for unit in self.planned.get(step, []) if unit not in completed
+        ]
+
+    def get_in_flight(self, step: str) -> List[str]:
+        """Returns the units of `step` started but not completed."""
+        completed = self.completed.get(step, {})
+        return sorted(unit for unit in self.started.get(step, set())
+                      if unit not in completed)
+
+    def describe(self) -> str:
+        """Returns a summary of the work recorded, such as for `status`."""
+        parts = []
+        for step in sorted(set(self.planned) | set(self.started)):
+            in_flight = len(self.get_in_flight(step))
+            if step in self.planned:
+                part = '%s: %d of %d unfinished' % (
+                    step, len(self.get_unfinished(step)),
+                    len(self.planned[step]))
+            else:
+                part = '%s: %d done' % (step, len(self.completed.get(step,
+                                                                     {})))
+            if in_flight:
+                part += ', %d in flight' % in_flight
+            parts.append(part)
+        return '; '.join(parts) or '%d steps done' % len(self.completed)
+
+    def is_done(self, step: str, unit: Any = '') -> bool:
+        """Returns `True` if `unit` of `step` has completed.
+
+        Also credits the time the unit originally took to `time_saved`, on the
+        assumption that the caller skips it.
+        """
+        entry = self.completed.get(step, {}).get(str(unit))
+        if entry is None:
+            return False
+        self.time_saved += entry['duration']
+        return True
+
+    def start(self, step: str, unit: Any = ''):
+        """Records that `unit` of `step` is in progress."""
+        self._append(dict(op='start', step=step, unit=str(unit)))
+
+    def mark_done(self, step: str, unit: Any = '', duration: float = 0.0,
+                  result: Any = None, kind: Optional[str] = None):
+        record = dict(op='done', step=step, unit=str(unit), duration=duration,
+                      result=result)
+        if kind is not None:
+            record['kind'] = kind
+        self._append(record)
+
+    @contextlib.contextmanager
+    def unit(self, step: str, unit: Any = ''):
+        """Marks `unit` of `step` done if the `with` block completes."""
+        self.start(step, unit)
+        start_time = time.time()
+        yield
+        self.mark_done(step, unit, duration=time.time() - start_time)
+
+    def run_step(self, step: str, func: Callable[[], Any], unit: Any = ''):
+        """Returns the recorded result of a step, or computes and records it.
+
+        The result must be JSON-serializable if the checkpoint is persisted.
+        """
+        if self.is_done(step, unit):
+            logger.info('Reusing result of completed step %s', step)
+            return self.completed[step][str(unit)]['result']
+        self.start(step, unit)
+        start_time = time.time()
+        result = func()
+        self.mark_done(step, unit, duration=time.time() - start_time,
+                       result=result, kind='result')
+        return result
+
+    def clear(self):
+        with self._lock:
+            self.completed = {}
+            self.planned = {}
+            self.started = {}
+            self.runs = []
+            if self.path is not None and os.path.exists(self.path):
+                os.remove(self.path)
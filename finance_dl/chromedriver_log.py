@@ -0,0 +1,48 @@
+"""Routing of chromedriver logs.
+
+By default, chromedriver does not log.  `finance_dl.update
+--chromedriver-log-level LEVEL` sets the environment variables below for each
+configuration it runs, so that chromedriver logs at that level to
+`<log-dir>/<config>.chromedriver.log`.  That log is capped at
+`--chromedriver-log-max-size` (see `log_rotation.rotate_log`): it is rotated
+before and after each run, and also checked while the configuration runs.
+Since chromedriver keeps the log open, a log that grows past the limit during
+a run is copied to the first compressed backup and truncated in place, and
+lines written between the copy and the truncation are lost.
+
+This module only depends on the standard library, so that `finance_dl.update`
+can use it without importing selenium.
+"""
+
+import os
+
+# Environment variables that route chromedriver logging, set by
+# `finance_dl.update` for each configuration.
+LOG_ENV_VAR = 'FINANCE_DL_CHROMEDRIVER_LOG'
+LOG_LEVEL_ENV_VAR = 'FINANCE_DL_CHROMEDRIVER_LOG_LEVEL'
+
+LOG_LEVELS = ('OFF', 'SEVERE', 'WARNING', 'INFO', 'DEBUG', 'ALL')
+
+
+def get_service_args(log_level=None, log_path=None):
+    """Returns the chromedriver arguments that configure logging.
+
+    :param log_level: One of `LOG_LEVELS`, defaults to the value of the
+        `FINANCE_DL_CHROMEDRIVER_LOG_LEVEL` environment variable, or `'OFF'`.
+    :param log_path: Path to which the log is appended, defaults to the value
+        of the `FINANCE_DL_CHROMEDRIVER_LOG` or `TMPLOG` environment variable,
+        or `/tmp/chromedriver.log`.
+    """
+    if log_level is None:
+        log_level = os.getenv(LOG_LEVEL_ENV_VAR, 'OFF')
+    log_level = log_level.upper()
+    if log_level not in LOG_LEVELS:
+        raise ValueError('Unknown chromedriver log level %r; expected one of %r'
+                         % (log_level, LOG_LEVELS))
+    service_args = ['--log-level=%s' % log_level, '--no-sandbox']
+    if log_level != 'OFF':
+        if log_path is None:
+            log_path = os.getenv(LOG_ENV_VAR,
+                                 os.getenv('TMPLOG', '/tmp/chromedriver.log'))
+        service_args += [f'--log-path={log_path}', '--append-log']
+    return service_args
@@ -1,7 +1,9 @@
 """Runs chromedriver in a new process group.
 
 This prevents it from being killed when typing Control+c in an interactive
-shell.
+shell.  When run by `finance_dl.update`, which sets
+`FINANCE_DL_KEEP_PROCESS_GROUP`, chromedriver instead stays in the process group
+of the configuration, so that it is killed along with it.
 """
 
 import os
@@ -11,11 +13,12 @@ import chromedriver_binary
 
 def main():
 
-    try:
-        os.setpgrp()
-    except:
-        # os.setpgrp not available on Windows
-        pass
+    if not os.getenv('FINANCE_DL_KEEP_PROCESS_GROUP'):
+        try:
+            os.setpgrp()
+        except:
+            # os.setpgrp not available on Windows
+            pass
 
     executable_path = os.getenv('ACTUAL_CHROMEDRIVER_PATH', 'chromedriver')
     os.execvp(executable_path, [executable_path] + sys.argv[1:])
@@ -5,6 +5,8 @@ import json
 import sys
 import os
 
+from . import scheduler
+
 
 def get_log_level(name):
     name = name.upper()
@@ -14,6 +16,14 @@ def get_log_level(name):
     return name
 
 
+def load_module(spec):
+    """Removes the module and scheduling keys from `spec`, and imports it."""
+    module_name = spec.pop('module')
+    for key in scheduler.SCHEDULING_KEYS:
+        spec.pop(key, None)
+    return importlib.import_module(module_name)
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--config-module', type=str,
@@ -31,6 +41,13 @@ def main():
     )
     ap.add_argument('--log', type=get_log_level, default=logging.INFO,
                     help='Log level.')
+    ap.add_argument(
+        '--trace', action='store_true',
+        help='Trace WebDriver commands and log a summary at the end of the run.')
+    ap.add_argument(
+        '--trace-file', type=str,
+        help='Write traced WebDriver commands to this file in Chrome trace '
+        'format.  Implies --trace.')
     args = ap.parse_args()
     logging.basicConfig(
         level=args.log,
@@ -54,8 +71,7 @@ def main():
         spec = getattr(config_module, config_key, None)()
     else:
         spec = args.spec
-    module_name = spec.pop('module')
-    module = importlib.import_module(module_name)
+    module = load_module(spec)
 
     headless = not args.visible
     if args.interactive:
@@ -87,7 +103,15 @@ def main():
         else:
             run_interactive_shell()
     else:
-        module.run(**spec)
+        tracer = None
+        if args.trace or args.trace_file:
+            from . import tracing
+            tracer = tracing.enable(args.trace_file)
+        try:
+            module.run(**spec)
+        finally:
+            if tracer is not None:
+                tracer.finish()
 
 
 if __name__ == '__main__':
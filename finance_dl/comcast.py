@@ -66,6 +66,7 @@ from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.keys import Keys
 
 from . import scrape_lib
+from . import downloads
 
 logger = logging.getLogger('comcast_scrape')
 
@@ -119,15 +120,14 @@ class Scraper(scrape_lib.Scraper):
             output_dir, '%s.bill.pdf' % (date.strftime(journal_date_format)))
 
     def process_download(self, download_result, output_dir, date):
-        logger.info('Got download: %s' % download_result[0])
+        name, path = download_result
+        logger.info('Got download: %s' % name)
         new_path = self.get_output_path(output_dir, date)
         if os.path.exists(new_path):
             logger.info('Skipping duplicate download: %s', new_path)
+            os.remove(path)
             return
-        tmp_path = new_path + '.tmp'
-        with open(tmp_path, 'wb') as f:
-            f.write(download_result[1])
-        os.rename(tmp_path, new_path)
+        downloads.move_into_place(path, new_path)
         logger.info("Wrote %s" % new_path)
 
     def get_bills(self, output_dir):
@@ -162,9 +162,7 @@ class Scraper(scrape_lib.Scraper):
         time.sleep(5.0)
         links = get_links()
 
-        for link in links:
-            if not link.is_displayed():
-                continue
+        for link in self.filter_displayed(links):
             cur_el = link
             bill_date = None
             while True:
@@ -189,8 +187,7 @@ class Scraper(scrape_lib.Scraper):
                 logger.info('Attempting download of bill for %s' % bill_date)
                 link.click()
                 logger.info('Waiting for download')
-                download_result, = self.wait_and_return(
-                    self.get_downloaded_file)
+                download_result = self.wait_for_download()
                 self.process_download(download_result, output_dir, bill_date)
 
     def run(self):
@@ -0,0 +1,104 @@
+"""Cron expressions for scheduling configurations.
+
+A configuration may specify a `cron` key with a standard five-field cron
+expression, `minute hour day-of-month month day-of-week`, in local time, or
+one of the shorthands `@hourly`, `@daily`, `@weekly` and `@monthly`.  Each
+field is `*`, a number, a range `a-b`, a step `*/n` or `a-b/n`, or a
+comma-separated list of these.  Days of the week are numbered from 0 (Sunday)
+to 6, and 7 is also Sunday.  As in cron, if both the day of the month and the
+day of the week are restricted, a day matching either is accepted.
+
+A configuration with a `cron` key is next due at the first time matching the
+expression after its last successful run, instead of according to the cadence
+learned by `finance_dl.refresh`.  For example, `'cron': '0 6 * * 1'` runs a
+configuration once a week, on the first `update` or `update daemon` check
+after 6:00 on Monday.
+"""
+
+from typing import List, Set
+import datetime
+
+SHORTHANDS = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+
+# (minimum, maximum) of each field.
+_FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+# Limit on the search for the next matching time, which guards against
+# expressions that never match, such as `0 0 31 2 *`.
+_MAX_SEARCH_DAYS = 5 * 366
+
+
+def _parse_field(field: str, minimum: int, maximum: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in field.split(','):
+        value_range, _, step = part.partition('/')
+        if value_range == '*':
+            start, end = minimum, maximum
+        elif '-' in value_range:
+            start_str, end_str = value_range.split('-', 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = end = int(value_range)
+            if step:
+                end = maximum
+        step_value = int(step) if step else 1
+        if not minimum <= start <= end <= maximum or step_value < 1:
+            raise ValueError('Invalid cron field: %r' % field)
+        values.update(range(start, end + 1, step_value))
+    return values
+
+
+class CronExpression(object):
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = SHORTHANDS.get(expression, expression).split()
+        if len(fields) != 5:
+            raise ValueError(
+                'Cron expression must have 5 fields: %r' % expression)
+        try:
+            parsed: List[Set[int]] = [
+                _parse_field(field, minimum, maximum)
+                for field, (minimum,
+                            maximum) in zip(fields, _FIELD_RANGES)
+            ]
+        except ValueError:
+            raise ValueError('Invalid cron expression: %r' % expression)
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # Convert to `datetime.weekday()` numbering, where Monday is 0.
+        self.weekdays = {(day - 1) % 7 for day in weekdays}
+        self.day_restricted = not fields[2].startswith('*')
+        self.weekday_restricted = not fields[4].startswith('*')
+
+    def matches_day(self, date: datetime.date) -> bool:
+        if date.month not in self.months:
+            return False
+        day_match = date.day in self.days
+        weekday_match = date.weekday() in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def get_next_time(self, after: float) -> float:
+        """Returns the first matching time strictly after `after`.
+
+        :param after: Time in seconds since the epoch.
+        :raises ValueError: If the expression does not match within 5 years.
+        """
+        start = (datetime.datetime.fromtimestamp(after).replace(
+            second=0, microsecond=0) + datetime.timedelta(minutes=1))
+        date = start.date()
+        for _ in range(_MAX_SEARCH_DAYS):
+            if self.matches_day(date):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = datetime.datetime.combine(
+                            date, datetime.time(hour, minute))
+                        if candidate >= start:
+                            return candidate.timestamp()
+            date += datetime.timedelta(days=1)
+        raise ValueError('Cron expression never matches: %r' % self.expression)
@@ -61,6 +61,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 
 from . import scrape_lib
+from . import http_client
 
 
 logger = logging.getLogger('discover_scrape')
@@ -77,7 +78,7 @@ def check_url(url):
 
 class Scraper(scrape_lib.Scraper):
     def __init__(self, credentials: dict, output_directory: str, **kwargs):
-        super().__init__(use_seleniumrequests=True, **kwargs)
+        super().__init__(**kwargs)
         self.credentials = credentials
         self.output_directory = output_directory
         os.makedirs(self.output_directory, exist_ok=True)
@@ -125,12 +126,10 @@ class Scraper(scrape_lib.Scraper):
         qfx_url = "https://card.discover.com/cardmembersvcs/ofxdl/ofxWebDownload?stmtKey=W&startDate={}&endDate={}&fileType=QFX&bid=9625&fileName={}"
         qfx_url = qfx_url.format(start_date.strftime('%Y%m%d'), end_date.strftime('%Y%m%d'), fname) 
         logging.info("Downloading from URL: {}".format(qfx_url))
-        response = self.driver.request('GET', qfx_url)
-        response.raise_for_status()
         account_folder = os.path.join(self.output_directory, self.account_name)
         os.makedirs(account_folder, exist_ok=True)
-        with open(os.path.join(account_folder, fname), 'wb') as fout:
-            fout.write(response.content)
+        http_client.fetch_to_file(self.get_http_session(), qfx_url,
+                                  os.path.join(account_folder, fname))
         logging.info('Success')
 
     def run(self):
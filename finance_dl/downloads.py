@@ -0,0 +1,147 @@
+"""Detects completed browser downloads and moves them into place.
+
+Completion is detected by watching the download directory with inotify (on
+Linux, through `ctypes`), so that a download is noticed as soon as Chrome
+renames the partial `.crdownload` file to its final name.  Where inotify is not
+available, the directory is polled instead.
+
+Finished downloads are moved to their destination with `os.replace`, so the
+data is never read into memory and the destination never contains a partially
+written file.
+"""
+
+from typing import List, Optional, Tuple
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import shutil
+import time
+
+logger = logging.getLogger('downloads')
+
+PARTIAL_SUFFIXES = ('.part', '.crdownload')
+PARTIAL_PREFIXES = ('.com.google.Chrome', )
+
+# Interval at which the download directory is polled if inotify is unavailable.
+POLL_INTERVAL = 0.5
+
+
+def is_partial_download(name: str) -> bool:
+    return name.endswith(PARTIAL_SUFFIXES) or name.startswith(PARTIAL_PREFIXES)
+
+
+def list_completed_downloads(download_dir: str) -> List[str]:
+    """Returns the names of the completed downloads in `download_dir`."""
+    return [
+        name for name in os.listdir(download_dir)
+        if not is_partial_download(name)
+    ]
+
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        name = ctypes.util.find_library('c')
+        _libc = ctypes.CDLL(name, use_errno=True) if name else False
+    return _libc
+
+
+class DirectoryWatcher(object):
+    """Waits for files in a directory to be created, written or renamed."""
+
+    def __init__(self, path: str):
+        self.fd: Optional[int] = None
+        libc = _get_libc()
+        if not libc or not hasattr(libc, 'inotify_init1'):
+            return
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            return
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(fd, os.fsencode(path), mask) < 0:
+            os.close(fd)
+            return
+        self.fd = fd
+
+    def wait(self, timeout: float):
+        """Blocks until the directory changes or `timeout` seconds elapse.
+
+        If inotify is unavailable, waits for at most `POLL_INTERVAL` seconds.
+        """
+        if self.fd is None:
+            time.sleep(max(0, min(timeout, POLL_INTERVAL)))
+            return
+        readable, _, _ = select.select([self.fd], [], [], max(0, timeout))
+        if readable:
+            # Drain pending events; the caller re-lists the directory.
+            try:
+                while os.read(self.fd, 4096):
+                    pass
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def wait_for_download(download_dir: str, timeout: float = 30) -> Tuple[str, str]:
+    """Waits for a single completed, non-empty download in `download_dir`.
+
+    :return: Tuple `(name, path)` of the downloaded file.
+    :raises TimeoutError: if no download completes within `timeout` seconds.
+    :raises RuntimeError: if more than one completed download is present.
+    """
+    deadline = time.time() + timeout
+    with DirectoryWatcher(download_dir) as watcher:
+        while True:
+            names = list_completed_downloads(download_dir)
+            if len(names) > 1:
+                raise RuntimeError('More than one downloaded file: %r' % names)
+            if len(names) == 1:
+                path = os.path.join(download_dir, names[0])
+                if os.path.getsize(path) > 0:
+                    return names[0], path
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError('Timed out waiting for download in %s' %
+                                   download_dir)
+            watcher.wait(remaining)
+
+
+def move_into_place(src: str, dest_path: str):
+    """Atomically moves the file `src` to `dest_path`.
+
+    If `src` and `dest_path` are on different filesystems, the file is first
+    copied next to `dest_path` and then renamed into place.
+    """
+    try:
+        os.replace(src, dest_path)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    tmp_path = dest_path + '.tmp'
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dest_path)
+    os.remove(src)
@@ -62,7 +62,6 @@ import dateutil.parser
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.keys import Keys
-from atomicwrites import atomic_write
 
 from . import scrape_lib
 
@@ -127,9 +126,7 @@ class Scraper(scrape_lib.Scraper):
                 continue
             logger.info('Downloading %s', statement_path)
             self.click(row.find_element_by_tag_name('a'))
-            download_result, = self.wait_and_return(self.get_downloaded_file)
-            with atomic_write(statement_path, mode='wb', overwrite=True) as f:
-                f.write(download_result[1])
+            self.save_download(statement_path)
             logger.info('Wrote %s', statement_path)
 
     def run(self):
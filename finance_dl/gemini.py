@@ -57,6 +57,10 @@ import csv
 
 logger = logging.getLogger('gemini_downloader')
 
+# Resources needed by configurations of this module, used by
+# `finance_dl.update` to schedule them.  No browser is needed.
+RESOURCES = {'memory_mb': 100}
+
 BALANCES_URL = "https://api.gemini.com/v1/balances"
 TRADES_URL = "https://api.gemini.com/v1/mytrades"
 TRANSFERS_URL = "https://api.gemini.com/v1/transfers"
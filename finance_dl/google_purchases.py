@@ -64,7 +64,6 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.keys import Keys
 from selenium.common.exceptions import NoSuchElementException
-import jsonschema
 from atomicwrites import atomic_write
 from . import scrape_lib
 from . import google_login
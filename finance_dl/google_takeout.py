@@ -93,5 +93,5 @@ class Scraper(scrape_lib.Scraper):
         new_download_link = list(new_download_links)[0]
         logger.info('Downloading archive')
         google_login.login(self, new_download_link)
-        (_, data), = self.wait_and_return(self.get_downloaded_file)
+        _, data = self.read_download()
         return zipfile.ZipFile(io.BytesIO(data))
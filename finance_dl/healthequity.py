@@ -262,7 +262,7 @@ class Scraper(scrape_lib.Scraper):
             #     lambda: self.find_visible_elements(By.XPATH, '//input[contains(@name,"Excel")]'))
             # scrape_lib.retry(excel_link.click, retry_delay=2)
             logger.info('Waiting for downloaded transaction history')
-            download_result, = self.wait_and_return(self.get_downloaded_file)
+            download_result = self.read_download()
             results[transaction_type] = download_result[1]
             self.driver.back()  # undo selection of transaction type
             self.driver.refresh()
@@ -300,7 +300,7 @@ class Scraper(scrape_lib.Scraper):
             lambda: self.find_visible_elements(By.ID, 'fundPerformanceDownload'))
         scrape_lib.retry(download_link.click, retry_delay=2)
         logger.info('Waiting for fund activity download')
-        download_result, = self.wait_and_return(self.get_downloaded_file)
+        download_result = self.read_download()
         return download_result[1]
 
     def download_data(self):
@@ -0,0 +1,143 @@
+"""Fetches URLs over plain HTTP using the authentication of a browser session.
+
+Many sites serve their data (statements, invoices, JSON APIs) over plain HTTP
+once the user has logged in with the browser.  `Scraper.get_http_session`
+creates a keep-alive `requests.Session` carrying the browser's cookies and
+user agent, so that these fetches do not have to go through the browser or
+through the `seleniumrequests` proxy one request at a time.
+
+The helpers in this module stream responses to disk, retry transient failures
+and run fetches with bounded concurrency.
+"""
+
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+import concurrent.futures
+import logging
+import time
+
+import requests
+import requests.adapters
+import urllib3.util.retry
+from atomicwrites import atomic_write
+
+logger = logging.getLogger('http_client')
+
+# Default number of concurrent requests for bulk fetches.
+DEFAULT_MAX_WORKERS = 4
+
+# HTTP status codes that are retried.
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Leading bytes of a PDF file, for `fetch_to_file`.
+PDF_MAGIC = b'%PDF'
+
+
+def make_session(cookies: Sequence[dict] = (),
+                 user_agent: Optional[str] = None, headers: dict = {},
+                 max_connections: int = DEFAULT_MAX_WORKERS,
+                 retries: int = 3,
+                 backoff_factor: float = 0.5) -> requests.Session:
+    """Creates a keep-alive session with the specified cookies and headers.
+
+    :param cookies: Cookies in the format returned by WebDriver `get_cookies`
+        or by the Chrome DevTools Protocol `Network.getAllCookies` command.
+    :param max_connections: Maximum number of pooled connections per host.
+    :param retries: Number of times connection errors and responses with a
+        status in `RETRY_STATUS_CODES` are retried, with exponential backoff.
+    """
+    session = requests.Session()
+    retry = urllib3.util.retry.Retry(
+        total=retries, backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES, raise_on_status=False)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_connections,
+                                            pool_maxsize=max_connections,
+                                            max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if user_agent is not None:
+        session.headers['User-Agent'] = user_agent
+    session.headers.update(headers)
+    for cookie in cookies:
+        # WebDriver uses `expiry`, the DevTools protocol uses `expires`, with
+        # -1 indicating a session cookie.
+        expires = cookie.get('expiry', cookie.get('expires'))
+        if expires is not None and expires < 0:
+            expires = None
+        session.cookies.set(
+            cookie['name'], cookie['value'], domain=cookie.get('domain', ''),
+            path=cookie.get('path', '/'), secure=cookie.get('secure', False),
+            expires=int(expires) if expires is not None else None)
+    return session
+
+
+def fetch_to_file(session: requests.Session, url: str, dest_path: str,
+                  chunk_size: int = 64 * 1024, magic: Optional[bytes] = None,
+                  **kwargs) -> int:
+    """Streams the response body for `url` to `dest_path`.
+
+    The file is written atomically, so `dest_path` is never left partially
+    written.  Additional keyword arguments are passed to `session.get`.
+
+    :param magic: If specified, the bytes the body must start with, such as
+        `PDF_MAGIC`.  Otherwise, nothing is written, since sites often serve
+        a login page with a successful status once the session has expired.
+    :return: The number of bytes written.
+    :raises requests.HTTPError: if the response status indicates an error.
+    :raises RuntimeError: if the body does not start with `magic`.
+    """
+    start_time = time.time()
+    num_bytes = 0
+    prefix = b''
+    with session.get(url, stream=True, **kwargs) as response:
+        response.raise_for_status()
+        with atomic_write(dest_path, mode='wb', overwrite=True) as f:
+            for chunk in response.iter_content(chunk_size):
+                if magic is not None and len(prefix) < len(magic):
+                    prefix += chunk[:len(magic) - len(prefix)]
+                    if len(prefix) == len(magic) and prefix != magic:
+                        break
+                f.write(chunk)
+                num_bytes += len(chunk)
+            if magic is not None and prefix != magic:
+                # Raised within `atomic_write`, which discards the file.
+                raise RuntimeError(
+                    'Unexpected response for %s (Content-Type %r): %r' %
+                    (url, response.headers.get('Content-Type'), prefix))
+    logger.info('Downloaded %s (%d bytes in %.2fs)', dest_path, num_bytes,
+                time.time() - start_time)
+    return num_bytes
+
+
+def run_concurrently(func: Callable[[Any], Any], items: Iterable[Any],
+                     max_workers: int = DEFAULT_MAX_WORKERS) -> List[Any]:
+    """Calls `func` on each of `items` with at most `max_workers` in parallel.
+
+    :return: The results, in the order of `items`.
+    :raises: The first exception raised by `func`, after all other calls have
+        finished.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers) as executor:
+        futures = [executor.submit(func, item) for item in items]
+        concurrent.futures.wait(futures)
+    return [future.result() for future in futures]
+
+
+def fetch_all(session: requests.Session, jobs: Iterable[Tuple[str, str]],
+              max_workers: int = DEFAULT_MAX_WORKERS, **kwargs) -> int:
+    """Fetches each `(url, dest_path)` pair in `jobs` to disk concurrently.
+
+    :return: The total number of bytes written.
+    """
+    start_time = time.time()
+    jobs = list(jobs)
+    sizes = run_concurrently(
+        lambda job: fetch_to_file(session, job[0], job[1], **kwargs), jobs,
+        max_workers=max_workers)
+    if jobs:
+        logger.info('Fetched %d files (%d bytes) in %.2fs', len(jobs),
+                    sum(sizes), time.time() - start_time)
+    return sum(sizes)
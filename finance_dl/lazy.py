@@ -0,0 +1,46 @@
+"""Defers importing heavy dependencies until they are used.
+
+`import_module(name)` returns a module object whose code does not run until
+one of its attributes is first accessed, using `importlib.util.LazyLoader`.
+Assigning the result to a module-level name keeps call sites unchanged:
+
+    seleniumrequests = lazy.import_module('seleniumrequests')
+
+A missing module is still reported when `import_module` is called, but an
+error while executing the module is raised only on first use.
+
+Only the last component of `name` is deferred: parent packages are imported
+immediately, since locating a submodule requires its parent's `__path__`.
+Deferring `selenium.webdriver.common.by` therefore still imports all of
+`selenium.webdriver`.  Attributes accessed while a module is being defined,
+for example in default arguments or annotations, also load it immediately;
+use string annotations for types from lazily imported modules.
+
+`python benchmarks/import_time.py` reports the import time of each module.
+"""
+
+import importlib
+import importlib.util
+import sys
+import types
+
+
+def import_module(name: str) -> types.ModuleType:
+    """Returns the module `name`, executed lazily on first attribute access."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError('No module named %r' % name, name=name)
+    if spec.loader is None or not hasattr(spec.loader, 'exec_module'):
+        return importlib.import_module(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent_name, _, child_name = name.rpartition('.')
+    if parent_name:
+        setattr(sys.modules[parent_name], child_name, module)
+    return module
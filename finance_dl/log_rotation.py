@@ -0,0 +1,55 @@
+"""Size-capped rotation of log files.
+
+`rotate_log` keeps a log file below a maximum size by compressing it to
+`<path>.1.gz` once it exceeds that size, shifting older backups to
+`<path>.2.gz`, `<path>.3.gz` and so on, and discarding the oldest.
+
+A log that a process still has open is rotated with `copy_truncate`, so that
+the process keeps appending to the same file.
+"""
+
+import gzip
+import os
+import shutil
+
+
+def get_backup_path(path: str, index: int) -> str:
+    return '%s.%d.gz' % (path, index)
+
+
+def rotate_log(path: str, max_bytes: int, backup_count: int,
+               copy_truncate: bool = False) -> bool:
+    """Rotates `path` if it is larger than `max_bytes`.
+
+    :param backup_count: Number of compressed backups to keep.  If 0, the log
+        is simply removed.
+    :param copy_truncate: If `True`, the log is truncated rather than removed,
+        for use while a process appends to it.  Lines appended after the log
+        is copied and before it is truncated are lost.
+    :return: `True` if the log was rotated.
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return False
+    if size <= max_bytes:
+        return False
+    if backup_count <= 0:
+        if copy_truncate:
+            os.truncate(path, 0)
+        else:
+            os.remove(path)
+        return True
+    for index in range(backup_count - 1, 0, -1):
+        src = get_backup_path(path, index)
+        if os.path.exists(src):
+            os.replace(src, get_backup_path(path, index + 1))
+    tmp_path = get_backup_path(path, 1) + '.tmp'
+    with open(path, 'rb') as fin, gzip.open(tmp_path, 'wb') as fout:
+        shutil.copyfileobj(fin, fout)
+    os.replace(tmp_path, get_backup_path(path, 1))
+    if copy_truncate:
+        os.truncate(path, 0)
+    else:
+        os.remove(path)
+    return True
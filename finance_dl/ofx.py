@@ -62,6 +62,18 @@ The following keys may be specified as part of the configuration dict:
   default value of `20` should be suitable in most cases, as most servers
   support returning at least 30 days of transactions per request.
 
+- `backfill_window_days`: Optional.  An `int` specifying the number of days of
+  data the server returns per request.  If specified, missing history longer
+  than this is retrieved with concurrent requests, one per window of this many
+  days, as described in `finance_dl/backfill.py`, rather than one request at a
+  time.  The completed windows are recorded in a `.backfill.json` file in the
+  account sub-directory.  Since OFX requests only specify a start date, a
+  window is complete once the data received reaches its end date; otherwise it
+  is requested again by later runs, up to 3 times.
+
+- `backfill_parallelism`: Optional.  An `int` specifying the maximum number of
+  concurrent requests made for a backfill.  Defaults to `4`.
+
 Output format:
 ==============
 
@@ -117,6 +129,7 @@ Example:
         )
 """
 
+from typing import TYPE_CHECKING, Dict, Optional
 import contextlib
 import warnings
 import datetime
@@ -125,12 +138,21 @@ import time
 import re
 import logging
 import io
+import threading
 
 from atomicwrites import atomic_write
 import bs4
 import dateutil.parser
-import ofxclient.institution
-import ofxclient
+
+from . import backfill
+from . import lazy
+
+if TYPE_CHECKING:
+    import ofxclient.account
+    import ofxclient.institution
+else:
+    # Not needed by `ofx_rename`, which only uses `get_ofx_date_range`.
+    ofxclient = lazy.import_module('ofxclient')
 
 # find_child and parse_ofx_time were derived from implementation in beancount/ingest/importers/ofx.py{,test}
 # Copyright (C) 2016  Martin Blais
@@ -174,8 +196,14 @@ warnings.filterwarnings('ignore', message='split()', module='re')
 
 logger = logging.getLogger('ofx')
 
-# Discover hack. Must have at least 5 seconds between requests.
-last_request_time = 0.0
+# Resources needed by configurations of this module, used by
+# `finance_dl.update` to schedule them.  No browser is needed.
+RESOURCES = {'memory_mb': 100}
+
+# Discover hack. Must have at least 5 seconds between requests.  The time of
+# the last request is kept per institution URL, since a worker process of
+# `finance_dl.update --worker-pool` may run several configurations in turn.
+last_request_times: Dict[str, float] = {}
 
 def sanitize_account_name(account_name: str):
     """Replaces any sequence of invalid characters in the account name with a dash.
@@ -188,12 +216,13 @@ def sanitize_account_name(account_name: str):
     return re.sub('[^a-z0-9A-Z.-]+', '-', account_name)
 
 
-def download_account_data_starting_from(account: ofxclient.account.Account,
+def download_account_data_starting_from(account: 'ofxclient.account.Account',
                                         date: datetime.date, slowdown = False):
     logger.info('Trying to retrieve data for %s starting at %s.',
                 account.number, date)
     num_days = (datetime.date.today() - date).days
-    global last_request_time
+    server_url = account.institution.url
+    last_request_time = last_request_times.get(server_url, 0.0)
     if slowdown:
         tdiff = time.time() - last_request_time
         if tdiff < 5.0: # if less than 5 seconds
@@ -202,7 +231,7 @@ def download_account_data_starting_from(account: ofxclient.account.Account,
         else:
             msg = 'ofx.py  last_ts: {:.1f}  time_now: {:.1f}  diff: {:.1f}'.format(last_request_time, time.time(), tdiff)
             logger.debug(msg)
-    last_request_time  = time.time()
+    last_request_times[server_url] = time.time()
 
     return account.download(days=num_days).read().encode('ascii')
 
@@ -257,11 +286,13 @@ def get_earliest_data(account, start_date, slowdown = False):
 
 
 def save_single_account_data(
-        account: ofxclient.account.Account, output_dir: str, overlap_days=2,
+        account: 'ofxclient.account.Account', output_dir: str, overlap_days=2,
         min_days_retrieved=20,
         min_start_date: datetime.date = dateutil.parser.parse(
             '1990-01-01').date(),
-        always_save=True, slowdown = False):
+        always_save=True, slowdown = False,
+        backfill_window_days: Optional[int] = None,
+        backfill_parallelism: int = backfill.DEFAULT_PARALLELISM):
     """Attempts to download all transactions for the specified account.
 
     :param account: The connected account for which to download data.
@@ -294,6 +325,13 @@ def save_single_account_data(
         additional transactions arrive on later days and they get included in
         the next download). By always saving the file, superfluous files could
         be created.
+    :param backfill_window_days: If specified, the number of days of data the
+        server returns per request.  Data missing since the end of the latest
+        existing file for longer than this is retrieved with concurrent
+        requests, one per window of this many days, before any remaining gaps
+        are filled one request at a time.
+    :param backfill_parallelism: Maximum number of concurrent requests for a
+        backfill.
     """
 
     if not os.path.exists(output_dir):
@@ -317,6 +355,8 @@ def save_single_account_data(
             date_ranges.append((start_date, end_date))
     date_ranges.sort()
 
+    date_ranges_lock = threading.Lock()
+
     def save_data(date_range, data):
         t = time.time()
         logger.info('Received data %s -- %s', date_range[0], date_range[1])
@@ -324,8 +364,9 @@ def save_single_account_data(
                                        date_range[1].strftime(date_format), t))
         with atomic_write(os.path.join(output_dir, filename), mode='wb', overwrite=True) as f:
             f.write(data)
-        date_ranges.append((date_range[0].date(), date_range[1].date()))
-        date_ranges.sort()
+        with date_ranges_lock:
+            date_ranges.append((date_range[0].date(), date_range[1].date()))
+            date_ranges.sort()
 
     if len(date_ranges) == 0:
         try:
@@ -337,6 +378,32 @@ def save_single_account_data(
 
         save_data(date_range, data)
 
+    if backfill_window_days is not None:
+        # Each request returns data starting from the start of its window up
+        # to today, since the server cannot be asked for an end date.  A
+        # window is only complete if the data reaches its end; otherwise the
+        # data received is saved, and the window is tried again by the next
+        # backfill, up to `backfill.DEFAULT_MAX_ATTEMPTS` times.
+        ledger = backfill.Ledger(os.path.join(output_dir, backfill.LEDGER_NAME))
+        windows = backfill.plan_windows(
+            date_ranges[-1][1] - datetime.timedelta(days=overlap_days),
+            datetime.date.today(), backfill_window_days,
+            overlap_days=overlap_days)
+        if len(windows) > 1 or ledger.get_pending():
+
+            def fetch_window(window):
+                data = download_account_data_starting_from(
+                    account, window.start)
+                date_range = get_ofx_date_range(data)
+                if date_range is None:
+                    return False
+                save_data(date_range, data)
+                return date_range[1].date() >= window.end
+
+            backfill.run_backfill(ledger, windows, fetch_window,
+                                  parallelism=backfill_parallelism,
+                                  min_interval=5.0 if slowdown else 0.0)
+
     def retrieve_more():
         # Find next gap
         cur_range = None
@@ -369,7 +436,7 @@ def save_single_account_data(
             break
 
 
-def save_all_account_data(inst: ofxclient.institution.Institution,
+def save_all_account_data(inst: 'ofxclient.institution.Institution',
                           output_dir: str,
                           acct_dir_map: dict={}, **kwargs):
     """Attempts to download data for all accounts.
@@ -397,7 +464,7 @@ def save_all_account_data(inst: ofxclient.institution.Institution,
             account=a, output_dir=os.path.join(output_dir, name), slowdown = slowdown, **kwargs)
 
 
-def connect(params: dict) -> ofxclient.institution.Institution:
+def connect(params: dict) -> 'ofxclient.institution.Institution':
     """Connects to an OFX server.
 
     :param params: A dict containing the following string fields:
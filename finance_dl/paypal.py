@@ -21,6 +21,10 @@ The following keys may be specified as part of the configuration dict:
   browser profile.  If not specified, a fresh temporary profile will be used
   each time.
 
+- `time_budget`: Optional.  If specified, the number of seconds after which
+  to stop starting new transactions, leaving the remaining transactions to the
+  next run, as described in `finance_dl/time_budget.py`.
+
 Output format:
 ==============
 
@@ -56,6 +60,7 @@ from requests.exceptions import HTTPError
 import jsonschema
 from atomicwrites import atomic_write
 from . import scrape_lib
+from . import http_client
 from . import google_login
 
 logger = logging.getLogger('paypal')
@@ -129,7 +134,7 @@ def check_url(url):
 
 class Scraper(scrape_lib.Scraper):
     def __init__(self, credentials: dict, output_directory: str, **kwargs):
-        super().__init__(use_seleniumrequests=True, **kwargs)
+        super().__init__(**kwargs)
         self.credentials = credentials
         self.output_directory = output_directory
         self.logged_in = False
@@ -174,13 +179,12 @@ class Scraper(scrape_lib.Scraper):
         self.logged_in = True
         self.csrf_token = None
 
-    def make_json_request(self, url):
-        return self.driver.request(
-            'GET', url, headers={
+    def make_json_request(self, session, url):
+        return session.get(
+            url, headers={
                 'x-csrf-token': self.get_csrf_token(),
                 'accept': 'application/json, text/javascript, */*; q=0.01',
                 'x-requested-with': 'XMLHttpRequest',
-                'accept-encoding': 'gzip, deflate',
             })
 
     def get_csrf_token(self):
@@ -195,7 +199,7 @@ class Scraper(scrape_lib.Scraper):
         logging.info('CSRF token retrieved')
         return self.csrf_token
 
-    def get_transaction_list(self):
+    def get_transaction_list(self, session):
         end_date = datetime.datetime.now().date() + datetime.timedelta(days=2)
         start_date = end_date - datetime.timedelta(days=365 * 10)
         date_format = '%Y-%m-%d'
@@ -206,76 +210,98 @@ class Scraper(scrape_lib.Scraper):
             'isClearFilterSelection=false&isClientSideFiltering=false&selectedCurrency=ALL&'
             'startDate=%s&endDate=%s' % (start_date.strftime(date_format),
                                          end_date.strftime(date_format)))
-        resp = self.make_json_request(url)
+        resp = self.make_json_request(session, url)
         resp.raise_for_status()
         j = resp.json()
         jsonschema.validate(j, transaction_list_schema)
         return j['data']['data']['activity']['transactions']
 
     def save_transactions(self):
-        transaction_list = self.get_transaction_list()
+        # Retrieving the CSRF token navigates the browser, which may update the
+        # cookies, so it must be done before creating the HTTP session.
+        self.get_csrf_token()
+        session = self.get_http_session()
+        # If a previous run was interrupted, only the transactions it did not
+        # save are retrieved, without fetching the list again.
+        transaction_list = self.checkpoint.run_step(
+            'paypal.transaction_list',
+            lambda: self.get_transaction_list(session))
         logging.info('Got %d transactions', len(transaction_list))
-        for transaction in transaction_list:
-            transaction_id = transaction['id']
-            output_prefix = os.path.join(self.output_directory, transaction_id)
-            if transaction_id.startswith('INV'):
-                pdf_path = output_prefix + '.pdf'
-                if not os.path.exists(pdf_path):
-                    invoice_url = (
-                        'https://www.paypal.com/invoice/payerView/detailsInternal/'
-                        + transaction_id + '?printPdfMode=true')
-                    logging.info('Retrieving PDF %s', invoice_url)
-                    r = self.driver.request('GET', invoice_url)
-                    r.raise_for_status()
-                    data = r.content
-                    with atomic_write(pdf_path, mode='wb', overwrite=True) as f:
-                        f.write(data)
-                invoice_json_path = output_prefix + '.invoice.json'
-                if not os.path.exists(invoice_json_path):
-                    with atomic_write(
-                            invoice_json_path,
-                            mode='w',
-                            encoding='utf-8',
-                            newline='\n',
-                            overwrite=True) as f:
-                        f.write(json.dumps(transaction, indent='  '))
-                continue
-            details_url = (
-                'https://www.paypal.com/myaccount/transactions/details/' +
-                transaction_id)
-            inline_details_url = (
-                'https://www.paypal.com/myaccount/transactions/details/inline/'
-                + transaction_id)
-            html_path = output_prefix + '.html'
-            json_path = output_prefix + '.json'
-            if not os.path.exists(json_path):
-                logging.info('Retrieving JSON %s', inline_details_url)
-                json_resp = self.make_json_request(inline_details_url)
-                json_resp.raise_for_status()
-                j = json_resp.json()
-                jsonschema.validate(j, transaction_details_schema)
-                with atomic_write(json_path, mode='wb', overwrite=True) as f:
-                    f.write(
-                        json.dumps(j['data'], indent='  ', sort_keys=True).encode())
-            if not os.path.exists(html_path):
-                logging.info('Retrieving HTML %s', details_url)
-                html_resp = self.driver.request('GET', details_url)
-                try:
-                    html_resp.raise_for_status()
-                except HTTPError as e:
-                    # in rare cases no HTML detail page exists but JSON could be extracted
-                    # if JSON is present gracefully skip HTML download if it fails
-                    if os.path.exists(json_path):
-                        # HTML download failed but JSON present -> only log warning
-                        logging.warning('Retrieving HTML %s failed due to %s but JSON is already present. Continuing...', details_url, e)
-                    else:
-                        logging.error('Retrieving HTML %s failed due to %s and no JSON is present. Aborting...', details_url, e)
-                        raise e
+        self.checkpoint.plan(
+            'paypal.transaction',
+            [transaction['id'] for transaction in transaction_list])
+
+        def save_within_budget(transaction):
+            if self.checkpoint.is_done('paypal.transaction', transaction['id']):
+                return True
+            if self.time_budget.is_exhausted():
+                return False
+            with self.checkpoint.unit('paypal.transaction', transaction['id']):
+                self.save_transaction(session, transaction)
+            return True
+
+        saved = http_client.run_concurrently(
+            save_within_budget, transaction_list,
+            max_workers=self.max_http_connections)
+        self.time_budget.check(saved.count(False), 'transactions')
+
+    def save_transaction(self, session, transaction):
+        transaction_id = transaction['id']
+        output_prefix = os.path.join(self.output_directory, transaction_id)
+        if transaction_id.startswith('INV'):
+            pdf_path = output_prefix + '.pdf'
+            if not os.path.exists(pdf_path):
+                invoice_url = (
+                    'https://www.paypal.com/invoice/payerView/detailsInternal/'
+                    + transaction_id + '?printPdfMode=true')
+                logging.info('Retrieving PDF %s', invoice_url)
+                http_client.fetch_to_file(session, invoice_url, pdf_path)
+            invoice_json_path = output_prefix + '.invoice.json'
+            if not os.path.exists(invoice_json_path):
                 with atomic_write(
-                        html_path, mode='w', encoding='utf-8',
-                        newline='\n', overwrite=True) as f:
-                    # Write with Unicode Byte Order Mark to ensure content will be properly interpreted as UTF-8
-                    f.write('\ufeff' + html_resp.text)
+                        invoice_json_path,
+                        mode='w',
+                        encoding='utf-8',
+                        newline='\n',
+                        overwrite=True) as f:
+                    f.write(json.dumps(transaction, indent='  '))
+            return
+        details_url = (
+            'https://www.paypal.com/myaccount/transactions/details/' +
+            transaction_id)
+        inline_details_url = (
+            'https://www.paypal.com/myaccount/transactions/details/inline/'
+            + transaction_id)
+        html_path = output_prefix + '.html'
+        json_path = output_prefix + '.json'
+        if not os.path.exists(json_path):
+            logging.info('Retrieving JSON %s', inline_details_url)
+            json_resp = self.make_json_request(session, inline_details_url)
+            json_resp.raise_for_status()
+            j = json_resp.json()
+            jsonschema.validate(j, transaction_details_schema)
+            with atomic_write(json_path, mode='wb', overwrite=True) as f:
+                f.write(
+                    json.dumps(j['data'], indent='  ', sort_keys=True).encode())
+        if not os.path.exists(html_path):
+            logging.info('Retrieving HTML %s', details_url)
+            html_resp = session.get(details_url)
+            try:
+                html_resp.raise_for_status()
+            except HTTPError as e:
+                # in rare cases no HTML detail page exists but JSON could be extracted
+                # if JSON is present gracefully skip HTML download if it fails
+                if os.path.exists(json_path):
+                    # HTML download failed but JSON present -> only log warning
+                    logging.warning('Retrieving HTML %s failed due to %s but JSON is already present. Continuing...', details_url, e)
+                else:
+                    logging.error('Retrieving HTML %s failed due to %s and no JSON is present. Aborting...', details_url, e)
+                    raise e
+            with atomic_write(
+                    html_path, mode='w', encoding='utf-8',
+                    newline='\n', overwrite=True) as f:
+                # Write with Unicode Byte Order Mark to ensure content will be properly interpreted as UTF-8
+                f.write('\ufeff' + html_resp.text)
 
     def run(self):
         if not os.path.exists(self.output_directory):
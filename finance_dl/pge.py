@@ -68,6 +68,7 @@ from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.keys import Keys
 
 from . import scrape_lib
+from . import downloads
 
 logger = logging.getLogger('pge_scrape')
 
@@ -122,12 +123,14 @@ class Scraper(scrape_lib.Scraper):
             output_dir, '%s.bill.pdf' % (date.strftime(journal_date_format)))
 
     def process_download(self, download_result, output_dir):
-        logger.info('Got download: %s' % download_result[0])
+        name, path = download_result
+        logger.info('Got download: %s' % name)
         m = re.fullmatch(r'.*custbill([0-9]{2})([0-9]{2})([0-9]{4})\.pdf',
-                         download_result[0])
+                         name)
         if not m:
             logger.error('Failed to determine date from downloaded file: %s' %
-                         download_result[0])
+                         name)
+            os.remove(path)
             return True
         else:
             date = datetime.date(
@@ -136,19 +139,16 @@ class Scraper(scrape_lib.Scraper):
             new_path = self.get_output_path(output_dir, date)
             if os.path.exists(new_path):
                 logger.info('Skipping duplicate download: %s', date)
+                os.remove(path)
                 return False
-            tmp_path = new_path.replace('.pdf', '.tmp.pdf')
-            with open(tmp_path, 'wb') as f:
-                download_data = download_result[1]
-                f.write(download_data)
-            os.rename(tmp_path, new_path)
+            downloads.move_into_place(path, new_path)
             logger.info("Wrote %s", new_path)
             return True
 
     def do_download_from_link(self, link, output_dir):
         scrape_lib.retry(lambda: self.click(link), retry_delay=2)
         logger.info('Waiting for download')
-        download_result, = self.wait_and_return(self.get_downloaded_file)
+        download_result = self.wait_for_download()
         return self.process_download(download_result, output_dir)
 
     def get_bills(self, output_dir):
@@ -0,0 +1,236 @@
+"""Runs configuration subprocesses on an asyncio event loop.
+
+`run_process` runs a command, passing each line of its combined output to a
+callback, and enforces a wall-clock timeout and an inactivity timeout (the
+maximum time without any output).  When a timeout expires, the whole process
+tree is killed: the process, its process group, and any descendants that moved
+to another process group.  Even when the process exits normally, any members
+of its process group left behind, such as an orphaned chromedriver or Chrome,
+are killed.
+
+The process is started in a new session.  `chromedriver_wrapper` normally
+moves chromedriver into its own process group so that Control+c in an
+interactive shell does not kill it; the `FINANCE_DL_KEEP_PROCESS_GROUP`
+environment variable, which `run_process` sets, disables that, so that
+chromedriver and Chrome stay in the group of the configuration process.
+
+Process information is read from `/proc`; where it is not available, only the
+process itself is killed and memory use is not reported.
+"""
+
+from typing import (AsyncIterator, Callable, Dict, List, NamedTuple, Optional,
+                    Set, Tuple)
+import asyncio
+import functools
+import os
+import signal
+import time
+
+KEEP_PROCESS_GROUP_ENV_VAR = 'FINANCE_DL_KEEP_PROCESS_GROUP'
+
+# Interval in seconds at which timeouts are checked and memory use is sampled.
+SAMPLE_INTERVAL = 1.0
+
+# Time in seconds to wait after SIGTERM before sending SIGKILL.
+KILL_GRACE_PERIOD = 5.0
+
+# How a process run ended.
+EXITED = 'exited'
+TIMEOUT = 'timeout'
+INACTIVE = 'inactive'
+
+
+class RunResult(NamedTuple):
+    # `EXITED`, `TIMEOUT` or `INACTIVE`.
+    end_reason: str
+    return_code: Optional[int]
+    # Peak total resident set size of the process tree, in KiB.
+    peak_rss_kb: Optional[int]
+    # Number of processes that were killed, including leftover processes
+    # after a normal exit.
+    num_killed: int
+
+
+class ProcessInfo(NamedTuple):
+    ppid: int
+    pgrp: int
+    rss_kb: int
+
+
+_page_size_kb = os.sysconf('SC_PAGE_SIZE') // 1024 if hasattr(
+    os, 'sysconf') else 4
+
+
+def list_processes() -> Dict[int, ProcessInfo]:
+    """Returns information about all live processes, read from `/proc`.
+
+    Zombie processes, which have exited but not yet been waited for, are
+    excluded.
+    """
+    processes: Dict[int, ProcessInfo] = {}
+    try:
+        names = os.listdir('/proc')
+    except OSError:
+        return processes
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open('/proc/%s/stat' % name, 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is in parentheses and may contain spaces.
+        fields = stat[stat.rindex(')') + 2:].split()
+        if fields[0] == 'Z':
+            continue
+        processes[int(name)] = ProcessInfo(ppid=int(fields[1]),
+                                           pgrp=int(fields[2]),
+                                           rss_kb=int(fields[21]) *
+                                           _page_size_kb)
+    return processes
+
+
+def get_process_tree(pid: int, processes: Dict[int, ProcessInfo]) -> Set[int]:
+    """Returns `pid`, the members of its process group, and descendants."""
+    tree = {p for p, info in processes.items() if info.pgrp == pid}
+    if pid in processes:
+        tree.add(pid)
+    children: Dict[int, List[int]] = {}
+    for p, info in processes.items():
+        children.setdefault(info.ppid, []).append(p)
+    stack = list(tree)
+    while stack:
+        for child in children.get(stack.pop(), []):
+            if child not in tree:
+                tree.add(child)
+                stack.append(child)
+    return tree
+
+
+def get_tree_rss_kb(pid: int) -> Optional[int]:
+    processes = list_processes()
+    if not processes:
+        return None
+    return sum(processes[p].rss_kb for p in get_process_tree(pid, processes))
+
+
+def kill_tree(pid: int, grace_period: float = KILL_GRACE_PERIOD,
+              include_root: bool = True) -> int:
+    """Kills the process tree of `pid`, first with SIGTERM, then SIGKILL.
+
+    :param include_root: If `False`, kills only the other members of the tree,
+        leaving `pid` itself running.
+    :return: The number of processes signaled.
+    """
+    pids = get_process_tree(pid, list_processes())
+    if include_root:
+        pids.add(pid)
+    else:
+        pids.discard(pid)
+    num_signaled = len(pids)
+    for sig in [signal.SIGTERM, getattr(signal, 'SIGKILL', signal.SIGTERM)]:
+        if not pids:
+            break
+        for p in pids:
+            try:
+                os.kill(p, sig)
+            except OSError:
+                pass
+        deadline = time.time() + grace_period
+        while time.time() < deadline:
+            alive = set(list_processes()) & pids
+            if not alive:
+                break
+            time.sleep(0.1)
+        pids = set(list_processes()) & pids
+    return num_signaled
+
+
+async def iter_lines(stream: asyncio.StreamReader) -> AsyncIterator[str]:
+    """Yields the decoded lines read from `stream` until end of file."""
+    while True:
+        try:
+            line = await stream.readline()
+        except ValueError:
+            # Line longer than the limit.
+            line = await stream.read(64 * 1024)
+        if not line:
+            break
+        yield line.decode('utf-8', errors='replace')
+
+
+async def supervise(pid: int, reader: asyncio.Future,
+                    get_last_output_time: Callable[[], float],
+                    timeout: Optional[float] = None,
+                    inactivity_timeout: Optional[float] = None
+                    ) -> Tuple[str, Optional[int]]:
+    """Waits for `reader` to finish, enforcing the timeouts.
+
+    Timeouts are measured on the event loop clock, and the inactivity timeout
+    from the time returned by `get_last_output_time`.  The process tree of
+    `pid` is not killed.
+
+    :return: `(end_reason, peak_rss_kb)`, where `end_reason` is `EXITED` if
+        `reader` finished.
+    """
+    loop = asyncio.get_event_loop()
+    start_time = loop.time()
+    peak_rss_kb = None
+    while not reader.done():
+        await asyncio.wait([reader], timeout=SAMPLE_INTERVAL)
+        rss_kb = get_tree_rss_kb(pid)
+        if rss_kb is not None:
+            peak_rss_kb = max(peak_rss_kb or 0, rss_kb)
+        now = loop.time()
+        if timeout is not None and now - start_time >= timeout:
+            return TIMEOUT, peak_rss_kb
+        if (inactivity_timeout is not None and
+                now - get_last_output_time() >= inactivity_timeout):
+            return INACTIVE, peak_rss_kb
+    return EXITED, peak_rss_kb
+
+
+async def run_process(argv: List[str], on_line: Callable[[str], None],
+                      env: Optional[Dict[str, str]] = None,
+                      timeout: Optional[float] = None,
+                      inactivity_timeout: Optional[float] = None) -> RunResult:
+    """Runs `argv`, calling `on_line` with each line of output."""
+    loop = asyncio.get_event_loop()
+    env = dict(env if env is not None else os.environ)
+    env[KEEP_PROCESS_GROUP_ENV_VAR] = '1'
+    process = await asyncio.create_subprocess_exec(
+        *argv, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT, env=env, start_new_session=True,
+        limit=1024 * 1024)
+    last_output_time = loop.time()
+
+    async def read_output():
+        nonlocal last_output_time
+        async for line in iter_lines(process.stdout):
+            last_output_time = loop.time()
+            on_line(line)
+
+    reader = asyncio.ensure_future(read_output())
+    end_reason, peak_rss_kb = await supervise(
+        process.pid, reader, lambda: last_output_time, timeout=timeout,
+        inactivity_timeout=inactivity_timeout)
+
+    num_killed = 0
+    if end_reason != EXITED:
+        num_killed = await loop.run_in_executor(None, kill_tree, process.pid)
+        try:
+            await asyncio.wait_for(reader, KILL_GRACE_PERIOD)
+        except asyncio.TimeoutError:
+            pass
+    return_code = await process.wait()
+    # Kill anything left behind in the process group, such as a browser that
+    # the process failed to shut down.
+    if get_process_tree(process.pid, list_processes()):
+        num_killed += await loop.run_in_executor(
+            None, functools.partial(kill_tree, process.pid,
+                                    include_root=False))
+    if not reader.done():
+        reader.cancel()
+    return RunResult(end_reason=end_reason, return_code=return_code,
+                     peak_rss_kb=peak_rss_kb, num_killed=num_killed)
@@ -0,0 +1,279 @@
+"""Maintains the persistent Chrome profiles used by scrapers.
+
+Configurations that specify a `profile_dir` reuse the same Chrome profile on
+every run, so that login cookies and "trust this device" MFA state persist.
+Over time such a profile accumulates HTTP caches, Service Worker caches and
+browsing history, which make every Chrome startup slower.
+
+This module can:
+
+- report the size of a profile (`size`);
+- prune caches and history from a profile, keeping cookies, local storage,
+  IndexedDB and preferences (`compact`);
+- save a known-good profile to a compressed archive (`snapshot`), and replace a
+  profile with such a snapshot (`restore`).
+
+With `--measure-startup`, the `size` and `compact` commands also launch a
+headless browser with a copy of the profile and report the startup time,
+before and after compaction.  Launching Chrome repopulates caches, so the
+measurements never use the profile itself: the profile is copied to a
+temporary directory before each one, which also means that both start with the
+profile in the OS page cache.
+
+Chrome must not be running with the profile while it is modified; profiles
+that appear to be in use are refused.
+
+Usage:
+
+    python -m finance_dl.profile_maintenance compact --measure-startup \\
+        /path/to/profiles/amazon
+"""
+
+from typing import List, Optional, Tuple
+import argparse
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+
+logger = logging.getLogger('profile_maintenance')
+
+# Paths, relative to a profile sub-directory such as `Default`, that only hold
+# caches or history and can be removed without logging out.
+PRUNABLE_PROFILE_PATHS = [
+    'Cache',
+    'Code Cache',
+    'GPUCache',
+    'DawnCache',
+    'DawnGraphiteCache',
+    'DawnWebGPUCache',
+    'Service Worker/CacheStorage',
+    'Service Worker/ScriptCache',
+    'blob_storage',
+    'History',
+    'History-journal',
+    'Visited Links',
+    'Top Sites',
+    'Top Sites-journal',
+    'Favicons',
+    'Favicons-journal',
+    'Shortcuts',
+    'Shortcuts-journal',
+    'Network Action Predictor',
+    'Network Action Predictor-journal',
+    'Media History',
+    'Media History-journal',
+]
+
+# Paths, relative to the profile directory itself, that can be removed.
+PRUNABLE_ROOT_PATHS = [
+    'ShaderCache',
+    'GrShaderCache',
+    'GraphiteDawnCache',
+    'component_crx_cache',
+    'extensions_crx_cache',
+    'BrowserMetrics',
+    'Crashpad',
+    'optimization_guide_model_store',
+]
+
+# Files that exist while Chrome is running with the profile.
+LOCK_FILES = ['SingletonLock', 'SingletonSocket', 'SingletonCookie']
+
+
+def get_size(path: str) -> int:
+    """Returns the total size in bytes of the files under `path`."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path) if os.path.isfile(path) else 0
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            file_path = os.path.join(dirpath, name)
+            if not os.path.islink(file_path):
+                total += os.path.getsize(file_path)
+    return total
+
+
+def is_in_use(profile_dir: str) -> bool:
+    return any(
+        os.path.lexists(os.path.join(profile_dir, name)) for name in LOCK_FILES)
+
+
+def _check_not_in_use(profile_dir: str):
+    if is_in_use(profile_dir):
+        raise RuntimeError(
+            'Profile %s appears to be in use; close Chrome first (or remove '
+            'the stale %s)' % (profile_dir, LOCK_FILES[0]))
+
+
+def get_profile_subdirs(profile_dir: str) -> List[str]:
+    """Returns the names of the profile sub-directories, e.g. `Default`."""
+    return sorted(
+        name for name in os.listdir(profile_dir)
+        if os.path.isfile(os.path.join(profile_dir, name, 'Preferences')))
+
+
+def get_prunable_paths(profile_dir: str) -> List[str]:
+    """Returns the existing paths under `profile_dir` that `compact` removes."""
+    paths = [os.path.join(profile_dir, p) for p in PRUNABLE_ROOT_PATHS]
+    for subdir in get_profile_subdirs(profile_dir):
+        paths.extend(
+            os.path.join(profile_dir, subdir, p)
+            for p in PRUNABLE_PROFILE_PATHS)
+    return [p for p in paths if os.path.lexists(p)]
+
+
+def compact_profile(profile_dir: str) -> Tuple[int, int]:
+    """Removes caches and history from a profile.
+
+    :return: Tuple `(size_before, size_after)` in bytes.
+    """
+    _check_not_in_use(profile_dir)
+    size_before = get_size(profile_dir)
+    for path in get_prunable_paths(profile_dir):
+        logger.debug('Removing %s', path)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    size_after = get_size(profile_dir)
+    logger.info('Compacted %s from %d to %d bytes', profile_dir, size_before,
+                size_after)
+    return size_before, size_after
+
+
+def snapshot_profile(profile_dir: str, snapshot_path: str):
+    """Writes a compressed archive of a profile, excluding caches."""
+    _check_not_in_use(profile_dir)
+    excluded = set(get_prunable_paths(profile_dir))
+    tmp_path = snapshot_path + '.tmp'
+    with tarfile.open(tmp_path, 'w:gz') as tar:
+        tar.add(profile_dir, arcname='.',
+                filter=lambda info: None if os.path.join(
+                    profile_dir, os.path.normpath(info.name)) in excluded else
+                info)
+    os.replace(tmp_path, snapshot_path)
+    logger.info('Wrote snapshot of %s to %s (%d bytes)', profile_dir,
+                snapshot_path, os.path.getsize(snapshot_path))
+
+
+def restore_profile(snapshot_path: str, profile_dir: str):
+    """Replaces a profile with the contents of a snapshot.
+
+    The snapshot is extracted next to `profile_dir` and then renamed into
+    place, so that a failed restore leaves the existing profile untouched.
+    """
+    if os.path.exists(profile_dir):
+        _check_not_in_use(profile_dir)
+    parent_dir = os.path.dirname(os.path.abspath(profile_dir))
+    os.makedirs(parent_dir, exist_ok=True)
+    new_dir = tempfile.mkdtemp(dir=parent_dir, prefix='.restore-')
+    restored = False
+    try:
+        with tarfile.open(snapshot_path, 'r:*') as tar:
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall(new_dir, filter='data')
+            else:
+                for member in tar.getmembers():
+                    if (os.path.isabs(member.name) or
+                            '..' in member.name.split('/') or
+                            member.issym() or member.islnk()):
+                        raise RuntimeError(
+                            'Refusing to extract %r from snapshot' %
+                            member.name)
+                tar.extractall(new_dir)
+        old_dir = None
+        if os.path.exists(profile_dir):
+            old_dir = tempfile.mkdtemp(dir=parent_dir, prefix='.old-')
+            os.rmdir(old_dir)
+            os.rename(profile_dir, old_dir)
+        os.rename(new_dir, profile_dir)
+        restored = True
+        if old_dir is not None:
+            shutil.rmtree(old_dir)
+    finally:
+        if not restored:
+            shutil.rmtree(new_dir, ignore_errors=True)
+    logger.info('Restored %s from %s', profile_dir, snapshot_path)
+
+
+def measure_startup_time(profile_dir: str, **kwargs) -> float:
+    """Returns the time to launch a headless browser with a copy of a profile.
+
+    The browser uses a fresh copy, so that the profile is not modified.  The
+    time includes loading `about:blank`, so that the browser has finished
+    loading the profile, but not making the copy.
+    """
+    from . import scrape_lib
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        copy_dir = os.path.join(tmp_dir, 'profile')
+        shutil.copytree(profile_dir, copy_dir, symlinks=True)
+        start_time = time.time()
+        with scrape_lib.temp_scraper(scrape_lib.Scraper, profile_dir=copy_dir,
+                                     headless=True, **kwargs) as scraper:
+            scraper.driver.get('about:blank')
+            return time.time() - start_time
+
+
+def _format_size(num_bytes: int) -> str:
+    return '%.1f MB' % (num_bytes / 1e6)
+
+
+def _report(profile_dir: str, measure_startup: bool,
+            label: str) -> Optional[float]:
+    startup_time = None
+    message = '%s: %s' % (label, _format_size(get_size(profile_dir)))
+    if measure_startup:
+        startup_time = measure_startup_time(profile_dir)
+        message += ', startup %.2fs' % startup_time
+    print(message)
+    return startup_time
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    ap.add_argument('--log', default='INFO', help='Log level.')
+    subparsers = ap.add_subparsers(dest='command')
+    subparsers.required = True
+
+    ap_size = subparsers.add_parser('size', help='Report profile size.')
+    ap_compact = subparsers.add_parser(
+        'compact', help='Remove caches and history from a profile.')
+    for p in [ap_size, ap_compact]:
+        p.add_argument('profile_dir', help='Chrome profile directory.')
+        p.add_argument('--measure-startup', action='store_true',
+                       help='Also measure headless browser startup time.')
+
+    ap_snapshot = subparsers.add_parser(
+        'snapshot', help='Save a profile, excluding caches, to an archive.')
+    ap_snapshot.add_argument('profile_dir', help='Chrome profile directory.')
+    ap_snapshot.add_argument('snapshot_path', help='Output .tar.gz path.')
+
+    ap_restore = subparsers.add_parser(
+        'restore', help='Replace a profile with a snapshot.')
+    ap_restore.add_argument('snapshot_path', help='Snapshot .tar.gz path.')
+    ap_restore.add_argument('profile_dir', help='Chrome profile directory.')
+
+    args = ap.parse_args()
+    logging.basicConfig(level=args.log.upper())
+
+    if args.command == 'size':
+        _report(args.profile_dir, args.measure_startup, 'Size')
+    elif args.command == 'compact':
+        before = _report(args.profile_dir, args.measure_startup, 'Before')
+        compact_profile(args.profile_dir)
+        after = _report(args.profile_dir, args.measure_startup, 'After')
+        if before is not None and after is not None:
+            print('Startup time saved: %.2fs (each measured on a fresh copy '
+                  'of the profile)' % (before - after))
+    elif args.command == 'snapshot':
+        snapshot_profile(args.profile_dir, args.snapshot_path)
+    elif args.command == 'restore':
+        restore_profile(args.snapshot_path, args.profile_dir)
+
+
+if __name__ == '__main__':
+    main()
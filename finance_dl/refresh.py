@@ -0,0 +1,86 @@
+"""Chooses when each configuration is next due to be updated.
+
+Many sources only produce new data periodically: utility bills and brokerage
+documents arrive monthly, and running their scrapers daily mostly launches
+browsers that find nothing new.  The cadence of a configuration is learned
+from the modification times of the files in its `output_directory`, and from
+the past runs recorded in the run history that wrote files.  Files written
+within `ARRIVAL_MERGE_INTERVAL` of each other are considered a single
+arrival, and the cadence is the median interval between recent arrivals.
+
+A configuration is next due at the later of `MIN_INTERVAL` after its last
+successful run and `EARLY_FRACTION` of the cadence after its last arrival, but
+never more than `MAX_INTERVAL` after its last successful run.  Runs that
+produce nothing new therefore push the due time back by `MIN_INTERVAL` once
+the next arrival is expected, and until then do not run at all.
+
+The adaptive interval can be overridden with the `refresh_interval_days` key
+of the configuration, or disabled with `update --fixed-interval`.
+"""
+
+from typing import List, Optional
+import os
+import statistics
+
+DAY = 24 * 60 * 60
+
+MIN_INTERVAL = DAY
+MAX_INTERVAL = 31 * DAY
+ARRIVAL_MERGE_INTERVAL = DAY / 2
+EARLY_FRACTION = 0.8
+
+# Minimum number of arrivals from which a cadence is estimated.
+MIN_ARRIVALS = 3
+
+# Number of most recent intervals between arrivals used to estimate cadence.
+CADENCE_WINDOW = 12
+
+
+def get_file_times(output_directory: str) -> List[float]:
+    """Returns the modification times of the files in `output_directory`."""
+    times = []
+    for dirpath, _, filenames in os.walk(output_directory):
+        for name in filenames:
+            try:
+                times.append(os.stat(os.path.join(dirpath, name)).st_mtime)
+            except OSError:
+                pass
+    return times
+
+
+def get_arrivals(times: List[float]) -> List[float]:
+    """Merges times within `ARRIVAL_MERGE_INTERVAL` into single arrivals."""
+    arrivals: List[float] = []
+    for t in sorted(times):
+        if arrivals and t - arrivals[-1] < ARRIVAL_MERGE_INTERVAL:
+            continue
+        arrivals.append(t)
+    return arrivals
+
+
+def estimate_cadence(arrivals: List[float]) -> Optional[float]:
+    """Returns the typical interval in seconds between `arrivals`."""
+    if len(arrivals) < MIN_ARRIVALS:
+        return None
+    arrivals = arrivals[-(CADENCE_WINDOW + 1):]
+    return statistics.median(b - a for a, b in zip(arrivals, arrivals[1:]))
+
+
+def get_next_due(last_run: Optional[float], last_arrival: Optional[float],
+                 cadence: Optional[float],
+                 interval_override: Optional[float] = None) -> float:
+    """Returns the time at which a configuration is next due.
+
+    :param last_run: Time of the last successful run.
+    :param last_arrival: Time at which new data last arrived.
+    :param cadence: Typical interval in seconds between arrivals.
+    :param interval_override: Fixed interval in seconds between runs.
+    """
+    if last_run is None:
+        return float('-inf')
+    if interval_override is not None:
+        return last_run + interval_override
+    due = last_run + MIN_INTERVAL
+    if cadence is not None and last_arrival is not None:
+        due = max(due, last_arrival + EARLY_FRACTION * cadence)
+    return min(due, last_run + MAX_INTERVAL)
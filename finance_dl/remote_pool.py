@@ -0,0 +1,203 @@
+"""Pool of remote WebDriver endpoints shared across configurations.
+
+By default, a configuration that specifies `connect_remote` always uses that
+one endpoint, and `update --remote-slots` limits how many sessions run on it at
+once.  When `finance_dl.update` is given a list of endpoints with
+`--remote-endpoint URL` (repeated once per standalone Chrome container or
+Selenium grid), configurations whose `connect_remote` is one of those URLs, or
+`'pool'`, share all of them instead:
+
+- Each endpoint is health-checked through its WebDriver `/status` URL when
+  `update` starts, and unhealthy endpoints are checked again at most every
+  `--remote-health-interval` seconds.
+- Each configuration leases the least loaded healthy endpoint, and at most
+  `--remote-slots` configurations use an endpoint at once.  Browser
+  parallelism therefore scales with the number of endpoints.
+- The leased endpoint is passed to the configuration subprocess (see
+  `ENDPOINTS_ENV_VAR`), followed by the other healthy endpoints.  If a session
+  fails to start on the leased endpoint, `scrape_lib.Scraper` tries the others
+  in order.
+- An endpoint whose configuration failed is health-checked again when its
+  lease is released.
+
+This module only depends on the standard library, so that `finance_dl.update`
+can use it without importing selenium.
+"""
+
+from typing import List, Optional
+import asyncio
+import concurrent.futures
+import contextlib
+import json
+import logging
+import time
+import urllib.request
+
+logger = logging.getLogger('remote_pool')
+
+# Value of `connect_remote` for configurations that only run with a pool.
+POOL = 'pool'
+
+# Scheduler resource used by configurations that use the pool, in place of
+# `remote:<url>`.
+RESOURCE = 'remote:' + POOL
+
+# Environment variable listing the endpoints to try, separated by spaces, with
+# the leased endpoint first.
+ENDPOINTS_ENV_VAR = 'FINANCE_DL_REMOTE_ENDPOINTS'
+
+HEALTH_CHECK_TIMEOUT = 5
+
+
+def check_endpoint(endpoint: str,
+                   timeout: float = HEALTH_CHECK_TIMEOUT) -> bool:
+    """Returns `True` if the WebDriver at `endpoint` can start a session."""
+    try:
+        with urllib.request.urlopen(endpoint.rstrip('/') + '/status',
+                                    timeout=timeout) as response:
+            status = json.loads(response.read().decode('utf-8'))
+    except Exception as e:
+        logger.info('Remote WebDriver %s is unavailable: %r', endpoint, e)
+        return False
+    value = status.get('value') if isinstance(status, dict) else None
+    # Endpoints predating the W3C protocol do not report `ready`.
+    return not isinstance(value, dict) or value.get('ready', True) is not False
+
+
+class Endpoint(object):
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = False
+        self.last_check_time: Optional[float] = None
+        self.num_active = 0
+
+        # Metrics
+        self.num_leases = 0
+        self.num_failures = 0
+
+
+class RemoteLease(object):
+    def __init__(self, endpoint: Optional[Endpoint], fallbacks: List[str]):
+        self.endpoint = endpoint
+        self.fallbacks = fallbacks
+        # Set by the user of the lease if the configuration failed.
+        self.failed = False
+
+    def environ(self) -> dict:
+        """Returns the environment variables that hand the endpoints to a child."""
+        urls = [self.endpoint.url] if self.endpoint is not None else []
+        return {ENDPOINTS_ENV_VAR: ' '.join(urls + self.fallbacks)}
+
+
+class RemotePool(object):
+    """Leases remote WebDriver endpoints to configurations.
+
+    :param urls: The endpoints, such as `http://standalonechrome:4444/wd/hub`.
+    :param slots: Maximum number of leases of each endpoint at once.
+    :param health_check_interval: Minimum time in seconds between checks of
+        an unhealthy endpoint.
+    """
+
+    def __init__(self, urls: List[str], slots: int = 1,
+                 health_check_interval: float = 60):
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.slots = slots
+        self.health_check_interval = health_check_interval
+        # Created on first use, within the event loop.
+        self._released: Optional[asyncio.Condition] = None
+
+    def uses_pool(self, connect_remote: Optional[str]) -> bool:
+        return connect_remote == POOL or any(
+            endpoint.url == connect_remote for endpoint in self.endpoints)
+
+    @property
+    def capacity(self) -> int:
+        """Number of configurations that may use the pool at once."""
+        return self.slots * max(1, self.get_num_healthy())
+
+    def get_num_healthy(self) -> int:
+        return sum(endpoint.healthy for endpoint in self.endpoints)
+
+    def check_health(self, endpoints: Optional[List[Endpoint]] = None):
+        """Checks the health of `endpoints`, by default all, concurrently."""
+        endpoints = self.endpoints if endpoints is None else endpoints
+        if not endpoints:
+            return
+        with concurrent.futures.ThreadPoolExecutor(len(endpoints)) as executor:
+            results = list(
+                executor.map(lambda endpoint: check_endpoint(endpoint.url),
+                             endpoints))
+        now = time.time()
+        for endpoint, healthy in zip(endpoints, results):
+            if endpoint.healthy and not healthy:
+                logger.warning('Remote WebDriver %s became unhealthy',
+                               endpoint.url)
+            endpoint.healthy = healthy
+            endpoint.last_check_time = now
+
+    def _get_stale_unhealthy(self) -> List[Endpoint]:
+        now = time.time()
+        return [
+            endpoint for endpoint in self.endpoints
+            if not endpoint.healthy and (
+                endpoint.last_check_time is None or
+                now - endpoint.last_check_time >= self.health_check_interval)
+        ]
+
+    def _select(self) -> Optional[Endpoint]:
+        candidates = [
+            endpoint for endpoint in self.endpoints
+            if endpoint.healthy and endpoint.num_active < self.slots
+        ]
+        if not candidates:
+            return None
+        return min(candidates,
+                   key=lambda endpoint: (endpoint.num_active,
+                                         endpoint.num_leases))
+
+    @contextlib.asynccontextmanager
+    async def lease_async(self):
+        """Leases an endpoint, waiting for a free slot if necessary.
+
+        If no endpoint is healthy, the lease has no endpoint and lists all
+        endpoints as fallbacks, so that the configuration fails with the
+        error of the last one rather than waiting indefinitely.
+        """
+        loop = asyncio.get_event_loop()
+        if self._released is None:
+            self._released = asyncio.Condition()
+        async with self._released:
+            while True:
+                stale = self._get_stale_unhealthy()
+                if stale:
+                    await loop.run_in_executor(None, self.check_health, stale)
+                endpoint = self._select()
+                if endpoint is not None or self.get_num_healthy() == 0:
+                    break
+                await self._released.wait()
+            if endpoint is not None:
+                endpoint.num_active += 1
+                endpoint.num_leases += 1
+        fallbacks = sorted(
+            (other for other in self.endpoints
+             if other is not endpoint and (other.healthy or endpoint is None)),
+            key=lambda other: other.num_active)
+        lease = RemoteLease(endpoint, [other.url for other in fallbacks])
+        try:
+            yield lease
+        finally:
+            if endpoint is not None:
+                endpoint.num_active -= 1
+                if lease.failed:
+                    endpoint.num_failures += 1
+                    await loop.run_in_executor(None, self.check_health,
+                                               [endpoint])
+            async with self._released:
+                self._released.notify_all()
+
+    def get_summary(self) -> str:
+        return 'Remote pool: ' + ', '.join(
+            '%s %d leases, %d failed%s' %
+            (endpoint.url, endpoint.num_leases, endpoint.num_failures,
+             '' if endpoint.healthy else ' (unhealthy)')
+            for endpoint in self.endpoints)
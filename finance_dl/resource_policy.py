@@ -0,0 +1,117 @@
+"""Controls which resources the browser loads for a scraper.
+
+Scrapers only read the DOM of the pages they visit, but by default Chrome also
+downloads every image, font, video and analytics or advertising script on those
+pages.  A resource policy blocks such requests with the Chrome DevTools
+Protocol command `Network.setBlockedURLs`, and optionally selects the `eager`
+page-load strategy, under which navigation completes once the DOM is ready
+rather than after all subresources have loaded.
+
+The policy is chosen with the `resource_policy` configuration key, which may
+be:
+
+- the name of one of the presets in `PRESETS`;
+- a `dict` with any of the keys `base` (the name of a preset to extend),
+  `block_types`, `block_urls` and `page_load_strategy`;
+- a `ResourcePolicy`.
+
+If the key is not specified, the `resource_policy` attribute of the scraper
+class is used, which defaults to `'none'`.  Stricter policies are opt-in per
+configuration, since they may break pages such as captchas.
+
+Not every site tolerates every policy: some login pages depend on third-party
+scripts, and some scrapers wait for the `load` event.  To tune the policy for a
+site, compare the page-load summary logged at the end of a run (bytes
+transferred and page-load time) against a run with `resource_policy='none'`,
+or use `benchmarks/resource_policy.py`.
+"""
+
+from typing import Any, List, NamedTuple, Sequence
+import collections
+
+# URL patterns blocked for each resource type.  `Network.setBlockedURLs`
+# matches whole URLs with `*` wildcards, so each extension is listed both with
+# and without a query string.
+RESOURCE_TYPE_PATTERNS = {
+    'image': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico', 'bmp'],
+    'font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+    'media': ['mp4', 'webm', 'ogg', 'mp3', 'wav', 'm4a'],
+}
+
+# Common analytics, tracking and advertising hosts.
+TRACKER_URL_PATTERNS = [
+    '*://*.google-analytics.com/*',
+    '*://*.googletagmanager.com/*',
+    '*://*.doubleclick.net/*',
+    '*://*.googlesyndication.com/*',
+    '*://*.facebook.net/*',
+    '*://*.hotjar.com/*',
+    '*://*.demdex.net/*',
+    '*://*.omtrdc.net/*',
+    '*://*.quantserve.com/*',
+    '*://*.scorecardresearch.com/*',
+]
+
+PAGE_LOAD_STRATEGIES = ('normal', 'eager')
+
+
+class ResourcePolicy(NamedTuple):
+    name: str = 'none'
+    # Keys of `RESOURCE_TYPE_PATTERNS` to block.
+    block_types: Sequence[str] = ()
+    # Additional URL patterns to block.
+    block_urls: Sequence[str] = ()
+    page_load_strategy: str = 'normal'
+
+    def get_blocked_urls(self) -> List[str]:
+        urls = []
+        for resource_type in self.block_types:
+            for extension in RESOURCE_TYPE_PATTERNS[resource_type]:
+                urls.append('*.%s' % extension)
+                urls.append('*.%s?*' % extension)
+        urls.extend(self.block_urls)
+        return urls
+
+
+PRESETS = collections.OrderedDict([
+    ('none', ResourcePolicy()),
+    ('lean', ResourcePolicy(
+        name='lean',
+        block_types=('image', 'font', 'media'),
+        block_urls=tuple(TRACKER_URL_PATTERNS))),
+    ('lean-eager', ResourcePolicy(
+        name='lean-eager',
+        block_types=('image', 'font', 'media'),
+        block_urls=tuple(TRACKER_URL_PATTERNS),
+        page_load_strategy='eager')),
+])
+
+
+def get_policy(spec: Any) -> ResourcePolicy:
+    """Returns the `ResourcePolicy` specified by a configuration value."""
+    if isinstance(spec, ResourcePolicy):
+        policy = spec
+    elif isinstance(spec, str):
+        if spec not in PRESETS:
+            raise ValueError('Unknown resource policy %r; expected one of %r' %
+                             (spec, list(PRESETS)))
+        policy = PRESETS[spec]
+    elif isinstance(spec, dict):
+        spec = dict(spec)
+        base = get_policy(spec.pop('base', 'none'))
+        unknown = set(spec) - set(ResourcePolicy._fields)
+        if unknown:
+            raise ValueError('Unknown resource policy keys: %r' %
+                             sorted(unknown))
+        spec.setdefault('name', 'custom')
+        policy = base._replace(**spec)
+    else:
+        raise TypeError('Invalid resource policy: %r' % (spec, ))
+    for resource_type in policy.block_types:
+        if resource_type not in RESOURCE_TYPE_PATTERNS:
+            raise ValueError('Unknown resource type %r; expected one of %r' %
+                             (resource_type, list(RESOURCE_TYPE_PATTERNS)))
+    if policy.page_load_strategy not in PAGE_LOAD_STRATEGIES:
+        raise ValueError('Unknown page load strategy %r' %
+                         (policy.page_load_strategy, ))
+    return policy
@@ -0,0 +1,179 @@
+"""Records the history of configuration runs made by `finance_dl.update`.
+
+Each run of a configuration is stored as a row in a SQLite database in the
+update log directory, with its start and end time, how it ended, the peak
+memory use of its process, the number of files and bytes it wrote to its
+`output_directory`, and the number of times the scraper retried.  The time at
+which each configuration is next due, as chosen by `finance_dl.refresh`, is
+stored alongside.
+
+The history is used to start the longest configurations first, and by the
+`status` command to report typical durations and failure rates.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import contextlib
+import math
+import os
+import sqlite3
+import threading
+
+# Number of most recent runs of a configuration used to compute statistics.
+STATS_WINDOW = 50
+
+# Prefix of the status of a run that stopped early when its time budget ran
+# out (see `finance_dl.time_budget`), which is not counted as a failure.
+PARTIAL = 'PARTIAL'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    config TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL,
+    status TEXT,
+    return_code INTEGER,
+    peak_rss_kb INTEGER,
+    files_written INTEGER,
+    bytes_written INTEGER,
+    retries INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_config ON runs (config, start_time);
+CREATE TABLE IF NOT EXISTS schedule (
+    config TEXT PRIMARY KEY,
+    next_due REAL NOT NULL,
+    cadence REAL
+);
+"""
+
+
+class RunStats(NamedTuple):
+    num_runs: int
+    num_failures: int
+    p50_duration: Optional[float]
+    p95_duration: Optional[float]
+
+    @property
+    def failure_rate(self) -> float:
+        return self.num_failures / self.num_runs if self.num_runs else 0.0
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Returns the nearest-rank `p`-th percentile of `values`."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(1, int(math.ceil(p / 100 * len(values))))
+    return values[rank - 1]
+
+
+def is_failure(status: Optional[str]) -> bool:
+    return status != 'SUCCESS' and not (status or '').startswith(PARTIAL)
+
+
+def get_output_stats(output_directory: str, since: float):
+    """Returns `(num_files, num_bytes)` of the files modified since `since`."""
+    num_files = 0
+    num_bytes = 0
+    for dirpath, _, filenames in os.walk(output_directory):
+        for name in filenames:
+            try:
+                statinfo = os.stat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            if statinfo.st_mtime >= since:
+                num_files += 1
+                num_bytes += statinfo.st_size
+    return num_files, num_bytes
+
+
+class RunHistory(object):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A new connection is used for each operation, since runs are recorded
+        # from multiple threads.
+        with self._lock:
+            conn = sqlite3.connect(self.path)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    def start_run(self, config: str, start_time: float) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO runs (config, start_time) VALUES (?, ?)',
+                (config, start_time))
+            return cursor.lastrowid
+
+    def finish_run(self, run_id: int, end_time: float, status: str,
+                   return_code: Optional[int] = None,
+                   peak_rss_kb: Optional[int] = None,
+                   files_written: Optional[int] = None,
+                   bytes_written: Optional[int] = None,
+                   retries: Optional[int] = None):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE runs SET end_time = ?, status = ?, return_code = ?, '
+                'peak_rss_kb = ?, files_written = ?, bytes_written = ?, '
+                'retries = ? WHERE id = ?',
+                (end_time, status, return_code, peak_rss_kb, files_written,
+                 bytes_written, retries, run_id))
+
+    def get_recent_runs(self, config: str,
+                        limit: int = STATS_WINDOW) -> List[sqlite3.Row]:
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return conn.execute(
+                'SELECT * FROM runs WHERE config = ? AND end_time IS NOT NULL '
+                'ORDER BY start_time DESC LIMIT ?', (config, limit)).fetchall()
+
+    def get_stats(self, config: str) -> RunStats:
+        runs = self.get_recent_runs(config)
+        durations = [r['end_time'] - r['start_time'] for r in runs]
+        return RunStats(
+            num_runs=len(runs),
+            num_failures=sum(1 for r in runs if is_failure(r['status'])),
+            p50_duration=percentile(durations, 50),
+            p95_duration=percentile(durations, 95),
+        )
+
+    def get_expected_durations(self,
+                               configs: List[str]) -> Dict[str, float]:
+        """Returns the median duration of the configurations that have run."""
+        result = {}
+        for config in configs:
+            stats = self.get_stats(config)
+            if stats.p50_duration is not None:
+                result[config] = stats.p50_duration
+        return result
+
+    def get_productive_run_times(self, config: str) -> List[float]:
+        """Returns the end times of the successful runs that wrote files."""
+        with self._connect() as conn:
+            return [
+                row[0] for row in conn.execute(
+                    'SELECT end_time FROM runs WHERE config = ? AND '
+                    "status = 'SUCCESS' AND files_written > 0", (config, ))
+            ]
+
+    def set_schedule(self, config: str, next_due: float,
+                     cadence: Optional[float]):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO schedule (config, next_due, cadence) '
+                'VALUES (?, ?, ?)', (config, next_due, cadence))
+
+    def get_schedule(self, config: str) -> Optional[Tuple[float, Optional[float]]]:
+        """Returns `(next_due, cadence)`, or `None` if never scheduled."""
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT next_due, cadence FROM schedule WHERE config = ?',
+                (config, )).fetchone()
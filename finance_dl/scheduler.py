@@ -0,0 +1,239 @@
+"""Schedules configurations according to the resources they need.
+
+Each configuration requires some amount of a set of named resources, given as
+a `dict` mapping resource names to amounts:
+
+- `browser`: a local Chrome session;
+- `remote:<url>`: a session on the remote WebDriver at `<url>`, used instead of
+  `browser` by configurations that specify `connect_remote`;
+- `institution:<name>`: a session with a financial institution, for
+  configurations that specify `institution`;
+- `memory_mb`: the estimated peak memory use, in MB.
+
+A module declares the resources needed by its configurations with a
+module-level `RESOURCES` dict; modules that do not declare any are assumed to
+need a local browser (`DEFAULT_RESOURCES`).  If `RESOURCES` is a literal, it is
+read from the module source, so that `finance_dl.update` does not import the
+module and its dependencies.  A configuration may override or
+extend the module's declaration with a `resources` key.
+
+`finance_dl.update` does not call the configuration functions, which may have
+side effects such as retrieving passwords.  `get_literal_spec` instead reads
+the keys in `SPEC_KEYS` from the source of the function, where they are
+literals in the `dict` it returns, and a configuration module may define a
+`SCHEDULE_<name>` dict with any of these keys for configuration `<name>`,
+which takes precedence, for keys whose values are not literals.
+
+`ResourceScheduler` runs jobs as asyncio tasks in order, starting each job as soon as its
+requirements fit within the remaining capacity of every resource and the total
+number of running jobs is below the parallelism limit.  A job whose
+requirements exceed the total capacity of a resource is run once no other job
+is running, rather than never.  Several batches of jobs may be run at once, as
+by `update daemon`, and share the same capacity.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+import ast
+import asyncio
+import importlib
+import importlib.util
+import inspect
+import math
+import sys
+import textwrap
+
+# Resources assumed for modules that do not declare `RESOURCES`.
+DEFAULT_RESOURCES = {'browser': 1, 'memory_mb': 500}
+
+# Configuration keys used by `finance_dl.update` to schedule a configuration,
+# which are not passed on to the module.
+SCHEDULING_KEYS = ('resources', 'institution', 'refresh_interval_days',
+                   'run_timeout', 'inactivity_timeout', 'cron')
+
+# Configuration keys read by `finance_dl.update` without calling the
+# configuration function.
+SPEC_KEYS = SCHEDULING_KEYS + ('module', 'connect_remote', 'output_directory')
+
+
+def get_available_memory_mb() -> Optional[float]:
+    """Returns the memory available to new processes, or `None` if unknown."""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def get_module_resources(module_name: str) -> Optional[Dict[str, float]]:
+    """Returns the `RESOURCES` declared by module `module_name`, if any."""
+    if module_name not in sys.modules:
+        module_spec = importlib.util.find_spec(module_name)
+        tree = None
+        if (module_spec is not None and module_spec.origin is not None and
+                module_spec.origin.endswith('.py')):
+            try:
+                with open(module_spec.origin, 'rb') as f:
+                    tree = ast.parse(f.read())
+            except (OSError, SyntaxError):
+                pass
+        if tree is not None:
+            for node in tree.body:
+                if isinstance(node, ast.Assign):
+                    targets, value = node.targets, node.value
+                elif isinstance(node, ast.AnnAssign) and node.value is not None:
+                    targets, value = [node.target], node.value
+                else:
+                    continue
+                if any(isinstance(target, ast.Name) and target.id == 'RESOURCES'
+                       for target in targets):
+                    try:
+                        return dict(ast.literal_eval(value))
+                    except ValueError:
+                        # Not a literal; import the module instead.
+                        break
+            else:
+                return None
+    module = importlib.import_module(module_name)
+    return getattr(module, 'RESOURCES', None)
+
+
+def get_literal_spec(function: Callable) -> Dict[str, Any]:
+    """Returns the `SPEC_KEYS` returned by `function`, without calling it.
+
+    Only keys with literal values in a `dict(...)` call or `{...}` display
+    returned by `function` are included.
+    """
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(function)))
+    except (OSError, TypeError, SyntaxError):
+        return {}
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Return):
+            continue
+        value = node.value
+        if (isinstance(value, ast.Call) and isinstance(value.func, ast.Name)
+                and value.func.id == 'dict'):
+            items = [(keyword.arg, keyword.value)
+                     for keyword in value.keywords]
+        elif isinstance(value, ast.Dict):
+            items = [(key.value, item)
+                     for key, item in zip(value.keys, value.values)
+                     if isinstance(key, ast.Constant) and
+                     isinstance(key.value, str)]
+        else:
+            continue
+        spec = {}
+        for key, item in items:
+            if key not in SPEC_KEYS:
+                continue
+            try:
+                spec[key] = ast.literal_eval(item)
+            except (ValueError, TypeError, SyntaxError):
+                pass
+        return spec
+    return {}
+
+
+def get_config_resources(spec: Mapping[str, Any]) -> Dict[str, float]:
+    """Returns the resources needed by the configuration `spec`."""
+    resources = None
+    module_name = spec.get('module')
+    if module_name is not None:
+        resources = get_module_resources(module_name)
+    resources = dict(DEFAULT_RESOURCES if resources is None else resources)
+    resources.update(spec.get('resources', {}))
+    connect_remote = spec.get('connect_remote')
+    if connect_remote is not None and resources.get('browser'):
+        # The browser runs on the remote host, so the local memory estimate
+        # no longer applies.
+        resources['remote:%s' % connect_remote] = resources.pop('browser')
+        resources.pop('memory_mb', None)
+    institution = spec.get('institution')
+    if institution is not None:
+        resources['institution:%s' % institution] = 1
+    return resources
+
+
+class ResourceScheduler(object):
+    """Runs jobs concurrently subject to per-resource limits.
+
+    :param limits: Maps resource names to capacities.  Resources without an
+        entry are unlimited, unless `prefix_limits` specifies a capacity for
+        a prefix of the name, such as `'remote:'`.
+    :param max_parallel: Maximum number of jobs to run at once.
+    """
+
+    def __init__(self, limits: Mapping[str, float],
+                 prefix_limits: Mapping[str, float] = {},
+                 max_parallel: int = 4):
+        self.limits = dict(limits)
+        self.prefix_limits = dict(prefix_limits)
+        self.max_parallel = max_parallel
+        self.usage: Dict[str, float] = {}
+        self.num_running = 0
+        # Created on first use, within the event loop.
+        self._job_finished: Optional[asyncio.Event] = None
+
+    def get_limit(self, resource: str) -> float:
+        if resource in self.limits:
+            return self.limits[resource]
+        for prefix, limit in self.prefix_limits.items():
+            if resource.startswith(prefix):
+                return limit
+        return math.inf
+
+    def fits(self, resources: Mapping[str, float]) -> bool:
+        if self.num_running == 0:
+            return True
+        if self.num_running >= self.max_parallel:
+            return False
+        return all(
+            self.usage.get(name, 0) + amount <= self.get_limit(name)
+            for name, amount in resources.items())
+
+    def _acquire(self, resources: Mapping[str, float]):
+        self.num_running += 1
+        for name, amount in resources.items():
+            self.usage[name] = self.usage.get(name, 0) + amount
+
+    def _release(self, resources: Mapping[str, float]):
+        self.num_running -= 1
+        for name, amount in resources.items():
+            self.usage[name] -= amount
+
+    async def run(self, jobs: List[Tuple[Any, Mapping[str, float]]],
+                  func: Callable[[Any, Mapping[str, float]], Awaitable[None]]):
+        """Awaits `func(job, resources)` for each `(job, resources)` pair.
+
+        Jobs are started in order, except that a job that does not fit is
+        passed over in favor of later jobs that do.  Returns once all jobs
+        have completed.  May be called again before a previous call returns.
+        """
+        pending = list(jobs)
+        tasks = []
+        if self._job_finished is None:
+            self._job_finished = asyncio.Event()
+        job_finished = self._job_finished
+
+        async def run_job(job, resources):
+            try:
+                await func(job, resources)
+            finally:
+                self._release(resources)
+                job_finished.set()
+
+        while pending:
+            for i, (job, resources) in enumerate(pending):
+                if self.fits(resources):
+                    del pending[i]
+                    self._acquire(resources)
+                    tasks.append(
+                        asyncio.ensure_future(run_job(job, resources)))
+                    break
+            else:
+                await job_finished.wait()
+                job_finished.clear()
+        await asyncio.gather(*tasks)
@@ -17,6 +17,15 @@ created.
 which to attempt to retrieve data.  If no existing files are present for this account in
 the output directory, data is retrieved starting from this date.
 
+- `backfill_window_days`: Optional.  An `int` specifying the number of days of
+transactions to request per export.  If specified, a longer range is split into
+windows of this many days, which are exported concurrently to separate files, as
+described in `finance_dl/backfill.py`.  The completed windows are recorded in a
+`.backfill.json` file in the account directory.
+
+- `backfill_parallelism`: Optional.  An `int` specifying the maximum number of
+concurrent exports for a backfill.  Defaults to `4`.
+
 - `lot_details`: Optional. A boolean specifying whether or not to download full cost-basis
 lot details for all positions. Defaults to `False`.
 
@@ -37,6 +46,8 @@ from dataclasses import dataclass
 from typing import Any, List, Mapping, Optional, Set, Tuple
 from urllib.parse import urlencode
 
+from finance_dl import backfill
+from finance_dl import http_client
 from finance_dl import scrape_lib
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
@@ -84,7 +95,10 @@ class SchwabScraper(scrape_lib.Scraper):
         **kwargs,
     ) -> None:
         self.lot_details = kwargs.pop("lot_details", False)
-        super().__init__(use_seleniumrequests=True, **kwargs)
+        self.backfill_window_days = kwargs.pop("backfill_window_days", None)
+        self.backfill_parallelism = kwargs.pop(
+            "backfill_parallelism", backfill.DEFAULT_PARALLELISM)
+        super().__init__(**kwargs)
         self.credentials = credentials
         self.output_directory = output_directory
         self.min_start_date = min_start_date
@@ -131,38 +145,57 @@ class SchwabScraper(scrape_lib.Scraper):
         # any transactions.
         to_date = datetime.date.today() - self.ONE_DAY
         is_checking = len(self.find_visible_elements(By.XPATH, '//a[text() = "Realized Gain / Loss"]')) == 0
-        if to_date <= from_date:
+        ledger = None
+        if self.backfill_window_days is not None:
+            ledger = backfill.Ledger(
+                os.path.join(account_dir, backfill.LEDGER_NAME))
+        if to_date <= from_date and not (ledger and ledger.get_pending()):
             logger.info("No dates to download.")
             return is_checking
         if is_checking:
             logger.info("Downloading banking transactions.")
-            from_str = from_date.strftime("%m/%d/%Y")
-            to_str = to_date.strftime("%m/%d/%Y")
-            account_str = account.number.replace("-", "")
-            url = self.BANK_TXN_API_URL +\
-                f"?AccountId={account_str}" +\
-                f"&FromDate={from_str}&ToDate={to_str}&SelectedFilters=AllTransactions&SortBy=Date" +\
-                f"&SortOrder=D&RecordsPerPage=400&GetDirection=F&dateRange=All"
-            dest_name = f"{from_date.strftime('%Y-%m-%d')}_{to_date.strftime('%Y-%m-%d')}.csv"
-            dest_path = os.path.join(account_dir, dest_name)
-            self.save_url(url, dest_path)
+            transaction_filter = None
         else:
             logger.info("Downloading brokerage transactions.")
-
             num_transaction_types = self.get_num_transaction_types()
             transaction_filter = "|".join(map(str, range(num_transaction_types)))
 
-            from_str = from_date.strftime("%m/%d/%Y")
-            to_str = to_date.strftime("%m/%d/%Y")
-            url = self.TXN_API_URL +\
-                f"?sortSeq=1&sortVal=0&tranFilter={transaction_filter}" +\
-                f"&timeFrame=0&filterSymbol=&fromDate={from_str}&toDate={to_str}" +\
-                "&exportError=&invalidFromDate=&invalidToDate=&symbolExportValue=" +\
-                "&includeOptions=N&displayTotal=true"
+        def get_dest_path(from_date, to_date):
             dest_name = f"{from_date.strftime('%Y-%m-%d')}_{to_date.strftime('%Y-%m-%d')}.csv"
-            dest_path = os.path.join(account_dir, dest_name)
-            self.save_url(url, dest_path)
+            return os.path.join(account_dir, dest_name)
+
+        windows = []
+        if to_date > from_date:
+            windows = [backfill.Window(from_date, to_date)]
+            if ledger is not None:
+                windows = backfill.plan_windows(from_date, to_date,
+                                                self.backfill_window_days)
+        if ledger is not None and (len(windows) > 1 or ledger.get_pending()):
+            # The session is shared by the concurrent exports, since the
+            # browser cannot be used from several threads.
+            session = self.get_http_session()
+
+            def fetch_window(window):
+                http_client.fetch_to_file(
+                    session,
+                    self.get_transactions_url(account, transaction_filter,
+                                              window.start, window.end),
+                    get_dest_path(window.start, window.end))
+                return True
+
+            backfill.run_backfill(ledger, windows, fetch_window,
+                                  parallelism=self.backfill_parallelism,
+                                  should_stop=self.time_budget.is_exhausted)
+            self.time_budget.check(len(ledger.get_pending()),
+                                   'backfill windows')
+        else:
+            for window in windows:
+                self.save_url(
+                    self.get_transactions_url(account, transaction_filter,
+                                              window.start, window.end),
+                    get_dest_path(window.start, window.end))
 
+        if not is_checking:
             logger.info("Downloading positions.")
 
             url = self.POS_API_URL +\
@@ -173,6 +206,28 @@ class SchwabScraper(scrape_lib.Scraper):
             self.save_url(url, dest_path)
         return is_checking
 
+    def get_transactions_url(self, account: Account,
+                             transaction_filter: Optional[str],
+                             from_date: datetime.date,
+                             to_date: datetime.date) -> str:
+        """Returns the export URL of the transactions of a date range.
+
+        `transaction_filter` is `None` for banking accounts.
+        """
+        from_str = from_date.strftime("%m/%d/%Y")
+        to_str = to_date.strftime("%m/%d/%Y")
+        if transaction_filter is None:
+            account_str = account.number.replace("-", "")
+            return self.BANK_TXN_API_URL +\
+                f"?AccountId={account_str}" +\
+                f"&FromDate={from_str}&ToDate={to_str}&SelectedFilters=AllTransactions&SortBy=Date" +\
+                f"&SortOrder=D&RecordsPerPage=400&GetDirection=F&dateRange=All"
+        return self.TXN_API_URL +\
+            f"?sortSeq=1&sortVal=0&tranFilter={transaction_filter}" +\
+            f"&timeFrame=0&filterSymbol=&fromDate={from_str}&toDate={to_str}" +\
+            "&exportError=&invalidFromDate=&invalidToDate=&symbolExportValue=" +\
+            "&includeOptions=N&displayTotal=true"
+
     def download_lot_details(self, pos_dir: str) -> None:
         assert self.current_page == PageType.POSITIONS
 
@@ -205,6 +260,7 @@ class SchwabScraper(scrape_lib.Scraper):
 
         logger.info("Getting lot details.")
 
+        jobs = []
         lot_rows = self.get_elements_wait("table.securityTable tr")
 
         for row in lot_rows:
@@ -226,14 +282,12 @@ class SchwabScraper(scrape_lib.Scraper):
             symbol = sanitize(symbol)
             dest_name = f"{symbol}.csv"
             dest_path = os.path.join(lots_dir, dest_name)
-            self.save_url(f"{self.LOT_API_URL}{qs}", dest_path)
+            jobs.append((f"{self.LOT_API_URL}{qs}", dest_path))
+        http_client.fetch_all(self.get_http_session(), jobs,
+                              max_workers=self.max_http_connections)
 
     def save_url(self, url, dest_path):
-        response = self.driver.request('GET', url)
-        response.raise_for_status()
-        with open(dest_path, 'wb') as fout:
-            fout.write(response.content)
-        logger.info(f"Downloaded {dest_path}")
+        http_client.fetch_to_file(self.get_http_session(), url, dest_path)
 
     def get_num_transaction_types(self) -> int:
         filter_link, = self.get_elements_wait("a.transaction-search-link")
@@ -296,20 +350,13 @@ class SchwabScraper(scrape_lib.Scraper):
         return Account(label=label_span.text, number=number)
 
     def login_if_needed(self) -> None:
-        login_frames = []
-        logout_buttons = []
-
-        def predicate(driver):
-            login_frames.extend(
-                driver.find_elements(By.CSS_SELECTOR, "iframe#lmsSecondaryLogin")
-            )
-            logout_buttons.extend(
-                driver.find_elements(By.CSS_SELECTOR, "button.logout")
-            )
-            return login_frames or logout_buttons
-
-        WebDriverWait(self.driver, 30).until(
-            predicate, message="Did not find either app or login page."
+        login_frames, logout_buttons = self.wait_for_script(
+            """
+            var frames = findAll('css selector', 'iframe#lmsSecondaryLogin');
+            var buttons = findAll('css selector', 'button.logout');
+            return (frames.length || buttons.length) && [frames, buttons];
+            """,
+            message="Did not find either app or login page.",
         )
 
         if logout_buttons:
@@ -361,10 +408,7 @@ class SchwabScraper(scrape_lib.Scraper):
         return last_date
 
     def get_elements_wait(self, selector: str):
-        (elements,) = self.wait_and_return(
-            lambda: self.get_elements(selector)
-        )
-        return elements
+        return self.wait_for_visible(By.CSS_SELECTOR, selector)
 
     def get_elements(self, selector: str):
         return self.find_visible_elements(By.CSS_SELECTOR, selector)
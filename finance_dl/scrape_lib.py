@@ -1,35 +1,387 @@
+import collections
 import contextlib
+import logging
 import os
+import pkgutil
 import time
 import tempfile
 import shutil
-import seleniumrequests
 
 from selenium import webdriver
 from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions
 import signal
+from typing import Dict, List
 
-from selenium.webdriver.remote.webdriver import WebDriver
 
-from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from selenium.common.exceptions import JavascriptException, NoSuchElementException, StaleElementReferenceException, TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 
+from . import downloads
+from . import lazy
+from . import remote_pool
+from . import resource_policy as resource_policy_lib
+from . import tracing
+from . import checkpoint as checkpoint_lib
+from . import chromedriver_log
+from . import time_budget as time_budget_lib
+
+# Only loaded by scrapers that use them.
+seleniumrequests = lazy.import_module('seleniumrequests')
+http_client = lazy.import_module('finance_dl.http_client')
+
+logger = logging.getLogger('scrape_lib')
+
+# Records a single wait performed by a `Scraper`.
+#
+# `engine` is `'poll'` for `Scraper.wait_and_return` and `'event'` for
+# `Scraper.wait_for_script`.  `round_trips` is the number of WebDriver calls
+# made to evaluate the condition (for the `'poll'` engine, the number of times
+# the conditions were evaluated, each of which makes at least one call).
+WaitRecord = collections.namedtuple(
+    'WaitRecord', ['engine', 'message', 'duration', 'round_trips'])
+
+# Records a page load observed by `Scraper.record_page_load`.
+#
+# `duration` is the time in seconds from the start of navigation to the `load`
+# event (or to `DOMContentLoaded`, or to the time of the measurement, if the
+# page has not finished loading), and `transfer_size` is the number of bytes
+# transferred for the document and the subresources loaded so far.
+PageLoadRecord = collections.namedtuple(
+    'PageLoadRecord', ['url', 'duration', 'transfer_size', 'num_resources'])
+
+_PAGE_LOAD_METRICS_SCRIPT = r"""
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var size = nav ? nav.transferSize : 0;
+for (var i = 0; i < resources.length; ++i) size += resources[i].transferSize;
+var end = nav ? (nav.loadEventEnd || nav.domContentLoadedEventEnd ||
+                 performance.now()) : performance.now();
+return [location.href, (end - (nav ? nav.startTime : 0)) / 1000, size,
+        resources.length];
+"""
+
+# JavaScript helper functions available to conditions passed to
+# `Scraper.wait_for_script`.  `isVisible` evaluates the atom used by
+# `WebElement.is_displayed`, which `get_script` substitutes for
+# `/*IS_DISPLAYED*/`.
+_WAIT_SCRIPT_HELPERS = r"""
+var isDisplayed = (/*IS_DISPLAYED*/);
+function isVisible(el) {
+  return isDisplayed(el);
+}
+function findAll(by, locator) {
+  if (by === 'xpath') {
+    var result = document.evaluate(
+        locator, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var nodes = [];
+    for (var i = 0; i < result.snapshotLength; ++i) {
+      nodes.push(result.snapshotItem(i));
+    }
+    return nodes;
+  }
+  if (by === 'id') by = 'css selector', locator = '[id="' + locator + '"]';
+  if (by === 'name') by = 'css selector', locator = '[name="' + locator + '"]';
+  if (by === 'tag name') by = 'css selector';
+  if (by !== 'css selector') throw new Error('Unsupported locator: ' + by);
+  return Array.prototype.slice.call(document.querySelectorAll(locator));
+}
+function findVisible(by, locator) {
+  return findAll(by, locator).filter(isVisible);
+}
+"""
+
+# Resolves once the condition returns a truthy value.  The condition is
+# re-evaluated on every DOM mutation, and additionally at a fixed interval to
+# catch changes (such as CSS transitions) that do not cause mutations.  Only a
+# single WebDriver round trip is needed unless the page navigates.
+#
+# The body of the `condition` function is substituted for `/*CONDITION*/`.
+_WAIT_SCRIPT = _WAIT_SCRIPT_HELPERS + r"""
+function condition() {
+/*CONDITION*/
+}
+var args = arguments[0];
+var timeoutMs = arguments[1];
+var done = arguments[arguments.length - 1];
+var finished = false;
+var observer = null;
+var interval = null;
+var timer = null;
+function finish(result) {
+  if (finished) return;
+  finished = true;
+  if (observer !== null) observer.disconnect();
+  if (interval !== null) clearInterval(interval);
+  if (timer !== null) clearTimeout(timer);
+  done(result);
+}
+function check() {
+  var value;
+  try {
+    value = condition.apply(null, args);
+  } catch (e) {
+    finish(['error', String(e && e.stack || e)]);
+    return;
+  }
+  if (value && (!Array.isArray(value) || value.length)) {
+    finish(['done', value]);
+  }
+}
+check();
+if (!finished) {
+  observer = new MutationObserver(check);
+  observer.observe(document, {childList: true, subtree: true, attributes: true,
+                              characterData: true});
+  interval = setInterval(check, 250);
+  timer = setTimeout(function() { finish(['timeout', null]); }, timeoutMs);
+}
+"""
+
+# Substrings of the messages of errors raised by `execute_async_script` when
+# the page navigates or reloads while the script is waiting, which discards the
+# script.
+_NAVIGATION_ERROR_MESSAGES = (
+    'document unloaded',
+    'execution context was destroyed',
+    'cannot find context',
+    'target frame detached',
+)
+
+# Script timeout of a new WebDriver session, in seconds.
+DEFAULT_SCRIPT_TIMEOUT = 30
+
+_scripts: Dict[str, str] = {}
+
+
+def get_script(template):
+    """Returns `template` with the isDisplayed atom substituted."""
+    script = _scripts.get(template)
+    if script is None:
+        script = _scripts[template] = template.replace(
+            '/*IS_DISPLAYED*/', get_is_displayed_js(), 1)
+    return script
+
+
+def is_navigation_error(e):
+    """Returns `True` if `e` was raised because the page navigated."""
+    if isinstance(e, StaleElementReferenceException):
+        return False
+    message = (e.msg or '').lower()
+    return any(x in message for x in _NAVIGATION_ERROR_MESSAGES)
+
+
+def get_script_timeout(driver):
+    """Returns the script timeout of the session of `driver` in seconds."""
+    try:
+        return driver.timeouts.script
+    except AttributeError:
+        # Selenium 3 cannot query timeouts.  Unless changed, the session uses
+        # the default.
+        return DEFAULT_SCRIPT_TIMEOUT
+
 
 def all_conditions(*conditions):
     return lambda driver: all(condition(driver) for condition in conditions)
 
 
-def extract_table_data(table, header_names, single_header=False):
-    rows = table.find_elements(By.XPATH, 'thead/tr | tbody/tr | tr')
+# Defines `getVisibleText(elem)`, a port of the `bot.dom.getVisibleText` atom
+# that chromedriver evaluates for `WebElement.text`, using the isDisplayed atom
+# for its visibility checks.  Returns `null` for elements containing shadow
+# roots or slots, whose text the atom composes differently.
+_VISIBLE_TEXT_HELPERS = r"""
+var INLINE_DISPLAY_BOXES = ['inline', 'inline-block', 'inline-table', 'none',
+                            'table-cell', 'table-column',
+                            'table-column-group'];
+function getEffectiveStyle(el, name) {
+  var styles = el.ownerDocument.defaultView.getComputedStyle(el, null);
+  return styles ? styles[name] || '' : '';
+}
+function isEmptyOrWhitespace(str) {
+  return /^[\s\xa0]*$/.test(str);
+}
+function trimExcludingNonBreakingSpaces(str) {
+  return str.replace(/^[^\S\xa0]+|[^\S\xa0]+$/g, '');
+}
+function appendVisibleTextLinesFromTextNode(node, lines, whitespace,
+                                           textTransform) {
+  var text = node.nodeValue.replace(/[\u200b\u200e\u200f]/g, '');
+  text = text.replace(/(\r\n|\r|\n)/g, '\n');
+  if (whitespace == 'normal' || whitespace == 'nowrap') {
+    text = text.replace(/\n/g, ' ');
+  }
+  if (whitespace == 'pre' || whitespace == 'pre-wrap') {
+    text = text.replace(/[ \f\t\v\u2028\u2029]/g, '\xa0');
+  } else {
+    text = text.replace(/[\ \f\t\v\u2028\u2029]+/g, ' ');
+  }
+  if (textTransform == 'capitalize') {
+    text = text.replace(/(^|[^\d\p{L}\p{S}])([\p{Ll}|\p{S}])/gu,
+                        function(match, prefix, letter) {
+                          return prefix + letter.toUpperCase();
+                        });
+  } else if (textTransform == 'uppercase') {
+    text = text.toUpperCase();
+  } else if (textTransform == 'lowercase') {
+    text = text.toLowerCase();
+  }
+  var currLine = lines.pop() || '';
+  if (/ $/.test(currLine) && /^ /.test(text)) {
+    text = text.substr(1);
+  }
+  lines.push(currLine + text);
+}
+function appendVisibleTextLinesFromElement(elem, lines) {
+  function currLine() {
+    return lines[lines.length - 1] || '';
+  }
+  var tagName = elem.tagName.toUpperCase();
+  if (tagName == 'BR') {
+    lines.push('');
+    return;
+  }
+  var isTD = tagName == 'TD';
+  var display = getEffectiveStyle(elem, 'display');
+  var isBlock = !isTD && INLINE_DISPLAY_BOXES.indexOf(display) == -1;
+  var previous = elem.previousElementSibling;
+  var previousDisplay = previous ? getEffectiveStyle(previous, 'display') : '';
+  var thisFloat = getEffectiveStyle(elem, 'cssFloat');
+  var runIntoThis = previousDisplay == 'run-in' && thisFloat == 'none';
+  if (isBlock && !runIntoThis && !isEmptyOrWhitespace(currLine())) {
+    lines.push('');
+  }
+  var shown = isDisplayed(elem);
+  var whitespace = null, textTransform = null;
+  if (shown) {
+    whitespace = getEffectiveStyle(elem, 'whiteSpace');
+    textTransform = getEffectiveStyle(elem, 'textTransform');
+  }
+  for (var i = 0; i < elem.childNodes.length; ++i) {
+    var node = elem.childNodes[i];
+    if (node.nodeType == Node.TEXT_NODE && shown) {
+      appendVisibleTextLinesFromTextNode(node, lines, whitespace,
+                                         textTransform);
+    } else if (node.nodeType == Node.ELEMENT_NODE) {
+      appendVisibleTextLinesFromElement(node, lines);
+    }
+  }
+  var line = currLine();
+  if ((isTD || display == 'table-cell') && line && !/ $/.test(line)) {
+    lines[lines.length - 1] += ' ';
+  }
+  if (isBlock && display != 'run-in' && !isEmptyOrWhitespace(line)) {
+    lines.push('');
+  }
+}
+function getVisibleText(elem) {
+  var elements = [elem].concat(
+      Array.prototype.slice.call(elem.querySelectorAll('*')));
+  for (var i = 0; i < elements.length; ++i) {
+    if (elements[i].shadowRoot || elements[i].tagName.toUpperCase() == 'SLOT') {
+      return null;
+    }
+  }
+  var lines = [''];
+  appendVisibleTextLinesFromElement(elem, lines);
+  var text = lines.map(trimExcludingNonBreakingSpaces).join('\n');
+  return trimExcludingNonBreakingSpaces(text).replace(/\xa0/g, ' ');
+}
+"""
+
+# Returns the text and `colspan` attribute of each `th`/`td` cell of each row of
+# the table `arguments[0]`, using the same row and cell selection as
+# `extract_table_data`, or `null` if the text of a cell cannot be determined
+# by `getVisibleText`.
+_TABLE_DATA_SCRIPT = _WAIT_SCRIPT_HELPERS + _VISIBLE_TEXT_HELPERS + r"""
+var table = arguments[0];
+var rows = document.evaluate(
+    'thead/tr | tbody/tr | tr', table, null,
+    XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+var result = [];
+for (var i = 0; i < rows.snapshotLength; ++i) {
+  var row = rows.snapshotItem(i);
+  var cells = [];
+  for (var j = 0; j < row.children.length; ++j) {
+    var cell = row.children[j];
+    var name = cell.tagName.toLowerCase();
+    if (name !== 'th' && name !== 'td') continue;
+    var text = getVisibleText(cell);
+    if (text === null) return null;
+    cells.push([text, cell.getAttribute('colspan')]);
+  }
+  result.push(cells);
+}
+return result;
+"""
+
+# Returns the displayed elements among the nearest `table` ancestors of text
+# nodes matched by every XPath expression in `arguments[0]`.
+_TABLES_BY_HEADERS_SCRIPT = _WAIT_SCRIPT_HELPERS + r"""
+var result = null;
+arguments[0].forEach(function(xpath) {
+  var tables = findAll('xpath', xpath).filter(isVisible);
+  result = result === null ? tables : result.filter(function(table) {
+    return tables.indexOf(table) !== -1;
+  });
+});
+return result || [];
+"""
+
+
+def get_table_rows(table):
+    """Returns the cells of each row of `table` as `(text, colspan)` pairs.
+
+    The text of each cell is meant to be the same as its `WebElement.text`.
+    Uses a single WebDriver round trip regardless of the size of the table,
+    unless the table contains shadow DOM, in which case each cell is queried
+    individually.
+
+    Not yet the default of `extract_table_data`: the equivalence with
+    `get_table_rows_by_element` is only checked by the browser tests in
+    `tests/test_scrape_lib.py` and by `benchmarks/table_extraction.py`, which
+    require Chrome.
+    """
+    rows = table.parent.execute_script(get_script(_TABLE_DATA_SCRIPT), table)
+    if rows is None:
+        return get_table_rows_by_element(table)
+    return rows
+
+
+def get_table_rows_by_element(table):
+    """Returns the same cells as `get_table_rows`, querying each individually."""
+    rows = []
+    for row in table.find_elements(By.XPATH, 'thead/tr | tbody/tr | tr'):
+        rows.append([(x.text, x.get_attribute('colspan'))
+                     for x in row.find_elements(By.XPATH, 'th | td')])
+    return rows
+
+
+def extract_table_data(table, header_names, single_header=False,
+                       get_rows=get_table_rows_by_element):
+    """Extracts `[(header, value)]` lists from the WebElement `table`.
+
+    :param get_rows: Function returning the rows of `table`; pass
+        `get_table_rows` to use a single WebDriver round trip.
+    """
+    return extract_table_data_from_rows(get_rows(table), header_names,
+                                        single_header=single_header)
+
+
+def extract_table_data_from_rows(rows, header_names, single_header=False):
+    """Extracts `[(header, value)]` lists from the rows of a table.
+
+    :param rows: List of rows, each a list of `(text, colspan)` cells as
+        returned by `get_table_rows`.
+    """
     headers = []
     seen_data = False
     data = []
     for row in rows:
-        cell_elements = row.find_elements(By.XPATH, 'th | td')
-        cell_values = [x.text.strip() for x in cell_elements]
+        cell_values = [text.strip() for text, _ in row]
+        cell_colspans = [1 if colspan is None else int(colspan)
+                         for _, colspan in row]
         is_header_values = [x in header_names for x in cell_values if x]
         if len(is_header_values) == 0:
             is_header = True
@@ -46,12 +398,7 @@ def extract_table_data(table, header_names, single_header=False):
             cur_header = dict()
             headers.append(cur_header)
             cur_col = 0
-            for text, el in zip(cell_values, cell_elements):
-                colspan = el.get_attribute('colspan')
-                if colspan is None:
-                    colspan = 1
-                else:
-                    colspan = int(colspan)
+            for text, colspan in zip(cell_values, cell_colspans):
                 for span in range(colspan):
                     if text:
                         cur_header[cur_col] = text
@@ -60,12 +407,7 @@ def extract_table_data(table, header_names, single_header=False):
             seen_data = True
             cur_col = 0
             cur_data = []
-            for text, el in zip(cell_values, cell_elements):
-                colspan = el.get_attribute('colspan')
-                if colspan is None:
-                    colspan = 1
-                else:
-                    colspan = int(colspan)
+            for text, colspan in zip(cell_values, cell_colspans):
                 header_parts = []
                 for span in range(colspan):
                     for header in headers:
@@ -81,35 +423,79 @@ def extract_table_data(table, header_names, single_header=False):
 
 
 def find_table_by_headers(scraper, headers):
-    tables = None
-    for header in headers:
-        new_tables = scraper.find_visible_elements_by_descendant_partial_text(
-            header, 'table')
-        if tables is None:
-            tables = set(new_tables)
-        else:
-            tables &= set(new_tables)
-    return tables
+    xpaths = [
+        "//text()[contains(.,%r)]/ancestor::*[self::%s][1]" % (header, 'table')
+        for header in headers
+    ]
+    return set(
+        scraper.driver.execute_script(get_script(_TABLES_BY_HEADERS_SCRIPT),
+                                      xpaths))
 
 
-# https://stackoverflow.com/questions/8344776/can-selenium-interact-with-an-existing-browser-session
-def attach_to_session(executor_url, session_id):
-    original_execute = WebDriver.execute
+# Environment variable through which `finance_dl.update` hands a pre-launched
+# browser session from its `browser_pool.BrowserPool` to a config subprocess.
+# The value has the form `<executor-url> <session-id>`.
+POOLED_SESSION_ENV_VAR = 'FINANCE_DL_POOLED_SESSION'
 
-    def new_command_execute(self, command, params=None):
-        if command == "newSession":
-            # Mock the response
-            return {'success': 0, 'value': None, 'sessionId': session_id}
-        else:
-            return original_execute(self, command, params)
 
-    # Patch the function before creating the driver object
-    WebDriver.execute = new_command_execute
-    driver = webdriver.Remote(command_executor=executor_url,
-                              desired_capabilities={})
+def get_pooled_session():
+    """Returns the `(executor_url, session_id)` leased to this process, if any."""
+    value = os.getenv(POOLED_SESSION_ENV_VAR)
+    if not value:
+        return None
+    executor_url, session_id = value.split(' ', 1)
+    return executor_url, session_id
+
+
+def get_remote_endpoints(connect_remote: str) -> List[str]:
+    """Returns the remote WebDriver endpoints to try, in order.
+
+    When run by `finance_dl.update` with a remote endpoint pool, these are the
+    endpoints passed in `remote_pool.ENDPOINTS_ENV_VAR`, if `connect_remote`
+    uses the pool.
+    """
+    pooled = os.getenv(remote_pool.ENDPOINTS_ENV_VAR)
+    if pooled:
+        return pooled.split()
+    if connect_remote == remote_pool.POOL:
+        raise ValueError(
+            'connect_remote=%r requires running with update --remote-endpoint'
+            % remote_pool.POOL)
+    return [connect_remote]
+
+
+def execute_cdp_cmd(driver, cmd, params=None):
+    """Executes a Chrome DevTools Protocol command.
+
+    Unlike `webdriver.Chrome.execute_cdp_cmd`, this also works for drivers
+    obtained from `attach_to_session`.
+    """
+    driver.command_executor._commands['executeCdpCommand'] = (
+        'POST', '/session/$sessionId/goog/cdp/execute')
+    return driver.execute('executeCdpCommand', {
+        'cmd': cmd,
+        'params': {} if params is None else params
+    })['value']
+
+
+# https://stackoverflow.com/questions/8344776/can-selenium-interact-with-an-existing-browser-session
+def attach_to_session(executor_url, session_id, driver_class=webdriver.Remote,
+                      **kwargs):
+    # Rather than patching `WebDriver.execute`, which would affect any other
+    # driver created in the same process, even if creating this one fails,
+    # the `newSession` command is intercepted in a subclass.
+    class AttachedDriver(driver_class):
+        def execute(self, command, params=None):
+            if command == "newSession":
+                # Mock the response
+                return {'success': 0, 'value': None, 'sessionId': session_id}
+            return super().execute(command, params)
+
+    AttachedDriver.__name__ = driver_class.__name__
+    AttachedDriver.__qualname__ = driver_class.__qualname__
+    driver = AttachedDriver(command_executor=executor_url,
+                            desired_capabilities={}, **kwargs)
     driver.session_id = session_id
-    # Replace the patched function with original function
-    WebDriver.execute = original_execute
     return driver
 
 
@@ -125,59 +511,263 @@ def is_displayed(element):
         return False
 
 
+_is_displayed_js = None
+_is_displayed_script = None
+
+
+def get_is_displayed_js():
+    """Returns the source of the atom used by `WebElement.is_displayed`."""
+    global _is_displayed_js
+    if _is_displayed_js is None:
+        _is_displayed_js = pkgutil.get_data('selenium.webdriver.remote',
+                                            'isDisplayed.js').decode('utf8')
+    return _is_displayed_js
+
+# Returns the displayed `frame` and `iframe` elements of the current browsing
+# context.  `%s` is replaced by the isDisplayed atom.
+_LIST_FRAMES_SCRIPT = """
+var isDisplayed = (%s);
+return Array.prototype.filter.call(
+    document.querySelectorAll('frame, iframe'),
+    function(el) { return isDisplayed(el); });
+"""
+
+# Returns a `[token, generation]` signature of the current document.  The token
+# identifies the document, and the generation is incremented by an observer
+# whenever frames may have been added, removed, shown or hidden.
+_FRAME_SIGNATURE_SCRIPT = """
+var state = window.__financeDlFrameIndex;
+if (!state) {
+  state = window.__financeDlFrameIndex = {
+    token: Math.random().toString(36).slice(2),
+    generation: 0,
+  };
+  new MutationObserver(function(mutations) {
+    for (var i = 0; i < mutations.length; ++i) {
+      var m = mutations[i];
+      if (m.type === 'attributes') {
+        ++state.generation;
+        return;
+      }
+      var nodes = Array.prototype.concat.call(
+          Array.prototype.slice.call(m.addedNodes),
+          Array.prototype.slice.call(m.removedNodes));
+      for (var j = 0; j < nodes.length; ++j) {
+        var node = nodes[j];
+        if (node.nodeType === 1 &&
+            (node.matches('frame, iframe') ||
+             node.querySelector('frame, iframe'))) {
+          ++state.generation;
+          return;
+        }
+      }
+    }
+  }).observe(document, {childList: true, subtree: true, attributes: true,
+                        attributeFilter: ['style', 'class', 'hidden']});
+}
+return [state.token, state.generation];
+"""
+
+
+def filter_displayed(driver, elements):
+    """Returns the elements of `elements` that are displayed.
+
+    Evaluates the same visibility check as `WebElement.is_displayed` for all of
+    the elements in a single script call.  If any element has gone stale, falls
+    back to checking each element individually with `is_displayed`.
+    """
+    global _is_displayed_script
+    if _is_displayed_script is None:
+        _is_displayed_script = (
+            'var isDisplayed = (%s);'
+            'return arguments[0].map(function(el) { return isDisplayed(el); });'
+            % get_is_displayed_js())
+    if not elements:
+        return []
+    try:
+        displayed = driver.execute_script(_is_displayed_script, list(elements))
+    except StaleElementReferenceException:
+        return [x for x in elements if is_displayed(x)]
+    return [x for x, d in zip(elements, displayed) if d]
+
+
+# Chrome flags of the `'lean'` launch profile, which disable features that
+# slow down startup or use the network in the background but that no scraper
+# relies on.  Used only by configurations that specify
+# `launch_profile='lean'`.
+LEAN_CHROME_ARGS = [
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-extensions',
+    '--disable-sync',
+    '--disable-breakpad',
+    '--disable-domain-reliability',
+    '--disable-client-side-phishing-detection',
+    '--disable-features=Translate,OptimizationHints,MediaRouter',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--metrics-recording-only',
+    '--mute-audio',
+    '--password-store=basic',
+]
+
+LAUNCH_PROFILES = {
+    'default': [],
+    'lean': LEAN_CHROME_ARGS,
+}
+
+# Environment variable specifying the path to a `chrome-headless-shell`
+# binary, which starts faster than the full Chrome binary.
+HEADLESS_SHELL_ENV_VAR = 'CHROME_HEADLESS_SHELL_BINARY'
+
+
+def get_chrome_options(headless=True, download_dir=None, profile_dir=None,
+                       chromedriver_args=[], launch_profile='default',
+                       chrome_binary=None, headless_shell_binary=None):
+    """Returns the options used to launch Chrome for a `Scraper`.
+
+    :param launch_profile: Key of `LAUNCH_PROFILES` specifying additional
+        flags to pass to Chrome.  The `'default'` profile adds none; a
+        configuration opts in to the `'lean'` profile by specifying
+        `launch_profile='lean'`.
+    :param chrome_binary: Path to the Chrome binary, defaults to the value of
+        the `CHROMEDRIVER_CHROME_BINARY` environment variable.
+    :param headless_shell_binary: Path to a `chrome-headless-shell` binary to
+        use instead of `chrome_binary` if `headless` is `True`, defaults to the
+        value of the `CHROME_HEADLESS_SHELL_BINARY` environment variable.
+    """
+    if launch_profile not in LAUNCH_PROFILES:
+        raise ValueError('Unknown launch profile %r; expected one of %r' %
+                         (launch_profile, sorted(LAUNCH_PROFILES)))
+    chrome_options = webdriver.ChromeOptions()
+    if chrome_binary is None:
+        chrome_binary = os.getenv('CHROMEDRIVER_CHROME_BINARY')
+    if headless:
+        if headless_shell_binary is None:
+            headless_shell_binary = os.getenv(HEADLESS_SHELL_ENV_VAR)
+        if headless_shell_binary:
+            chrome_binary = headless_shell_binary
+    if chrome_binary:
+        chrome_options.binary_location = chrome_binary
+    chrome_options.add_experimental_option('excludeSwitches', [
+        'enable-automation',
+        'load-extension',
+        'load-component-extension',
+        'ignore-certificate-errors',
+        'test-type',
+    ])
+    chrome_options.add_argument('--no-sandbox')
+    for arg in LAUNCH_PROFILES[launch_profile]:
+        chrome_options.add_argument(arg)
+    for arg in chromedriver_args:
+        chrome_options.add_argument(arg)
+    if profile_dir is not None:
+        chrome_options.add_argument('user-data-dir=%s' % profile_dir)
+        if not os.path.exists(profile_dir):
+            os.makedirs(profile_dir)
+    prefs = {}
+    prefs['plugins.plugins_disabled'] = [
+        'Chrome PDF Viewer', 'Chromium PDF Viewer'
+    ]
+    prefs['plugins.always_open_pdf_externally'] = True
+    if download_dir is not None:
+        prefs['download.default_directory'] = download_dir
+    chrome_options.add_experimental_option('prefs', prefs)
+    if headless:
+        chrome_options.add_argument('headless')
+    return chrome_options
+
+
 class Scraper(object):
+    # Default resource policy of this scraper, overridden by the
+    # `resource_policy` configuration key.  See `resource_policy.py`.
+    resource_policy = 'none'
+
     def __init__(self, download_dir=None, connect=None, connect_remote=None,
                  chromedriver_bin='finance-dl-chromedriver-wrapper',
                  headless=True,
                  use_seleniumrequests=False, requests_proxy_host='127.0.0.1',
                  session_id=None, profile_dir=None,
-                 capture_network_requests=False, chromedriver_args=[]):
+                 capture_network_requests=False, chromedriver_args=[],
+                 batch_visibility_checks=True,
+                 max_http_connections=None,
+                 resource_policy=None, launch_profile='default',
+                 chrome_binary=None, headless_shell_binary=None,
+                 chromedriver_log_level=None):
 
         self.download_dir = download_dir
+        self.attached = False
+        self.startup_duration = 0.0
+        self.batch_visibility_checks = batch_visibility_checks
+        self._max_http_connections = max_http_connections
+        self.frame_index_max_age = 5
+        self._frame_index = None
+        self.checkpoint = checkpoint_lib.Checkpoint()
+        self.time_budget = time_budget_lib.TimeBudget()
+        self.wait_records: List[WaitRecord] = []
+        self.page_load_records: List[PageLoadRecord] = []
+        self.resource_policy = resource_policy_lib.get_policy(
+            resource_policy if resource_policy is not None else
+            type(self).resource_policy)
+        page_load_strategy = self.resource_policy.page_load_strategy
+
+        if connect is None and session_id is None:
+            pooled_session = get_pooled_session()
+            # A pooled browser is headless and uses a throwaway profile, so it
+            # is only suitable when no special browser setup is requested.
+            if (pooled_session is not None and headless and
+                    connect_remote is None and profile_dir is None and
+                    not capture_network_requests and not chromedriver_args and
+                    page_load_strategy == 'normal'):
+                connect, session_id = pooled_session
 
         if connect is not None and session_id is not None:
             print('Connecting to existing browser: %s %s' % (connect,
                                                              session_id))
-            self.driver = attach_to_session(connect, session_id)
+            if use_seleniumrequests:
+                self.driver = attach_to_session(
+                    connect, session_id, driver_class=seleniumrequests.Remote,
+                    proxy_host=requests_proxy_host)
+            else:
+                self.driver = attach_to_session(connect, session_id)
+            self.attached = True
+            self._install_tracer()
+            if page_load_strategy != 'normal':
+                logger.warning(
+                    'Cannot use page load strategy %r with an existing session',
+                    page_load_strategy)
+            # Also clears any URLs blocked by a previous user of the session.
+            self._apply_resource_policy()
+            if download_dir is not None:
+                execute_cdp_cmd(self.driver, 'Browser.setDownloadBehavior', {
+                    'behavior': 'allow',
+                    'downloadPath': download_dir
+                })
             return
 
         original_sigint_handler = signal.getsignal(signal.SIGINT)
         signal.signal(signal.SIGINT, signal.SIG_IGN)
 
         self.chromedriver_bin = chromedriver_bin
-        chrome_options = webdriver.ChromeOptions()
-        if connect_remote is None:
-            chrome_options.binary_location = os.getenv("CHROMEDRIVER_CHROME_BINARY")
-        log_path = os.getenv("TMPLOG", "/tmp/chromedriver.log")
-        service_args = ['--verbose', f'--log-path={log_path}', '--no-sandbox']
-        caps = DesiredCapabilities.CHROME
+        start_time = time.time()
+        if connect_remote is not None:
+            # The binaries are located on the remote host.
+            chrome_binary = ''
+            headless_shell_binary = ''
+        chrome_options = get_chrome_options(
+            headless=headless, download_dir=download_dir,
+            profile_dir=profile_dir, chromedriver_args=chromedriver_args,
+            launch_profile=launch_profile, chrome_binary=chrome_binary,
+            headless_shell_binary=headless_shell_binary)
+        service_args = chromedriver_log.get_service_args(
+            log_level=chromedriver_log_level)
+        caps = dict(DesiredCapabilities.CHROME)
+        caps['pageLoadStrategy'] = page_load_strategy
+        chrome_options.set_capability('pageLoadStrategy', page_load_strategy)
         if capture_network_requests:
             caps['loggingPrefs'] = {'performance': 'ALL'}
             caps['goog:loggingPrefs'] = {'performance': 'ALL'}
-        chrome_options.add_experimental_option('excludeSwitches', [
-            'enable-automation',
-            'load-extension',
-            'load-component-extension',
-            'ignore-certificate-errors',
-            'test-type',
-        ])
-        chrome_options.add_argument('--no-sandbox')
-        for arg in chromedriver_args:
-            chrome_options.add_argument(arg)
-        if profile_dir is not None:
-            chrome_options.add_argument('user-data-dir=%s' % profile_dir)
-            if not os.path.exists(profile_dir):
-                os.makedirs(profile_dir)
-        prefs = {}
-        prefs['plugins.plugins_disabled'] = [
-            'Chrome PDF Viewer', 'Chromium PDF Viewer'
-        ]
-        prefs['plugins.always_open_pdf_externally'] = True
-        if download_dir is not None:
-            prefs['download.default_directory'] = download_dir
-        chrome_options.add_experimental_option('prefs', prefs)
-        if headless:
-            chrome_options.add_argument('headless')
 
         if connect_remote is None:
             if use_seleniumrequests:
@@ -193,46 +783,162 @@ class Scraper(object):
         else:
             # connect to remote webdriver, e.g. standalone Docker container
             # https://stackoverflow.com/questions/45323271/how-to-run-selenium-with-chrome-in-docker
-            if use_seleniumrequests:
-                self.driver = seleniumrequests.Remote(
-                    connect_remote, options=chrome_options,
-                    proxy_host=requests_proxy_host
-                    )
-            else:
-                self.driver = webdriver.Remote(
-                    connect_remote, options=chrome_options)
-        
+            endpoints = get_remote_endpoints(connect_remote)
+            for i, endpoint in enumerate(endpoints):
+                try:
+                    if use_seleniumrequests:
+                        self.driver = seleniumrequests.Remote(
+                            endpoint, options=chrome_options,
+                            proxy_host=requests_proxy_host
+                            )
+                    else:
+                        self.driver = webdriver.Remote(
+                            endpoint, options=chrome_options)
+                    break
+                except Exception as e:
+                    # Connection errors are raised by urllib3 rather than as
+                    # `WebDriverException`.
+                    if i + 1 == len(endpoints):
+                        raise
+                    logger.warning(
+                        'Failed to start session on %s, trying %s: %r',
+                        endpoint, endpoints[i + 1], e)
+
+        self.startup_duration = time.time() - start_time
+        logger.info('Started browser in %.2fs (launch profile %r)',
+                    self.startup_duration, launch_profile)
         print(' --connect=%s --session-id=%s' %
               (self.driver.command_executor._url, self.driver.session_id))
         signal.signal(signal.SIGINT, original_sigint_handler)
+        self._install_tracer()
+        if self.resource_policy.get_blocked_urls():
+            self._apply_resource_policy()
+
+    def _apply_resource_policy(self):
+        urls = self.resource_policy.get_blocked_urls()
+        try:
+            execute_cdp_cmd(self.driver, 'Network.enable', {})
+            execute_cdp_cmd(self.driver, 'Network.setBlockedURLs',
+                            {'urls': urls})
+        except WebDriverException as e:
+            logger.warning('Failed to apply resource policy %r: %s',
+                           self.resource_policy.name, e)
+            return
+        if urls:
+            logger.info('Resource policy %r: blocking %d URL patterns',
+                        self.resource_policy.name, len(urls))
+
+    def _install_tracer(self):
+        tracer = tracing.get_active_tracer()
+        if tracer is not None:
+            tracer.install(self.driver, scraper=self)
 
     def check_after_wait(self):
         """Function called after each wait."""
         pass
 
+    def is_session_healthy(self):
+        """Returns `True` if the browser session still responds."""
+        try:
+            self.driver.window_handles
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @property
+    def max_http_connections(self) -> int:
+        """Maximum number of concurrent requests made over HTTP sessions."""
+        if self._max_http_connections is None:
+            return http_client.DEFAULT_MAX_WORKERS
+        return self._max_http_connections
+
+    def get_http_session(self, headers={}):
+        """Returns a `requests.Session` authenticated like the browser.
+
+        The session carries the cookies of all domains known to the browser
+        and its user agent, as well as any additional `headers`, such as a
+        CSRF token.  It is a snapshot: cookies set by the browser afterwards
+        are not reflected.
+        """
+        try:
+            cookies = execute_cdp_cmd(self.driver, 'Network.getAllCookies',
+                                      {})['cookies']
+        except WebDriverException:
+            # Only cookies for the current domain are available.
+            cookies = self.driver.get_cookies()
+        user_agent = self.driver.execute_script('return navigator.userAgent;')
+        return http_client.make_session(
+            cookies=cookies, user_agent=user_agent, headers=headers,
+            max_connections=self.max_http_connections)
+
+    def discard_downloads(self):
+        """Removes any files left in `download_dir`."""
+        if self.download_dir is None:
+            return
+        for name in os.listdir(self.download_dir):
+            path = os.path.join(self.download_dir, name)
+            if os.path.isfile(path):
+                os.remove(path)
+
     def get_downloaded_file(self):
-        names = os.listdir(self.download_dir)
-        partial_names = []
-        other_names = []
-        for name in names:
-            if name.endswith('.part') or name.endswith('.crdownload') or name.startswith('.com.google.Chrome'):
-                partial_names.append(name)
-            else:
-                other_names.append(name)
-        if len(other_names) == 0:
+        names = downloads.list_completed_downloads(self.download_dir)
+        if len(names) == 0:
             return None
-        if len(other_names) > 1:
+        if len(names) > 1:
             raise RuntimeError(
-                'More than one downloaded file: %r' % other_names)
-        # if len(partial_names) > 0:
-        #     raise RuntimeError('Partial download files remain: %r' % partial_names)
-        path = os.path.join(self.download_dir, other_names[0])
+                'More than one downloaded file: %r' % names)
+        path = os.path.join(self.download_dir, names[0])
         with open(path, 'rb') as f:
             data = f.read()
         if len(data) == 0:
             return None
         os.remove(path)
-        return other_names[0], data
+        return names[0], data
+
+    def wait_for_download(self, timeout=30):
+        """Waits for a download to complete.
+
+        Returns as soon as the browser finishes the download, without polling.
+        The downloaded file is left in `download_dir`; the caller must move it
+        (e.g. with `save_download` or `downloads.move_into_place`) or remove
+        it before waiting for the next download.
+
+        :return: Tuple `(name, path)` of the downloaded file.
+        """
+        start_time = time.time()
+        try:
+            name, path = downloads.wait_for_download(self.download_dir,
+                                                     timeout=timeout)
+        except TimeoutError as e:
+            raise TimeoutException(str(e))
+        logger.info('Downloaded %s (%d bytes) in %.1fs', name,
+                    os.path.getsize(path), time.time() - start_time)
+        self.check_after_wait()
+        return name, path
+
+    def save_download(self, dest_path, timeout=30):
+        """Waits for a download to complete and moves it to `dest_path`.
+
+        :return: The name of the downloaded file.
+        """
+        name, path = self.wait_for_download(timeout=timeout)
+        downloads.move_into_place(path, dest_path)
+        return name
+
+    def read_download(self, timeout=30):
+        """Waits for a download to complete and returns its contents.
+
+        The downloaded file is removed.  Intended for downloads that are parsed
+        rather than saved.
+
+        :return: Tuple `(name, data)`.
+        """
+        name, path = self.wait_for_download(timeout=timeout)
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.remove(path)
+        return name, data
 
     # See http://www.obeythetestinggoat.com/how-to-get-selenium-to-wait-for-page-load-after-a-click.html
     @contextlib.contextmanager
@@ -243,6 +949,31 @@ class Scraper(object):
             expected_conditions.staleness_of(old_page),
             message='waiting for page to load')
         self.check_after_wait()
+        self.record_page_load()
+
+    def record_page_load(self):
+        """Records the load time and transfer size of the current page."""
+        try:
+            record = PageLoadRecord(
+                *self.driver.execute_script(_PAGE_LOAD_METRICS_SCRIPT))
+        except WebDriverException:
+            return
+        self.page_load_records.append(record)
+        return record
+
+    def log_page_load_summary(self):
+        """Logs the load time and transfer size of the pages recorded so far."""
+        records = self.page_load_records
+        if not records:
+            return
+        logger.info(
+            'Page loads (resource policy %r): %d pages, %.1fs total, '
+            '%.2fs mean, %d bytes transferred, %d resources',
+            self.resource_policy.name, len(records),
+            sum(r.duration for r in records),
+            sum(r.duration for r in records) / len(records),
+            sum(r.transfer_size for r in records),
+            sum(r.num_resources for r in records))
 
     @contextlib.contextmanager
     def wait_for_new_url(self, timeout=30):
@@ -259,15 +990,112 @@ class Scraper(object):
     def wait_and_return(self, *conditions, timeout=30,
                         message='Waiting to match conditions'):
         results = [None]
+        num_polls = 0
 
         def predicate(driver):
+            nonlocal num_polls
+            num_polls += 1
             results[0] = tuple(condition() for condition in conditions)
             return all(results[0])
 
-        WebDriverWait(self.driver, timeout).until(predicate, message=message)
+        start_time = time.time()
+        try:
+            WebDriverWait(self.driver, timeout).until(predicate,
+                                                      message=message)
+        finally:
+            self.wait_records.append(
+                WaitRecord('poll', message,
+                           time.time() - start_time, num_polls))
         self.check_after_wait()
         return results[0]
 
+    def wait_for_script(self, condition, *args, timeout=30,
+                        message='Waiting for script condition'):
+        """Waits until a JavaScript condition is satisfied within the page.
+
+        Rather than polling from Python, this installs a `MutationObserver` in
+        the page and returns as soon as the condition holds.
+
+        :param condition: Body of a JavaScript function, called with `args`, that
+            returns a truthy value (other than an empty array) once satisfied.
+            The helper functions `isVisible(el)`, `findAll(by, locator)` and
+            `findVisible(by, locator)` are in scope, where `by` is one of the
+            `By` constants `XPATH`, `CSS_SELECTOR`, `ID`, `NAME` or `TAG_NAME`.
+        :param args: Arguments passed to the condition.  `WebElement` arguments
+            are converted to DOM elements.
+        :param timeout: Timeout in seconds.
+
+        :return: The value returned by the condition.  DOM elements are
+            converted to `WebElement` objects.
+        :raises JavascriptException: If the condition throws an exception.
+        """
+        script = get_script(_WAIT_SCRIPT).replace('/*CONDITION*/', condition, 1)
+        start_time = time.time()
+        deadline = start_time + timeout
+        # The script itself enforces the timeout; allow some slack for the
+        # round trip.
+        previous_script_timeout = get_script_timeout(self.driver)
+        script_timeout = timeout + 5
+        if previous_script_timeout >= script_timeout:
+            script_timeout = None
+        else:
+            self.driver.set_script_timeout(script_timeout)
+        num_round_trips = 0
+        try:
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutException(message)
+                num_round_trips += 1
+                try:
+                    status, value = self.driver.execute_async_script(
+                        script, list(args), int(remaining * 1000))
+                except WebDriverException as e:
+                    if not is_navigation_error(e):
+                        raise
+                    # The page navigated or was reloaded while waiting, which
+                    # discards the observer.  Re-install it in the new page.
+                    time.sleep(0.05)
+                    continue
+                if status == 'error':
+                    raise JavascriptException(
+                        'Error evaluating wait condition: %s' % value)
+                if status == 'done':
+                    break
+        finally:
+            if script_timeout is not None:
+                self.driver.set_script_timeout(previous_script_timeout)
+            self.wait_records.append(
+                WaitRecord('event', message,
+                           time.time() - start_time, num_round_trips))
+        self.check_after_wait()
+        return value
+
+    def wait_for_visible(self, by_method, locator, timeout=30):
+        """Waits until at least one element matching the locator is visible.
+
+        Event-driven equivalent of
+        `wait_and_return(lambda: self.find_visible_elements(by_method, locator))`.
+
+        :return: The non-empty list of visible matching elements.
+        """
+        return self.wait_for_script(
+            'return findVisible(arguments[0], arguments[1]);', by_method,
+            locator, timeout=timeout,
+            message='Waiting for visible %r' % ((by_method, locator), ))
+
+    def log_wait_summary(self):
+        """Logs the latency and number of round trips of all waits so far."""
+        by_engine: Dict[str, List[WaitRecord]] = collections.OrderedDict()
+        for record in self.wait_records:
+            by_engine.setdefault(record.engine, []).append(record)
+        for engine, records in by_engine.items():
+            logger.info(
+                'Waits (%s): %d waits, %.1fs total, %.2fs mean, %d round trips',
+                engine, len(records), sum(r.duration for r in records),
+                sum(r.duration for r in records) / len(records),
+                sum(r.round_trips for r in records))
+
     def wait_and_locate(self, *locators, timeout=30, only_displayed=False):
         conditions = []
         for locator in locators:
@@ -284,42 +1112,121 @@ class Scraper(object):
             *conditions, timeout=timeout,
             message='Waiting to locate %r' % (locators, ))
 
+    def _list_frames(self):
+        """Returns the displayed frames of the current browsing context."""
+        return self.driver.execute_script(_LIST_FRAMES_SCRIPT %
+                                          get_is_displayed_js())
+
+    def _get_cached_frame_index(self):
+        """Returns the signature and cached frame index of the current page.
+
+        The cached index is `None` if it is out of date.  Switches to the
+        top-level document.
+        """
+        self.driver.switch_to.default_content()
+        signature = tuple(self.driver.execute_script(_FRAME_SIGNATURE_SCRIPT))
+        if (self._frame_index is not None and
+                self._frame_index[0] == signature and
+                time.time() - self._frame_index[1] < self.frame_index_max_age):
+            return signature, self._frame_index[2]
+        return signature, None
+
+    def invalidate_frame_index(self):
+        self._frame_index = None
+
+    def get_frame_index(self):
+        """Returns the paths of all displayed frames in the current page.
+
+        Each path is a tuple of frame elements, starting from the top-level
+        document; the first path is always the empty tuple corresponding to the
+        top-level document itself.  Paths are in depth-first order.
+
+        The index is computed by the first complete `for_each_frame` traversal
+        and reused until the top-level document navigates, frames are added to
+        or removed from it, or an element's `style`, `class` or `hidden`
+        attribute changes (which may change which frames are displayed).
+        Because changes within nested frames are not observed, the index also
+        expires after `frame_index_max_age` seconds.
+        """
+        for _ in self.for_each_frame():
+            pass
+        if self._frame_index is None:
+            return [()]
+        return self._frame_index[2]
+
     def for_each_frame(self):
+        """Switches to each displayed frame in turn, yielding after each switch.
+
+        The top-level document is visited first.  If the caller stops iterating
+        early, the driver remains switched to the current frame.  Otherwise, it
+        is switched back to the top-level document.
+        """
+        try:
+            signature, paths = self._get_cached_frame_index()
+        except WebDriverException:
+            signature, paths = None, None
+        if paths is None:
+            yield from self._traverse_frames(signature)
+            return
+        cur_path: tuple = ()
+        for path in paths:
+            # Walk up to the common ancestor of the previous frame and this
+            # one, then down to this frame.
+            common = 0
+            while (common < len(cur_path) and common < len(path) and
+                   cur_path[common] == path[common]):
+                common += 1
+            try:
+                for _ in range(len(cur_path) - common):
+                    self.driver.switch_to.parent_frame()
+                cur_path = cur_path[:common]
+                for frame in path[common:]:
+                    self.driver.switch_to.frame(frame)
+                    cur_path += (frame, )
+            except WebDriverException:
+                # The frame went away; the index is out of date.
+                self.invalidate_frame_index()
+                self.driver.switch_to.default_content()
+                cur_path = ()
+                continue
+            yield
         self.driver.switch_to.default_content()
 
+    def _traverse_frames(self, signature):
+        """Recursively visits all displayed frames, recording the frame index."""
+        self.driver.switch_to.default_content()
+        paths = []
         seen_ids = set()
-        def helper(nesting_level=0):
-            def handle_frames(frames):
-                frames = [f for f in frames if f.id not in seen_ids]
-                seen_ids.update(f.id for f in frames)
-                for frame in frames:
-                    self.driver.switch_to.frame(frame)
-                    yield from helper(nesting_level=nesting_level + 1)
-                    self.driver.switch_to.parent_frame()
+
+        def helper(path):
+            paths.append(path)
             yield
-            for element_name in ['frame', 'iframe']:
+            try:
+                frames = self._list_frames()
+            except WebDriverException:
+                return
+            frames = [f for f in frames if f.id not in seen_ids]
+            seen_ids.update(f.id for f in frames)
+            for frame in frames:
                 try:
-                    other_frames = self.find_visible_elements(
-                        By.TAG_NAME, element_name)
-                    yield from handle_frames(other_frames)
-                except:
-                    pass
+                    self.driver.switch_to.frame(frame)
+                except WebDriverException:
+                    continue
+                yield from helper(path + (frame, ))
+                self.driver.switch_to.parent_frame()
 
-        yield from helper()
+        yield from helper(())
+        if signature is not None:
+            self._frame_index = (signature, time.time(), paths)
 
     def find_elements_in_any_frame(self, by_method, locator, predicate=None,
                                    only_displayed=False):
         for frame in self.for_each_frame():
             try:
-                for element in self.driver.find_elements(by_method, locator):
-                    if only_displayed:
-                        try:
-                            if not is_displayed(element):
-                                continue
-                        except:
-                            import traceback
-                            traceback.print_exc()
-                            continue
+                elements = self.driver.find_elements(by_method, locator)
+                if only_displayed:
+                    elements = self.filter_displayed(elements)
+                for element in elements:
                     if predicate is None or predicate(element):
                         yield element
             except NoSuchElementException:
@@ -350,7 +1257,7 @@ class Scraper(object):
     def find_username_and_password(self):
         passwords = self.driver.find_elements(By.XPATH,
                                               '//input[@type="password"]')
-        passwords = [x for x in passwords if is_displayed(x)]
+        passwords = self.filter_displayed(passwords)
         if len(passwords) == 0:
             raise NoSuchElementException()
         password = passwords[0]
@@ -379,7 +1286,7 @@ class Scraper(object):
             "//text()[contains(.,%r)]/ancestor::*[self::%s][1]" %
             (text, element_name))
         if only_displayed:
-            return [x for x in all_elements if is_displayed(x)]
+            return self.filter_displayed(all_elements)
         return all_elements
 
     def find_elements_by_descendant_text_match(self, text_match, element_name,
@@ -388,16 +1295,27 @@ class Scraper(object):
             "//text()[%s]/ancestor::*[self::%s][1]" % (text_match,
                                                        element_name))
         if only_displayed:
-            return [x for x in all_elements if is_displayed(x)]
+            return self.filter_displayed(all_elements)
         return all_elements
 
     def find_visible_elements_by_partial_text(self, text, element_name):
         all_elements = self.driver.find_elements(By.XPATH, 
             "//%s[contains(.,%r)]" % (element_name, text))
-        return [x for x in all_elements if is_displayed(x)]
+        return self.filter_displayed(all_elements)
 
     def find_visible_elements(self, by_method, locator):
         elements = self.driver.find_elements(by_method, locator)
+        return self.filter_displayed(elements)
+
+    def filter_displayed(self, elements):
+        """Returns the elements of `elements` that are displayed.
+
+        Uses a single script call for all elements unless
+        `batch_visibility_checks` was disabled, in which case each element is
+        checked individually.
+        """
+        if self.batch_visibility_checks:
+            return filter_displayed(self.driver, elements)
         return [x for x in elements if is_displayed(x)]
 
     def click(self, link):
@@ -416,7 +1334,7 @@ def temp_scraper(scraper_type, *args, headless=True, connect=None,
         try:
             yield scraper
         finally:
-            if connect is None:
+            if not scraper.attached:
                 try:
                     scraper.driver.quit()
                 except Exception as e:
@@ -439,18 +1357,87 @@ def retry(func, num_tries=3, retry_delay=0):
         time.sleep(retry_delay)
 
 
-def run_with_scraper(scraper_class, num_tries=3, retry_delay=0, **kwargs):
-    first_call = True
+def run_with_scraper(scraper_class, num_tries=3, retry_delay=0,
+                     checkpoint_path=None, time_budget=None, **kwargs):
+    """Runs a scraper, retrying on failure.
 
-    def fetch():
-        nonlocal first_call
-        if not first_call:
-            kwargs['headless'] = False
-        first_call = False
-        with temp_scraper(scraper_class, **kwargs) as scraper:
-            scraper.run()
+    If the browser session is still healthy after a failure, the retry calls
+    `run` again on the same scraper, so that the login and any state of the
+    session are kept.  Otherwise, a new scraper is created with the same
+    options, including `headless`.  In either case, units of work recorded in
+    `scraper.checkpoint` are skipped.  A failure to create the scraper, such as
+    a browser that fails to launch, also counts against `num_tries`.
 
-    retry(fetch, num_tries=num_tries, retry_delay=retry_delay)
+    :param checkpoint_path: Optional path of a file in which to persist the
+        checkpoint, so that a run that is killed can be resumed by the next
+        run.  Defaults to the journal path given by `finance_dl.update` in
+        `checkpoint.JOURNAL_ENV_VAR`, if any.  The outcome of a run that does
+        not complete is recorded in it, which determines what the next run
+        reuses; see `checkpoint.py`.
+    :param time_budget: Optional time in seconds after which the scraper
+        stops before its next unit of work.  See `time_budget.py`.
+    """
+    if checkpoint_path is None:
+        checkpoint_path = os.getenv(checkpoint_lib.JOURNAL_ENV_VAR) or None
+    checkpoint = checkpoint_lib.Checkpoint(checkpoint_path)
+    if checkpoint.has_records():
+        logger.info('Resuming from journal %s (%s)', checkpoint_path,
+                    checkpoint.describe())
+    checkpoint.begin_run()
+    budget = time_budget_lib.TimeBudget(time_budget)
+
+    while True:
+        start_time = time.time()
+        with contextlib.ExitStack() as stack:
+            try:
+                scraper = stack.enter_context(
+                    temp_scraper(scraper_class, **kwargs))
+            except Exception:
+                # Failing to launch or attach to the browser counts as a
+                # failed try.
+                import traceback
+                traceback.print_exc()
+                num_tries -= 1
+                if num_tries <= 0:
+                    checkpoint.end_run(checkpoint_lib.FAILED)
+                    raise
+                print('Waiting %g seconds before retrying' % (retry_delay, ))
+                time.sleep(retry_delay)
+                continue
+            startup_time = time.time() - start_time
+            scraper.checkpoint = checkpoint
+            scraper.time_budget = budget
+            while True:
+                try:
+                    scraper.run()
+                    if checkpoint.time_saved > 0:
+                        logger.info(
+                            'Checkpointing saved an estimated %.1fs',
+                            checkpoint.time_saved)
+                    checkpoint.clear()
+                    return
+                except time_budget_lib.BudgetExhausted as e:
+                    # The checkpoint is kept for the next run.
+                    checkpoint.end_run(checkpoint_lib.PARTIAL)
+                    print(time_budget_lib.REPORT_PREFIX + str(e))
+                    raise SystemExit(time_budget_lib.PARTIAL_EXIT_CODE)
+                except Exception:
+                    import traceback
+                    traceback.print_exc()
+                    num_tries -= 1
+                    if num_tries <= 0:
+                        checkpoint.end_run(checkpoint_lib.FAILED)
+                        raise
+                finally:
+                    scraper.log_wait_summary()
+                    scraper.log_page_load_summary()
+                print('Waiting %g seconds before retrying' % (retry_delay, ))
+                time.sleep(retry_delay)
+                if not scraper.is_session_healthy():
+                    break
+                logger.info('Retrying with existing browser session')
+                checkpoint.time_saved += startup_time
+                scraper.discard_downloads()
 
 
 @contextlib.contextmanager
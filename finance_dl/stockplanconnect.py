@@ -82,6 +82,7 @@ from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.keys import Keys
 
 from finance_dl import scrape_lib
+from finance_dl import downloads
 
 logger = logging.getLogger('scraper')
 
@@ -190,16 +191,12 @@ class Scraper(scrape_lib.Scraper):
 
             self.click(link)
             logger.info('Waiting for download')
-            download_result, = self.wait_and_return(self.get_downloaded_file)
+            _, download_path = self.wait_for_download()
 
             if not os.path.exists(self.output_directory):
                 os.makedirs(self.output_directory)
 
-            tmp_path = output_path + '.tmp'
-            with open(tmp_path, 'wb') as f:
-                download_data = download_result[1]
-                f.write(download_data)
-            os.rename(tmp_path, output_path)
+            downloads.move_into_place(download_path, output_path)
             logger.info("Wrote %s", output_path)
 
     def run(self):
@@ -0,0 +1,60 @@
+"""Time budgets that let a long scraper run stop early and keep its progress.
+
+A configuration of a scraper run with `scrape_lib.run_with_scraper` may
+specify a `time_budget` key, in seconds.  The scraper checks the budget with
+`TimeBudget.check` before each unit of work (e.g. one invoice, one statement
+month or one transaction); once the budget has run out, it stops before the
+next unit, keeping everything written so far, and reports the remaining work:
+
+    Time budget exhausted: 125 invoices remaining
+
+The process then exits with `PARTIAL_EXIT_CODE`, which `finance_dl.update`
+records as a `PARTIAL` run.  Such a run is not counted as a failure, but the
+configuration stays due, so that the next scheduled run continues where this
+one stopped: scrapers skip the units already written.
+
+Unlike `run_timeout`, which kills the run, a budget only stops a scraper
+between units, so it may be exceeded by the duration of one unit.  Scrapers
+that do not check the budget ignore it.
+"""
+
+from typing import Optional
+import time
+
+# `EX_TEMPFAIL` of sysexits.h.
+PARTIAL_EXIT_CODE = 75
+
+# Prefix of the line reporting the remaining work.
+REPORT_PREFIX = 'Time budget exhausted: '
+
+
+class BudgetExhausted(Exception):
+    def __init__(self, remaining: int, unit: str):
+        super().__init__('%d %s remaining' % (remaining, unit))
+        self.remaining = remaining
+        self.unit = unit
+
+
+class TimeBudget(object):
+    """Deadline of a scraper run.
+
+    :param seconds: Duration of the budget, starting now, or `None` for no
+        limit.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.deadline = None if seconds is None else time.time() + seconds
+
+    def is_exhausted(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def check(self, remaining: int, unit: str):
+        """Raises `BudgetExhausted` if the budget ran out with work left.
+
+        :param remaining: Number of units of work left, including the one
+            about to start.
+        :param unit: Plural name of the units, such as `'invoices'`.
+        """
+        if remaining > 0 and self.is_exhausted():
+            raise BudgetExhausted(remaining, unit)
@@ -0,0 +1,217 @@
+"""Traces the WebDriver commands issued by scrapers.
+
+When enabled (with `--trace` or `--trace-file` from `finance_dl.cli`), every
+command sent to the WebDriver command executor of each `scrape_lib.Scraper` is
+recorded with its name, duration and caller, and the wall time of each call to a
+`Scraper` wait method (`wait_and_return` and friends) is recorded too.  At the
+end of the run a summary is logged that breaks the time down by command type
+and splits it between waiting and executing commands outside of waits.  The
+wall time of waits is used, since event-driven waits such as `wait_for_script`
+spend most of their time inside a single command, or outside WebDriver.
+Optionally, the records are also written in the Chrome trace event format,
+which can be loaded in `chrome://tracing` or https://ui.perfetto.dev to view a
+flame graph.
+"""
+
+from typing import Dict, List, Optional
+import collections
+import contextlib
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger('tracing')
+
+# Records a single WebDriver command.
+#
+# `caller` is the innermost `finance_dl` function that issued the command, as
+# `<module>.<function>`.  `wait` is the name of the enclosing `Scraper` wait
+# method, or `None` if the command was not issued while waiting.
+CommandRecord = collections.namedtuple(
+    'CommandRecord', ['command', 'start', 'duration', 'caller', 'wait'])
+
+# Records the wall time of a call to a `Scraper` wait method, not nested within
+# another wait.  For the context managers `wait_for_page_load` and
+# `wait_for_new_url`, only the wait on exit, after the body, is included.
+WaitSpan = collections.namedtuple('WaitSpan', ['wait', 'start', 'duration'])
+
+# Names of the `Scraper` methods that wait for a condition.
+WAIT_FUNCTIONS = frozenset([
+    'wait_and_return', 'wait_and_locate', 'wait_for_script',
+    'wait_for_visible', 'wait_for_page_load', 'wait_for_new_url',
+    'wait_for_download',
+])
+
+# Wait methods that return a context manager, which waits on exit.
+WAIT_CONTEXT_MANAGERS = frozenset(['wait_for_page_load', 'wait_for_new_url'])
+
+_package_dir = os.path.dirname(os.path.abspath(__file__))
+_this_file = os.path.abspath(__file__)
+
+
+def _get_caller(frame):
+    caller = None
+    wait = None
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename != _this_file and filename.startswith(_package_dir):
+            name = frame.f_code.co_name
+            if caller is None:
+                module = os.path.splitext(os.path.basename(filename))[0]
+                caller = '%s.%s' % (module, name)
+            if name in WAIT_FUNCTIONS:
+                wait = name
+                break
+        frame = frame.f_back
+    return caller, wait
+
+
+class CommandTracer(object):
+    def __init__(self, trace_path: Optional[str] = None):
+        self.trace_path = trace_path
+        self.records: List[CommandRecord] = []
+        self.wait_spans: List[WaitSpan] = []
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _timed(self, name, func, *args, **kwargs):
+        depth = getattr(self._local, 'wait_depth', 0)
+        self._local.wait_depth = depth + 1
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._local.wait_depth = depth
+            if depth == 0:
+                span = WaitSpan(name, start, time.time() - start)
+                with self._lock:
+                    self.wait_spans.append(span)
+
+    def _wrap_wait(self, name, method):
+        if name in WAIT_CONTEXT_MANAGERS:
+
+            @contextlib.contextmanager
+            def wait_context(*args, **kwargs):
+                manager = method(*args, **kwargs)
+                value = manager.__enter__()
+                try:
+                    yield value
+                except BaseException:
+                    if not manager.__exit__(*sys.exc_info()):
+                        raise
+                else:
+                    self._timed(name, manager.__exit__, None, None, None)
+
+            return wait_context
+
+        @functools.wraps(method)
+        def wait(*args, **kwargs):
+            return self._timed(name, method, *args, **kwargs)
+
+        return wait
+
+    def install(self, driver, scraper=None):
+        """Records the commands subsequently sent by `driver`.
+
+        If `scraper` is specified, also records the wall time of its waits.
+        """
+        if scraper is not None:
+            for name in WAIT_FUNCTIONS:
+                method = getattr(scraper, name, None)
+                if method is not None:
+                    setattr(scraper, name, self._wrap_wait(name, method))
+        executor = driver.command_executor
+        original_execute = executor.execute
+
+        def execute(command, params):
+            caller, wait = _get_caller(sys._getframe(1))
+            start = time.time()
+            try:
+                return original_execute(command, params)
+            finally:
+                record = CommandRecord(command, start,
+                                       time.time() - start, caller, wait)
+                with self._lock:
+                    self.records.append(record)
+
+        executor.execute = execute
+
+    def log_summary(self):
+        elapsed = time.time() - self.start_time
+        total = sum(r.duration for r in self.records)
+        executing = [r for r in self.records if r.wait is None]
+        wait_time = sum(span.duration for span in self.wait_spans)
+        logger.info(
+            'WebDriver commands: %d commands, %.1fs of %.1fs elapsed',
+            len(self.records), total, elapsed)
+        logger.info(
+            '  %.1fs waiting in %d waits; %.1fs executing %d commands outside '
+            'waits; %.1fs other', wait_time, len(self.wait_spans),
+            sum(r.duration for r in executing), len(executing),
+            elapsed - wait_time - sum(r.duration for r in executing))
+        for title, key in [('command', lambda r: r.command),
+                           ('caller', lambda r: r.caller)]:
+            groups: Dict[str, List[CommandRecord]] = collections.defaultdict(
+                list)
+            for r in self.records:
+                groups[key(r)].append(r)
+            for name, records in sorted(
+                    groups.items(),
+                    key=lambda x: -sum(r.duration for r in x[1])):
+                logger.info('  by %s: %-40s %6d commands %8.2fs', title, name,
+                            len(records), sum(r.duration for r in records))
+
+    def write_chrome_trace(self, path: str):
+        pid = os.getpid()
+        events = []
+        for r in self.records:
+            events.append({
+                'name': r.command,
+                'cat': 'wait' if r.wait is not None else 'command',
+                'ph': 'X',
+                'ts': int((r.start - self.start_time) * 1e6),
+                'dur': int(r.duration * 1e6),
+                'pid': pid,
+                'tid': 0,
+                'args': {
+                    'caller': r.caller,
+                    'wait': r.wait
+                },
+            })
+        for span in self.wait_spans:
+            events.append({
+                'name': span.wait,
+                'cat': 'wait',
+                'ph': 'X',
+                'ts': int((span.start - self.start_time) * 1e6),
+                'dur': int(span.duration * 1e6),
+                'pid': pid,
+                'tid': 1,
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events}, f)
+
+    def finish(self):
+        self.log_summary()
+        if self.trace_path is not None:
+            self.write_chrome_trace(self.trace_path)
+            logger.info('Wrote Chrome trace to %s', self.trace_path)
+
+
+_active_tracer: Optional[CommandTracer] = None
+
+
+def enable(trace_path: Optional[str] = None) -> CommandTracer:
+    """Enables tracing for all `Scraper` instances created afterwards."""
+    global _active_tracer
+    _active_tracer = CommandTracer(trace_path)
+    return _active_tracer
+
+
+def get_active_tracer() -> Optional[CommandTracer]:
+    return _active_tracer
@@ -74,8 +74,7 @@ import urllib.parse
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.keys import Keys
-from atomicwrites import atomic_write
-from . import scrape_lib, google_login
+from . import scrape_lib, google_login, downloads
 
 logger = logging.getLogger('ultipro')
 
@@ -158,12 +157,13 @@ class Scraper(scrape_lib.Scraper):
                     ))
                 download_link.click()
                 logger.info('%s: Waiting to get download', document_str)
-                download_result, = self.wait_and_return(
-                    self.get_downloaded_file)
-                name, data = download_result
-                if len(data) < 5000:
+                name, path = self.wait_for_download()
+                size = os.path.getsize(path)
+                if size < 5000:
+                    # Otherwise the next download would not be identified.
+                    os.remove(path)
                     raise RuntimeError(
-                        'Downloaded file size is invalid: %d' % len(data))
+                        'Downloaded file size is invalid: %d' % size)
                 output_name = '%s.statement-%s.pdf' % (
                     pay_date.strftime('%Y-%m-%d'), document_number)
                 if self.dir_per_year:
@@ -172,8 +172,7 @@ class Scraper(scrape_lib.Scraper):
                     output_path = os.path.join(self.output_directory, output_name)
                 if not os.path.exists(os.path.dirname(output_path)):
                     os.makedirs(os.path.dirname(output_path))
-                with atomic_write(output_path, mode='wb', overwrite=True) as f:
-                    f.write(data)
+                downloads.move_into_place(path, output_path)
                 downloaded_statements.add((pay_date, document_number))
                 return True
             else:
@@ -1,14 +1,34 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Mapping, Optional, Set
 import argparse
+import asyncio
 import importlib
-import subprocess
-import concurrent.futures
+import json
+import signal
+import socket
 import sys
 import threading
 import os
 import time
 
+from . import checkpoint
+from . import chromedriver_log
+from . import cron
+from . import log_rotation
+from . import process_runner
+from . import refresh
+from . import remote_pool
+from . import run_history
+from . import scheduler
+from . import time_budget
+from . import work_queue
+from . import worker_pool
+
 config_prefix = 'CONFIG_'
+schedule_prefix = 'SCHEDULE_'
+
+# Interval in seconds at which the size of a chromedriver log is checked while
+# its configuration runs.
+CHROMEDRIVER_LOG_CHECK_INTERVAL = 10
 
 
 def _format_duration(count) -> str:
@@ -37,6 +57,25 @@ class CommandBase:
     def get_log_path(self, config_name: str) -> str:
         return os.path.join(self.log_dir, config_name + '.txt')
 
+    def get_queue_path(self) -> str:
+        return os.path.join(self.log_dir, 'queue.sqlite3')
+
+    def get_queue(self) -> work_queue.WorkQueue:
+        return work_queue.WorkQueue(self.get_queue_path())
+
+    def get_daemon_status_path(self) -> str:
+        return os.path.join(self.log_dir, 'daemon-status.json')
+
+    def get_journal_path(self, config_name: str) -> str:
+        return os.path.join(self.log_dir, config_name + '.journal')
+
+    def get_chromedriver_log_path(self, config_name: str) -> str:
+        return os.path.join(self.log_dir, config_name + '.chromedriver.log')
+
+    def get_history(self) -> run_history.RunHistory:
+        return run_history.RunHistory(
+            os.path.join(self.log_dir, 'history.sqlite3'))
+
     def get_last_update_time(self, config_name: str) -> Optional[float]:
         try:
             statinfo = os.stat(self.get_last_update_path(config_name))
@@ -62,6 +101,11 @@ class StatusCommand(CommandBase):
             return mtime
 
         update_times.sort(key=lambda x: get_time_sort_key(x[1]))
+        history = self.get_history()
+        running = self.print_daemon_status(cur_time)
+        queue_entries = {}
+        if os.path.exists(self.get_queue_path()):
+            queue_entries = self.get_queue().get_entries()
         for name, mtime in update_times:
             if mtime is not None:
                 update_string = '%s (%s ago)' % (time.strftime(
@@ -69,29 +113,97 @@ class StatusCommand(CommandBase):
                     time.localtime(mtime)), _format_duration(cur_time - mtime))
             else:
                 update_string = 'NEVER'
+            schedule = history.get_schedule(name)
+            if mtime is None:
+                due_string = 'due now'
+            else:
+                next_due = (schedule[0] if schedule is not None else
+                            mtime + refresh.MIN_INTERVAL)
+                if next_due <= cur_time:
+                    due_string = 'due now'
+                else:
+                    due_string = 'due in %s' % _format_duration(next_due -
+                                                                cur_time)
+            if schedule is not None and schedule[1] is not None:
+                due_string += ', new data every %s' % _format_duration(
+                    schedule[1])
+            update_string += ' [%s]' % due_string
+            stats = history.get_stats(name)
+            if stats.num_runs:
+                update_string += (
+                    ' [%d runs, %.0f%% failed, p50 %.fs, p95 %.fs]' %
+                    (stats.num_runs, stats.failure_rate * 100,
+                     stats.p50_duration, stats.p95_duration))
+            if name in running:
+                update_string += ' [running]'
+            journal_path = self.get_journal_path(name)
+            if os.path.exists(journal_path):
+                update_string += ' [unfinished: %s]' % checkpoint.Checkpoint(
+                    journal_path).describe()
+            entry = queue_entries.get(name)
+            if entry is not None and entry.state == work_queue.PENDING:
+                update_string += ' [queued]'
+            elif entry is not None and entry.state == work_queue.CLAIMED:
+                if entry.lease_expiry < cur_time:
+                    update_string += ' [lease of %s expired]' % entry.worker
+                else:
+                    update_string += ' [running on %s]' % entry.worker
             print('%*s: %s' % (max_name_len, name, update_string))
 
+    def print_daemon_status(self, cur_time: float) -> Set[str]:
+        """Prints the state of `update daemon`, returning running configs."""
+        try:
+            with open(self.get_daemon_status_path(), 'r',
+                      encoding='utf-8') as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        if status['stopped']:
+            return set()
+        try:
+            os.kill(status['pid'], 0)
+        except ProcessLookupError:
+            print('daemon: NOT RUNNING (pid %d exited without stopping)' %
+                  status['pid'])
+            return set()
+        except OSError:
+            pass
+        print('daemon: running (pid %d, last checked %s ago)' %
+              (status['pid'], _format_duration(cur_time - status['updated'])))
+        return {
+            name
+            for name, config in status['configs'].items() if config['running']
+        }
+
 
 class Updater(CommandBase):
     def __init__(self, args):
         super().__init__(args)
-        force = self.args.force
+        self.history = self.get_history()
+        self._lock = threading.Lock()
+        self.configs_completed = 0
+        self.configs_to_update: List[str] = []
+        self.browser_pool = None
+        self.worker_pool: Optional[worker_pool.WorkerPool] = None
+        self.remote_pool: Optional[remote_pool.RemotePool] = None
+
+    def get_due_configs(self, configs: List[str],
+                        verbose: bool = True) -> List[str]:
+        """Returns the configurations in `configs` that are due to run."""
         cur_time = time.time()
-        configs = self.args.config
-        if self.args.all:
-            configs = self.get_all_configs()
-        configs_to_update = []
+        due_configs = []
         for config in configs:
             mtime = self.get_last_update_time(config)
-            if not force and mtime is not None and (
-                    cur_time - mtime) < 24 * 60 * 60:
-                print('%s: SKIPPING (updated %s ago)' %
-                      (config, _format_duration(cur_time - mtime)))
-                continue
-            configs_to_update.append(config)
-        self.configs_to_update = configs_to_update
-        self._lock = threading.Lock()
-        self.configs_completed = 0
+            if mtime is not None:
+                next_due = self.get_next_due(config, mtime)
+                if cur_time < next_due:
+                    if verbose:
+                        print('%s: SKIPPING (updated %s ago, due in %s)' %
+                              (config, _format_duration(cur_time - mtime),
+                               _format_duration(next_due - cur_time)))
+                    continue
+            due_configs.append(config)
+        return due_configs
 
     def print_message(self, config, start_time, message, completed=False):
         with self._lock:
@@ -101,30 +213,212 @@ class Updater(CommandBase):
                   (self.configs_completed, len(self.configs_to_update), config,
                    time.time() - start_time, message.rstrip()))
 
-    def run_config(self, config):
+    def get_config_spec(self, config) -> Mapping[str, Any]:
+        """Returns the keys of `config` used to schedule it.
+
+        The configuration function is not called, since it may have side
+        effects, such as retrieving passwords; see `scheduler.py`.
+        """
+        spec: Dict[str, Any] = {}
+        function = getattr(self.config_module, config_prefix + config, None)
+        if function is not None:
+            spec.update(scheduler.get_literal_spec(function))
+        schedule = getattr(self.config_module, schedule_prefix + config, None)
+        if isinstance(schedule, Mapping):
+            spec.update(schedule)
+        elif schedule is not None:
+            print('%s: ignoring %s%s, which is not a dict' %
+                  (config, schedule_prefix, config))
+        return spec
+
+    def get_cron_due(self, config, spec: Mapping[str, Any],
+                     last_update_time: float) -> Optional[float]:
+        """Returns when `config` is next due by its `cron` key, if any."""
+        cron_expression = spec.get('cron')
+        if cron_expression is None:
+            return None
+        try:
+            return cron.CronExpression(cron_expression).get_next_time(
+                last_update_time)
+        except ValueError as e:
+            print('%s: %s' % (config, e))
+        return None
+
+    def get_next_due(self, config, last_update_time: float) -> float:
+        # A `cron` key takes precedence, even with `--fixed-interval`, which
+        # only replaces the adaptive cadence.
+        next_due = self.get_cron_due(config, self.get_config_spec(config),
+                                     last_update_time)
+        if next_due is not None:
+            return next_due
+        if not self.args.fixed_interval:
+            schedule = self.history.get_schedule(config)
+            if schedule is not None:
+                return schedule[0]
+        return last_update_time + refresh.MIN_INTERVAL
+
+    def update_schedule(self, config):
+        """Chooses when `config` is next due, after a successful run."""
+        spec = self.get_config_spec(config)
+        times = self.history.get_productive_run_times(config)
+        output_directory = spec.get('output_directory')
+        if isinstance(output_directory, str):
+            times += refresh.get_file_times(output_directory)
+        arrivals = refresh.get_arrivals(times)
+        cadence = refresh.estimate_cadence(arrivals)
+        interval_override = spec.get('refresh_interval_days')
+        if interval_override is not None:
+            interval_override *= refresh.DAY
+        last_update_time = self.get_last_update_time(config)
+        next_due = None
+        if last_update_time is not None:
+            next_due = self.get_cron_due(config, spec, last_update_time)
+        if next_due is None:
+            next_due = refresh.get_next_due(
+                last_update_time, arrivals[-1] if arrivals else None,
+                cadence, interval_override=interval_override)
+        self.history.set_schedule(config, next_due, cadence)
+
+    def get_config_resources(self, config) -> Dict[str, float]:
+        spec = self.get_config_spec(config)
+        try:
+            resources = scheduler.get_config_resources(spec)
+            connect_remote = spec.get('connect_remote')
+            if (self.remote_pool is not None and
+                    self.remote_pool.uses_pool(connect_remote) and
+                    'remote:%s' % connect_remote in resources):
+                resources[remote_pool.RESOURCE] = resources.pop(
+                    'remote:%s' % connect_remote)
+            return resources
+        except Exception as e:
+            print('%s: failed to determine resources (%r)' % (config, e))
+        return dict(scheduler.DEFAULT_RESOURCES)
+
+    async def run_config(self, config, resources: Mapping[str, float]) -> str:
+        """Runs `config`, returning its status, such as `'SUCCESS'`."""
+        if (self.remote_pool is not None and
+                resources.get(remote_pool.RESOURCE)):
+            async with self.remote_pool.lease_async() as lease:
+                status = await self._run_config(config,
+                                                environ=lease.environ())
+                lease.failed = status != 'SUCCESS'
+                return status
+        if self.browser_pool is None or not resources.get('browser'):
+            return await self._run_config(config, environ={})
+        async with self.browser_pool.lease_async() as session:
+            if session is None:
+                return await self._run_config(config, environ={})
+            return await self._run_config(config, environ=session.environ())
+
+    def _get_chromedriver_environ(self, config) -> Dict[str, str]:
+        return {
+            chromedriver_log.LOG_LEVEL_ENV_VAR:
+            self.args.chromedriver_log_level,
+            chromedriver_log.LOG_ENV_VAR:
+            self.get_chromedriver_log_path(config),
+        }
+
+    def _rotate_chromedriver_log(self, config, copy_truncate=False):
+        log_rotation.rotate_log(
+            self.get_chromedriver_log_path(config),
+            max_bytes=int(self.args.chromedriver_log_max_size * 1024 * 1024),
+            backup_count=self.args.chromedriver_log_backups,
+            copy_truncate=copy_truncate)
+
+    async def _cap_chromedriver_log(self, config):
+        """Rotates the chromedriver log of `config` while it is written."""
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(CHROMEDRIVER_LOG_CHECK_INTERVAL)
+            try:
+                await loop.run_in_executor(None, self._rotate_chromedriver_log,
+                                           config, True)
+            except OSError as e:
+                print('Failed to rotate chromedriver log of %s: %r' %
+                      (config, e))
+
+    def get_timeouts(self, config):
+        """Returns the wall-clock and inactivity timeouts for `config`."""
+        spec = self.get_config_spec(config)
+        timeout = spec.get('run_timeout', self.args.timeout)
+        inactivity_timeout = spec.get('inactivity_timeout',
+                                      self.args.inactivity_timeout)
+        return timeout or None, inactivity_timeout or None
+
+    async def _run_config(self, config, environ: Mapping[str, str]) -> str:
+        """Runs `config` with the additional environment variables `environ`."""
+        loop = asyncio.get_event_loop()
         start_time = time.time()
         self.print_message(config, start_time, 'starting')
         success = False
         termination_message = 'SUCCESS'
+        chromedriver_logging = self.args.chromedriver_log_level != 'OFF'
+        run_id = self.history.start_run(config, start_time)
+        return_code = None
+        peak_rss_kb = None
+        retries = 0
+        remaining_work = None
+        environ = dict(environ, **{
+            checkpoint.JOURNAL_ENV_VAR: self.get_journal_path(config)
+        })
+        log_capper = None
         try:
+            if chromedriver_logging:
+                environ = dict(environ, **self._get_chromedriver_environ(config))
+                self._rotate_chromedriver_log(config)
+                log_capper = loop.create_task(
+                    self._cap_chromedriver_log(config))
             with open(
                     self.get_log_path(config), 'w', encoding='utf-8',
                     newline='') as f:
-                process = subprocess.Popen(
-                    [
-                        sys.executable, '-m', 'finance_dl.cli',
-                        '--config-module', self.args.config_module, '-c', config
-                    ],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    bufsize=1,
-                    universal_newlines=True,
-                )
-                for line in process.stdout:
+                if chromedriver_logging:
+                    f.write('chromedriver log: %s\n' %
+                            self.get_chromedriver_log_path(config))
+
+                def on_line(line):
+                    nonlocal retries, remaining_work
                     self.print_message(config, start_time, line.rstrip())
                     f.write(line)
-                process.wait()
-                if process.returncode == 0:
+                    # Printed by `scrape_lib.run_with_scraper`.
+                    if 'before retrying' in line:
+                        retries += 1
+                    if line.startswith(time_budget.REPORT_PREFIX):
+                        remaining_work = line[len(time_budget.REPORT_PREFIX
+                                                  ):].strip()
+
+                timeout, inactivity_timeout = self.get_timeouts(config)
+                if self.worker_pool is not None:
+                    result = await self.worker_pool.run(
+                        config,
+                        on_line,
+                        environ=environ,
+                        timeout=timeout,
+                        inactivity_timeout=inactivity_timeout,
+                    )
+                else:
+                    result = await process_runner.run_process(
+                        [
+                            sys.executable, '-m', 'finance_dl.cli',
+                            '--config-module', self.args.config_module, '-c',
+                            config
+                        ],
+                        on_line,
+                        env=dict(os.environ, **environ),
+                        timeout=timeout,
+                        inactivity_timeout=inactivity_timeout,
+                    )
+                peak_rss_kb = result.peak_rss_kb
+                return_code = result.return_code
+                if result.num_killed:
+                    self.print_message(
+                        config, start_time,
+                        'killed %d processes' % result.num_killed)
+                if result.end_reason == process_runner.TIMEOUT:
+                    termination_message = 'TIMED OUT after %ds' % timeout
+                elif result.end_reason == process_runner.INACTIVE:
+                    termination_message = ('TIMED OUT after %ds without output'
+                                           % inactivity_timeout)
+                elif return_code == 0:
                     success = True
                     with open(
                             self.get_last_update_path(config),
@@ -132,19 +426,494 @@ class Updater(CommandBase):
                             encoding='utf-8',
                             newline='') as f:
                         pass
+                elif return_code == time_budget.PARTIAL_EXIT_CODE:
+                    # The configuration stays due, so that the next run
+                    # continues the remaining work.
+                    termination_message = '%s: %s' % (
+                        run_history.PARTIAL, remaining_work or
+                        'time budget exhausted')
                 else:
-                    termination_message = 'FAILED with return code %d' % (process.returncode)
+                    termination_message = 'FAILED with return code %s' % (return_code)
 
         except:
             termination_message = 'FAILED with exception'
+        if log_capper is not None:
+            log_capper.cancel()
+            try:
+                await log_capper
+            except asyncio.CancelledError:
+                pass
+        if chromedriver_logging:
+            try:
+                self._rotate_chromedriver_log(config)
+            except OSError:
+                pass
+        files_written = None
+        bytes_written = None
+        output_directory = self.get_config_spec(config).get('output_directory')
+        if isinstance(output_directory, str):
+            files_written, bytes_written = await loop.run_in_executor(
+                None, run_history.get_output_stats, output_directory,
+                start_time)
+        status = 'SUCCESS' if success else termination_message
+        self.history.finish_run(
+            run_id, time.time(),
+            status=status,
+            return_code=return_code, peak_rss_kb=peak_rss_kb,
+            files_written=files_written, bytes_written=bytes_written,
+            retries=retries)
+        if success:
+            await loop.run_in_executor(None, self.update_schedule, config)
         self.print_message(config, start_time, termination_message,
                            completed=True)
+        return status
+
+    def start_pools(self, configs: List[str]):
+        """Starts the browser, worker and remote pools requested for `configs`.
+
+        Must be called before `get_resource_scheduler` and `get_jobs`.
+        """
+        if self.args.remote_endpoint:
+            self.remote_pool = remote_pool.RemotePool(
+                self.args.remote_endpoint, slots=self.args.remote_slots,
+                health_check_interval=self.args.remote_health_interval)
+            self.remote_pool.check_health()
+            print('%d of %d remote WebDriver endpoints are healthy' %
+                  (self.remote_pool.get_num_healthy(),
+                   len(self.remote_pool.endpoints)))
+        if self.args.browser_pool > 0 and configs:
+            from . import browser_pool
+            self.browser_pool = browser_pool.BrowserPool(
+                min(self.args.browser_pool, len(configs)))
+            self.browser_pool.start()
+        if self.args.worker_pool and configs:
+            modules = set()
+            for config in configs:
+                module = self.get_config_spec(config).get('module')
+                if isinstance(module, str):
+                    modules.add(module)
+            self.worker_pool = worker_pool.WorkerPool(
+                self.args.config_module, preload=sorted(modules),
+                max_jobs_per_worker=self.args.worker_max_jobs)
+
+    async def close_pools(self):
+        if self.worker_pool is not None:
+            await self.worker_pool.close()
+            print(self.worker_pool.get_summary())
+        if self.browser_pool is not None:
+            self.browser_pool.close()
+            print(self.browser_pool.get_summary())
+        if self.remote_pool is not None:
+            print(self.remote_pool.get_summary())
+
+    def get_resource_scheduler(self) -> scheduler.ResourceScheduler:
+        limits = {
+            'browser': self.args.browser_slots or self.args.parallelism,
+        }
+        memory_limit = (self.args.memory_limit or
+                        scheduler.get_available_memory_mb())
+        if memory_limit is not None:
+            limits['memory_mb'] = memory_limit
+        if self.remote_pool is not None:
+            limits[remote_pool.RESOURCE] = self.remote_pool.capacity
+        return scheduler.ResourceScheduler(
+            limits, prefix_limits={
+                'remote:': self.args.remote_slots,
+                'institution:': self.args.institution_limit,
+            }, max_parallel=self.args.parallelism)
+
+    def get_jobs(self, configs: List[str]):
+        """Returns the scheduler jobs for `configs`."""
+        # Start the configurations that have historically taken longest
+        # first, to minimize the total time.  Configurations without history
+        # are started first, since they may be long.
+        expected_durations = self.history.get_expected_durations(configs)
+        configs = sorted(
+            configs,
+            key=lambda config: -expected_durations.get(config, float('inf')))
+        return [(config, self.get_config_resources(config))
+                for config in configs]
+
+    def select_configs(self) -> List[str]:
+        """Returns the configurations selected by the command line."""
+        configs = self.args.config
+        if self.args.all:
+            configs = self.get_all_configs()
+        if not self.args.force:
+            configs = self.get_due_configs(configs)
+        return configs
 
     def __call__(self):
-        with concurrent.futures.ThreadPoolExecutor(
-                max_workers=self.args.parallelism) as executor:
-            for config in self.configs_to_update:
-                executor.submit(self.run_config, config)
+        configs = self.select_configs()
+        self.configs_to_update = configs
+        self.start_pools(configs)
+        resource_scheduler = self.get_resource_scheduler()
+        jobs = self.get_jobs(configs)
+
+        async def run_all():
+            try:
+                await resource_scheduler.run(jobs, self.run_config)
+            finally:
+                await self.close_pools()
+
+        asyncio.run(run_all())
+
+
+class DaemonCommand(Updater):
+    """Keeps running, updating configurations as they become due.
+
+    Configurations are due according to the same schedule as for `update`,
+    which may be given by a `cron` configuration key (see `cron.py`).  The
+    configuration module is reloaded when its file changes.  A configuration
+    that fails is retried after `--retry-interval`.  The state of
+    each configuration is written to `<log-dir>/daemon-status.json` after
+    each check and each run.  SIGINT or SIGTERM stops the daemon once the
+    running configurations have finished.
+    """
+
+    def __init__(self, args):
+        super().__init__(args)
+        self.start_time = time.time()
+        self.running: Set[str] = set()
+        self.config_module_mtime = self._get_config_module_mtime()
+
+    def _get_config_module_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.config_module.__file__).st_mtime
+        except (AttributeError, TypeError, OSError):
+            return None
+
+    def get_configs(self) -> List[str]:
+        return self.args.config or self.get_all_configs()
+
+    def reload_config_module(self) -> bool:
+        """Reloads the configuration module if its file has changed."""
+        mtime = self._get_config_module_mtime()
+        if mtime == self.config_module_mtime:
+            return False
+        self.config_module_mtime = mtime
+        saved_vars = dict(vars(self.config_module))
+        # Remove the configurations, so that deleted ones do not remain.
+        for key in saved_vars:
+            if key.startswith(config_prefix):
+                delattr(self.config_module, key)
+        try:
+            importlib.reload(self.config_module)
+        except Exception as e:
+            vars(self.config_module).update(saved_vars)
+            print('Failed to reload %s (%r)' % (self.args.config_module, e))
+            return False
+        print('Reloaded %s' % self.args.config_module)
+        return True
+
+    def is_retry_pending(self, config, cur_time: float) -> bool:
+        """Returns `True` if `config` failed within the retry interval."""
+        runs = self.history.get_recent_runs(config, limit=1)
+        return bool(runs and runs[0]['status'] != 'SUCCESS' and
+                    cur_time - runs[0]['end_time'] < self.args.retry_interval)
+
+    def reschedule(self, configs: List[str]):
+        """Recomputes when `configs` are next due, after a reload."""
+        for config in configs:
+            if self.get_last_update_time(config) is not None:
+                self.update_schedule(config)
+
+    def write_status(self, running: Set[str], stopped: bool = False):
+        configs = {}
+        for config in self.get_configs():
+            last_update = self.get_last_update_time(config)
+            runs = self.history.get_recent_runs(config, limit=1)
+            configs[config] = dict(
+                running=config in running,
+                last_update=last_update,
+                next_due=(self.get_next_due(config, last_update)
+                          if last_update is not None else None),
+                last_status=runs[0]['status'] if runs else None,
+            )
+        status = dict(pid=os.getpid(), config_module=self.args.config_module,
+                      started=self.start_time, updated=time.time(),
+                      stopped=stopped, configs=configs)
+        path = self.get_daemon_status_path()
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(status, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    async def run_due_config(self, config, resources: Mapping[str, float]):
+        try:
+            await self.run_config(config, resources)
+        finally:
+            self.running.discard(config)
+            await asyncio.get_event_loop().run_in_executor(
+                None, self.write_status, set(self.running))
+
+    async def run_daemon(self):
+        loop = asyncio.get_event_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        resource_scheduler = self.get_resource_scheduler()
+        tasks: Set[asyncio.Future] = set()
+        try:
+            while not stop.is_set():
+                if self.reload_config_module():
+                    if self.worker_pool is not None:
+                        await self.worker_pool.restart()
+                    await loop.run_in_executor(None, self.reschedule,
+                                               self.get_configs())
+                cur_time = time.time()
+                configs = [
+                    config for config in self.get_due_configs(
+                        self.get_configs(), verbose=False)
+                    if config not in self.running and
+                    not self.is_retry_pending(config, cur_time)
+                ]
+                if configs:
+                    self.running.update(configs)
+                    self.configs_to_update += configs
+                    tasks.add(
+                        asyncio.ensure_future(
+                            resource_scheduler.run(
+                                self.get_jobs(configs),
+                                self.run_due_config)))
+                await loop.run_in_executor(None, self.write_status,
+                                           set(self.running))
+                try:
+                    await asyncio.wait_for(stop.wait(),
+                                           self.args.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                for task in [task for task in tasks if task.done()]:
+                    tasks.remove(task)
+                    task.result()
+            if self.running:
+                print('Stopping once %d running configurations finish' %
+                      len(self.running))
+            await asyncio.gather(*tasks)
+        finally:
+            await self.close_pools()
+            self.write_status(set(self.running), stopped=True)
+
+    def __call__(self):
+        self.start_pools(self.get_configs())
+        asyncio.run(self.run_daemon())
+
+
+class EnqueueCommand(Updater):
+    """Adds the selected configurations to the shared queue."""
+
+    def __call__(self):
+        configs = self.select_configs()
+        expected_durations = self.history.get_expected_durations(configs)
+        resources = {
+            config: self.get_config_resources(config)
+            for config in configs
+        }
+        added = self.get_queue().enqueue(configs, resources=resources,
+                                         priorities=expected_durations)
+        print('Enqueued %d configurations (%d already queued)' %
+              (len(added), len(configs) - len(added)))
+
+
+class WorkerCommand(Updater):
+    """Runs configurations claimed from the shared queue.
+
+    See `work_queue.py`.  Any number of workers may run on each host; each
+    claims at most `--parallelism` configurations at once, and runs them
+    subject to the local resource limits.
+    """
+
+    def __init__(self, args):
+        super().__init__(args)
+        self.queue = self.get_queue()
+        self.worker_id = '%s:%d' % (socket.gethostname(), os.getpid())
+        self.claimed: Set[str] = set()
+
+    def claim(self) -> Optional[str]:
+        shared_limits = {
+            'institution:': self.args.institution_limit,
+            'remote:': self.args.remote_slots,
+        }
+        aliases = {}
+        if self.remote_pool is not None:
+            # `enqueue` records the endpoint named by `connect_remote`, which
+            # shares the capacity of the whole pool.
+            endpoints = self.remote_pool.endpoints
+            shared_limits[remote_pool.RESOURCE] = (self.args.remote_slots *
+                                                   len(endpoints))
+            aliases = {
+                'remote:%s' % endpoint.url: remote_pool.RESOURCE
+                for endpoint in endpoints
+            }
+        return self.queue.claim(self.worker_id, self.args.lease,
+                                shared_limits=shared_limits, aliases=aliases)
+
+    async def run_claimed_config(self, config,
+                                 resources: Mapping[str, float]):
+        loop = asyncio.get_event_loop()
+        status = 'FAILED with exception'
+        try:
+            status = await self.run_config(config, resources)
+        finally:
+            self.claimed.discard(config)
+            if not await loop.run_in_executor(
+                    None, self.queue.complete, self.worker_id, config, status):
+                print('%s: lease was lost, result not recorded in the queue' %
+                      config)
+
+    async def send_heartbeats(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.args.lease / 3)
+            if not self.claimed:
+                continue
+            lost = await loop.run_in_executor(None, self.queue.heartbeat,
+                                              self.worker_id,
+                                              list(self.claimed),
+                                              self.args.lease)
+            for config in lost:
+                print('%s: lease lost to another worker' % config)
+
+    async def run_worker(self):
+        loop = asyncio.get_event_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        resource_scheduler = self.get_resource_scheduler()
+        tasks: Set[asyncio.Future] = set()
+        heartbeats = asyncio.ensure_future(self.send_heartbeats())
+        try:
+            while not stop.is_set():
+                while len(self.claimed) < self.args.parallelism:
+                    config = await loop.run_in_executor(None, self.claim)
+                    if config is None:
+                        break
+                    self.claimed.add(config)
+                    self.configs_to_update.append(config)
+                    tasks.add(
+                        asyncio.ensure_future(
+                            resource_scheduler.run(
+                                [(config, self.get_config_resources(config))],
+                                self.run_claimed_config)))
+                if (self.args.exit_when_done and not self.claimed and
+                        await loop.run_in_executor(
+                            None, self.queue.count_unfinished) == 0):
+                    break
+                # Claim more as soon as a configuration finishes.
+                stopping = asyncio.ensure_future(stop.wait())
+                await asyncio.wait(tasks | {stopping},
+                                   timeout=self.args.poll_interval,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                stopping.cancel()
+                for task in [task for task in tasks if task.done()]:
+                    tasks.remove(task)
+                    task.result()
+            if self.claimed:
+                print('Stopping once %d running configurations finish' %
+                      len(self.claimed))
+            await asyncio.gather(*tasks)
+        finally:
+            heartbeats.cancel()
+            await self.close_pools()
+
+    def __call__(self):
+        self.start_pools(self.get_all_configs())
+        asyncio.run(self.run_worker())
+
+
+def add_selection_arguments(ap: argparse.ArgumentParser):
+    ap.add_argument('config', nargs='*', type=str, default=[],
+                    help='Configuration to update')
+    ap.add_argument(
+        '-f', '--force', action='store_true',
+        help='Force update even if the configuration has already run recently.'
+    )
+    ap.add_argument('-a', '--all', action='store_true',
+                    help='Update all configurations.')
+
+
+def add_schedule_arguments(ap: argparse.ArgumentParser):
+    """Adds the options that determine when configurations are due."""
+    ap.add_argument(
+        '--fixed-interval', action='store_true',
+        help='Update configurations that last ran over a day ago, rather than '
+        'when due according to the cadence at which they produce new data.  '
+        'Configurations with a cron configuration key still follow it.')
+
+
+def add_run_arguments(ap: argparse.ArgumentParser):
+    """Adds the options shared by the commands that run configurations."""
+    add_schedule_arguments(ap)
+    ap.add_argument(
+        '--timeout', type=float, default=0,
+        help='Maximum time in seconds a configuration may run before its '
+        'processes, including the browser, are killed, such as 7200.  0 '
+        'disables the limit.  Overridden by the run_timeout configuration '
+        'key.')
+    ap.add_argument(
+        '--inactivity-timeout', type=float, default=0,
+        help='Maximum time in seconds a configuration may run without '
+        'printing any output before it is killed, such as 1800.  0 disables '
+        'the limit.  Overridden by the inactivity_timeout configuration key.  '
+        'Configurations that wait for a manual login print nothing while '
+        'waiting.')
+    ap.add_argument(
+        '-p', '--parallelism', type=int, default=4,
+        help='Maximum number of configurations to update in parallel.  '
+        'Configurations are also limited by the resources they need; see '
+        'finance_dl/scheduler.py.')
+    ap.add_argument(
+        '--browser-slots', type=int, default=0,
+        help='Maximum number of local browsers to run at once.  If 0, '
+        'limited only by --parallelism.')
+    ap.add_argument(
+        '--remote-slots', type=int, default=1,
+        help='Maximum number of sessions to run at once on each remote '
+        'WebDriver endpoint (connect_remote).')
+    ap.add_argument(
+        '--remote-endpoint', action='append', default=[], metavar='URL',
+        help='Remote WebDriver endpoint of a pool shared by configurations '
+        'whose connect_remote is one of these URLs, or "pool".  May be '
+        'repeated.  See finance_dl/remote_pool.py.')
+    ap.add_argument(
+        '--remote-health-interval', type=float, default=60,
+        help='Minimum interval in seconds between health checks of an '
+        'unhealthy remote endpoint.')
+    ap.add_argument(
+        '--institution-limit', type=int, default=1,
+        help='Maximum number of configurations with the same `institution` '
+        'to run at once.')
+    ap.add_argument(
+        '--memory-limit', type=float, default=None,
+        help='Memory in MB available to configurations, compared against '
+        'their estimated memory use.  Defaults to the currently available '
+        'memory.')
+    ap.add_argument(
+        '--browser-pool', type=int, default=0,
+        help='Number of pre-launched headless Chrome sessions to share across '
+        'configurations.  If 0, each configuration launches its own browser.')
+    ap.add_argument(
+        '--worker-pool', action='store_true',
+        help='Run configurations in long-lived worker processes that import '
+        'the configuration module and scrapers once, rather than in a new '
+        'Python process each.  See finance_dl/worker_pool.py.')
+    ap.add_argument(
+        '--worker-max-jobs', type=int,
+        default=worker_pool.DEFAULT_MAX_JOBS_PER_WORKER,
+        help='Number of configurations after which a worker process is '
+        'replaced.')
+    ap.add_argument(
+        '--chromedriver-log-level', default='OFF', type=str.upper,
+        choices=chromedriver_log.LOG_LEVELS,
+        help='chromedriver log level.  Unless OFF, each configuration logs '
+        'to <log-dir>/<config>.chromedriver.log.')
+    ap.add_argument(
+        '--chromedriver-log-max-size', type=float, default=10,
+        help='Size in MiB above which a chromedriver log is compressed and '
+        'rotated, checked before, during and after each run.  See '
+        'finance_dl/chromedriver_log.py.')
+    ap.add_argument(
+        '--chromedriver-log-backups', type=int, default=3,
+        help='Number of rotated chromedriver logs to keep per configuration.')
 
 
 def main():
@@ -170,19 +939,58 @@ def main():
         help='Update configurations.',
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
-    ap_update.add_argument('config', nargs='*', type=str, default=[],
-                           help='Configuration to update')
-    ap_update.add_argument(
-        '-f', '--force', action='store_true',
-        help='Force update even if the configuration has already run recently.'
-    )
-    ap_update.add_argument('-a', '--all', action='store_true',
-                           help='Update all configurations.')
-    ap_update.add_argument(
-        '-p', '--parallelism', type=int, default=4,
-        help='Maximum number of configurations to update in parallel.')
+    add_selection_arguments(ap_update)
+    add_run_arguments(ap_update)
     ap_update.set_defaults(command_class=Updater)
 
+    ap_daemon = subparsers.add_parser(
+        'daemon',
+        help='Keep running, updating configurations as they become due.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    ap_daemon.add_argument(
+        'config', nargs='*', type=str, default=[],
+        help='Configuration to update.  Defaults to all configurations.')
+    ap_daemon.add_argument(
+        '--poll-interval', type=float, default=60,
+        help='Interval in seconds at which to check for due configurations '
+        'and changes to the configuration module.')
+    ap_daemon.add_argument(
+        '--retry-interval', type=float, default=60 * 60,
+        help='Time in seconds to wait before running a configuration again '
+        'after it failed.')
+    add_run_arguments(ap_daemon)
+    ap_daemon.set_defaults(command_class=DaemonCommand)
+
+    ap_enqueue = subparsers.add_parser(
+        'enqueue',
+        help='Add configurations to the queue shared by `worker` processes.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    add_selection_arguments(ap_enqueue)
+    add_schedule_arguments(ap_enqueue)
+    ap_enqueue.set_defaults(command_class=EnqueueCommand)
+
+    ap_worker = subparsers.add_parser(
+        'worker',
+        help='Run configurations from the shared queue.  The log directory '
+        'must be shared by all hosts running workers.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    ap_worker.add_argument(
+        '--lease', type=float, default=5 * 60,
+        help='Time in seconds after which a configuration claimed by a '
+        'worker that stopped sending heartbeats is claimed again.')
+    ap_worker.add_argument(
+        '--poll-interval', type=float, default=30,
+        help='Interval in seconds at which to check the queue.')
+    ap_worker.add_argument(
+        '--exit-when-done', action='store_true',
+        help='Exit once no configurations are pending or running on any '
+        'host, rather than waiting for more.')
+    add_run_arguments(ap_worker)
+    ap_worker.set_defaults(command_class=WorkerCommand)
+
     args = ap.parse_args()
 
     command = args.command_class(args)
@@ -74,6 +74,7 @@ from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.keys import Keys
 
 from . import scrape_lib
+from . import downloads
 
 logger = logging.getLogger('usbank_scrape')
 
@@ -245,12 +246,12 @@ class Scraper(scrape_lib.Scraper):
         except Exception as e:
             print(e)
 
-        # The default filename produced by the USBank portal
-        src = os.path.join(self.download_dir, 'export.qfx')
+        # The default filename produced by the USBank portal is export.qfx
+        _, src = self.wait_for_download()
         newfname = 'USBank - {}.ofx'.format(datetime.date.today().strftime('%Y-%m-%d'))
         dst = os.path.join(self.output_directory, newfname)
         logging.info('Moving file from {} to {}'.format(src, dst))
-        shutil.move(src, dst)
+        downloads.move_into_place(src, dst)
         logging.info('Success')
 
     def run(self):
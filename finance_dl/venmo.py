@@ -30,6 +30,10 @@ The following keys may be specified as part of the configuration dict:
   retrieve, starting from the previous UTC day.  Defaults to `365*4`.  If
   `earliest_history_date` is specified, `max_history_days` has no effect.
 
+- `time_budget`: Optional.  If specified, the number of seconds after which
+  to stop before the next statement month, leaving the remaining months to the
+  next run, as described in `finance_dl/time_budget.py`.
+
 Output format:
 ==============
 
@@ -224,7 +228,7 @@ class Scraper(scrape_lib.Scraper):
             (By.XPATH, '//*[text() = "Download CSV"]'))
         self.click(download_button)
         logger.info('Waiting for CSV download')
-        download_result, = self.wait_and_return(self.get_downloaded_file)
+        download_result = self.read_download()
         logger.info('Got CSV download')
         return download_result[1]
 
@@ -352,6 +356,10 @@ class Scraper(scrape_lib.Scraper):
                      start_date.strftime('%Y-%m-%d'))
 
         while start_date <= self.latest_history_date:
+            self.time_budget.check(
+                (self.latest_history_date.year - start_date.year) * 12 +
+                self.latest_history_date.month - start_date.month + 1,
+                'statement months')
             end_date = min(self.latest_history_date,
                            self.last_day_of_month(start_date))
             self.fetch_statement(start_date, end_date)
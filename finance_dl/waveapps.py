@@ -86,6 +86,10 @@ from atomicwrites import atomic_write
 
 logger = logging.getLogger('waveapps')
 
+# Resources needed by configurations of this module, used by
+# `finance_dl.update` to schedule them.  No browser is needed.
+RESOURCES = {'memory_mb': 100}
+
 
 class WaveScraper(object):
     def __init__(self, credentials: dict, output_directory: str,
@@ -0,0 +1,231 @@
+"""Shared queue of configurations for running `finance_dl.update` on many hosts.
+
+`update enqueue` adds the configurations that are due to a queue stored as a
+SQLite database in the update log directory, and `update worker` processes on
+any number of hosts claim and run them.  The log directory, and therefore the
+queue, run history and logs, must be on a filesystem shared by all hosts that
+supports SQLite locking, and the hosts' clocks must be synchronized.
+
+A worker claims a configuration with a lease, which it renews by heartbeats
+while the configuration runs.  If a worker dies, its lease expires and another
+worker claims the configuration again, up to `MAX_ATTEMPTS` times.  The result
+of a run is only recorded if the worker still holds the lease.
+
+Configurations that share an institution or a remote WebDriver endpoint (the
+`institution:` and `remote:` resources of `finance_dl.scheduler`) are not
+claimed by more than the allowed number of workers at once, across all hosts.
+Workers with a pool of remote endpoints (see `finance_dl.remote_pool`) count
+the configurations that use any endpoint of the pool against the capacity of
+the whole pool instead.
+
+Another broker can be substituted by implementing the methods of `WorkQueue`.
+"""
+
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+
+# Number of times a configuration is claimed before it is considered failed,
+# if its workers keep dying without recording a result.
+MAX_ATTEMPTS = 3
+
+# Queue states.
+PENDING = 'pending'
+CLAIMED = 'claimed'
+DONE = 'done'
+
+# Prefixes of resources that are limited across all hosts.
+SHARED_RESOURCE_PREFIXES = ('institution:', 'remote:')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    config TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    enqueue_time REAL NOT NULL,
+    priority REAL,
+    resources TEXT NOT NULL,
+    worker TEXT,
+    lease_expiry REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    status TEXT
+);
+"""
+
+
+class QueueEntry(NamedTuple):
+    config: str
+    state: str
+    worker: Optional[str]
+    lease_expiry: Optional[float]
+    attempts: int
+    # Final status of the run, such as `SUCCESS`, once `state` is `DONE`.
+    status: Optional[str]
+
+
+def get_shared_resources(resources: Mapping[str, float],
+                         aliases: Mapping[str, str] = {}) -> List[str]:
+    return sorted({
+        aliases.get(name, name)
+        for name in resources if name.startswith(SHARED_RESOURCE_PREFIXES)
+    })
+
+
+class WorkQueue(object):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._transaction() as conn:
+            conn.execute(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # The write lock is taken at the start of each transaction, so that
+        # concurrent claims from several hosts are serialized.
+        with self._lock:
+            conn = sqlite3.connect(self.path, timeout=60,
+                                   isolation_level=None)
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    yield conn
+                except:
+                    conn.execute('ROLLBACK')
+                    raise
+                conn.execute('COMMIT')
+            finally:
+                conn.close()
+
+    def enqueue(self, configs: Iterable[str],
+                resources: Mapping[str, Mapping[str, float]] = {},
+                priorities: Mapping[str, float] = {},
+                now: Optional[float] = None) -> List[str]:
+        """Adds `configs` to the queue, returning those that were added.
+
+        Configurations that are already pending or claimed are not added
+        again.  Pending configurations are claimed in decreasing order of
+        priority, and those without a priority first.
+        """
+        now = time.time() if now is None else now
+        added = []
+        with self._transaction() as conn:
+            for config in configs:
+                row = conn.execute('SELECT state FROM queue WHERE config = ?',
+                                   (config, )).fetchone()
+                if row is not None and row[0] != DONE:
+                    continue
+                conn.execute(
+                    'INSERT OR REPLACE INTO queue (config, state, '
+                    'enqueue_time, priority, resources) VALUES '
+                    '(?, ?, ?, ?, ?)',
+                    (config, PENDING, now, priorities.get(config),
+                     json.dumps(resources.get(config, {}))))
+                added.append(config)
+        return added
+
+    def claim(self, worker: str, lease_duration: float,
+              shared_limits: Mapping[str, int] = {},
+              aliases: Mapping[str, str] = {},
+              now: Optional[float] = None) -> Optional[str]:
+        """Claims the next configuration that can run, if any.
+
+        :param worker: Identifier of the claiming worker.
+        :param lease_duration: Time in seconds until the claim expires, unless
+            renewed by `heartbeat`.
+        :param shared_limits: Maps prefixes of `SHARED_RESOURCE_PREFIXES`, or
+            longer prefixes such as a full resource name, to the number of
+            live claims that may use each such resource.  The longest matching
+            prefix applies, and resources without one allow one claim.
+        :param aliases: Maps resource names to the shared resource they count
+            against, such as the endpoints of a remote pool to the pool.
+        """
+        now = time.time() if now is None else now
+        with self._transaction() as conn:
+            # Claims whose worker died without completing them.
+            for config, attempts in conn.execute(
+                    'SELECT config, attempts FROM queue WHERE state = ? AND '
+                    'lease_expiry < ?', (CLAIMED, now)).fetchall():
+                if attempts >= MAX_ATTEMPTS:
+                    conn.execute(
+                        'UPDATE queue SET state = ?, status = ? '
+                        'WHERE config = ?',
+                        (DONE, 'FAILED: lease expired %d times' % attempts,
+                         config))
+                else:
+                    conn.execute(
+                        'UPDATE queue SET state = ? WHERE config = ?',
+                        (PENDING, config))
+            usage: Dict[str, int] = {}
+            for (resources, ) in conn.execute(
+                    'SELECT resources FROM queue WHERE state = ?',
+                    (CLAIMED, )):
+                for name in get_shared_resources(json.loads(resources),
+                                                 aliases):
+                    usage[name] = usage.get(name, 0) + 1
+            for config, resources in conn.execute(
+                    'SELECT config, resources FROM queue WHERE state = ? '
+                    'ORDER BY priority IS NOT NULL, priority DESC, '
+                    'enqueue_time, config', (PENDING, )).fetchall():
+                if any(
+                        usage.get(name, 0) >= self._get_shared_limit(
+                            name, shared_limits)
+                        for name in get_shared_resources(
+                            json.loads(resources), aliases)):
+                    continue
+                conn.execute(
+                    'UPDATE queue SET state = ?, worker = ?, lease_expiry = ?, '
+                    'attempts = attempts + 1, status = NULL WHERE config = ?',
+                    (CLAIMED, worker, now + lease_duration, config))
+                return config
+        return None
+
+    @staticmethod
+    def _get_shared_limit(name: str, shared_limits: Mapping[str, int]) -> int:
+        prefixes = [
+            prefix for prefix in shared_limits if name.startswith(prefix)
+        ]
+        if not prefixes:
+            return 1
+        return shared_limits[max(prefixes, key=len)]
+
+    def heartbeat(self, worker: str, configs: Iterable[str],
+                  lease_duration: float,
+                  now: Optional[float] = None) -> List[str]:
+        """Renews the leases of `configs`, returning those no longer held."""
+        now = time.time() if now is None else now
+        lost = []
+        with self._transaction() as conn:
+            for config in configs:
+                cursor = conn.execute(
+                    'UPDATE queue SET lease_expiry = ? WHERE config = ? AND '
+                    'state = ? AND worker = ?',
+                    (now + lease_duration, config, CLAIMED, worker))
+                if cursor.rowcount == 0:
+                    lost.append(config)
+        return lost
+
+    def complete(self, worker: str, config: str, status: str) -> bool:
+        """Records the result of `config`, if `worker` still holds its lease."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE queue SET state = ?, status = ?, lease_expiry = NULL '
+                'WHERE config = ? AND state = ? AND worker = ?',
+                (DONE, status, config, CLAIMED, worker))
+            return cursor.rowcount == 1
+
+    def get_entries(self) -> Dict[str, QueueEntry]:
+        with self._transaction() as conn:
+            return {
+                row[0]: QueueEntry(*row)
+                for row in conn.execute(
+                    'SELECT config, state, worker, lease_expiry, attempts, '
+                    'status FROM queue')
+            }
+
+    def count_unfinished(self) -> int:
+        """Returns the number of configurations pending or claimed."""
+        with self._transaction() as conn:
+            return conn.execute('SELECT COUNT(*) FROM queue WHERE state != ?',
+                                (DONE, )).fetchone()[0]
@@ -0,0 +1,313 @@
+"""Runs configurations in long-lived worker processes.
+
+By default, `finance_dl.update` runs each configuration in a new Python
+process, which imports the configuration module, `finance_dl`, and the
+dependencies of the configuration's module (selenium, bs4, ofxclient, mintapi,
+...) from scratch.  With `update --worker-pool`, configurations are instead
+run by worker processes that import these once and then call `module.run` for
+successive configurations.
+
+Each worker runs one configuration at a time, so all of its output while a
+configuration runs belongs to that configuration.  The end of a configuration
+is marked by a line containing a random token known only to the pool,
+followed by a JSON message with the return code.  Jobs are sent to the worker
+as JSON lines over a separate pipe, so that the worker's standard input stays
+available to the modules.
+
+After each configuration, any processes it left behind, such as chromedriver,
+are killed.  A worker that times out is killed along with its process tree,
+and a worker that crashes is discarded; either way, the next configuration
+starts a new worker.  Workers are also replaced after `max_jobs_per_worker`
+configurations, to bound the effect of any state leaked between runs, and by
+`WorkerPool.restart`, after `update daemon` reloads the configuration module.
+
+Usage in a worker (started by `WorkerPool`):
+
+    python -m finance_dl.worker_pool --config-module <module> --job-fd <fd>
+"""
+
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, TextIO
+import argparse
+import asyncio
+import functools
+import importlib
+import json
+import logging
+import os
+import secrets
+import sys
+import traceback
+
+from . import cli
+from . import process_runner
+
+TOKEN_ENV_VAR = 'FINANCE_DL_WORKER_TOKEN'
+
+DEFAULT_MAX_JOBS_PER_WORKER = 20
+
+
+class Worker(object):
+    def __init__(self, process: asyncio.subprocess.Process, job_fd: int,
+                 token: str, generation: int):
+        self.process = process
+        self.job_fd = job_fd
+        self.token = token
+        self.generation = generation
+        self.num_jobs = 0
+
+    def is_alive(self) -> bool:
+        return self.process.returncode is None
+
+    def send_job(self, job: Mapping):
+        os.write(self.job_fd, (json.dumps(job) + '\n').encode())
+
+    def close_jobs(self):
+        if self.job_fd is not None:
+            os.close(self.job_fd)
+            self.job_fd = None
+
+
+class WorkerPool(object):
+    """Pool of worker processes that run configurations.
+
+    :param config_module: Name of the module defining the configurations.
+    :param preload: Names of modules for the workers to import on startup.
+    :param env: Environment of the workers; defaults to `os.environ`.
+    """
+
+    def __init__(self, config_module: str, preload: Sequence[str] = (),
+                 env: Optional[Mapping[str, str]] = None,
+                 max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER):
+        self.config_module = config_module
+        self.preload = list(preload)
+        self.env = dict(env if env is not None else os.environ)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._idle: List[Worker] = []
+        self.num_started = 0
+        self.num_crashed = 0
+        self.num_jobs = 0
+        self._generation = 0
+
+    async def _start_worker(self) -> Worker:
+        token = secrets.token_hex(16)
+        env = dict(self.env)
+        env[TOKEN_ENV_VAR] = token
+        env[process_runner.KEEP_PROCESS_GROUP_ENV_VAR] = '1'
+        job_read_fd, job_write_fd = os.pipe()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, '-m', 'finance_dl.worker_pool',
+                '--config-module', self.config_module, '--job-fd',
+                str(job_read_fd), '--preload', *self.preload,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT, env=env,
+                start_new_session=True, pass_fds=(job_read_fd, ),
+                limit=1024 * 1024)
+        except:
+            os.close(job_write_fd)
+            raise
+        finally:
+            os.close(job_read_fd)
+        self.num_started += 1
+        return Worker(process, job_write_fd, token, self._generation)
+
+    async def _get_worker(self, job: Mapping) -> Worker:
+        """Returns a worker to which `job` has been sent."""
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.is_alive():
+                try:
+                    worker.send_job(job)
+                    return worker
+                except OSError:
+                    pass
+            self.num_crashed += 1
+            await self._discard(worker)
+        worker = await self._start_worker()
+        worker.send_job(job)
+        return worker
+
+    async def _discard(self, worker: Worker, kill: bool = True) -> int:
+        """Stops `worker`, returning the number of processes killed."""
+        loop = asyncio.get_event_loop()
+        worker.close_jobs()
+        num_killed = 0
+        if kill:
+            num_killed = await loop.run_in_executor(
+                None,
+                functools.partial(process_runner.kill_tree,
+                                  worker.process.pid,
+                                  include_root=worker.is_alive()))
+        await worker.process.wait()
+        return num_killed
+
+    async def run(self, config: str, on_line: Callable[[str], None],
+                  environ: Mapping[str, str] = {},
+                  timeout: Optional[float] = None,
+                  inactivity_timeout: Optional[float] = None
+                  ) -> process_runner.RunResult:
+        """Runs `config` in a worker, calling `on_line` with its output.
+
+        :param environ: Environment variables to set while `config` runs.
+        """
+        loop = asyncio.get_event_loop()
+        worker = await self._get_worker(
+            dict(config=config, environ=dict(environ)))
+        self.num_jobs += 1
+        last_output_time = loop.time()
+
+        async def read_output() -> Optional[Dict]:
+            nonlocal last_output_time
+            assert worker.process.stdout is not None
+            async for line in process_runner.iter_lines(
+                    worker.process.stdout):
+                last_output_time = loop.time()
+                index = line.find(worker.token)
+                if index == -1:
+                    on_line(line)
+                    continue
+                if index > 0:
+                    on_line(line[:index] + '\n')
+                return json.loads(line[index + len(worker.token):])
+            return None
+
+        reader = asyncio.ensure_future(read_output())
+        done = False
+        try:
+            end_reason, peak_rss_kb = await process_runner.supervise(
+                worker.process.pid, reader, lambda: last_output_time,
+                timeout=timeout, inactivity_timeout=inactivity_timeout)
+            done = True
+        finally:
+            if not done:
+                reader.cancel()
+                worker.process.kill()
+                worker.close_jobs()
+
+        if end_reason != process_runner.EXITED:
+            reader.cancel()
+            num_killed = await self._discard(worker)
+            return process_runner.RunResult(
+                end_reason=end_reason, return_code=await
+                worker.process.wait(), peak_rss_kb=peak_rss_kb,
+                num_killed=num_killed)
+
+        message = reader.result()
+        if message is None:
+            # The worker exited before finishing the configuration.
+            self.num_crashed += 1
+            return_code = await worker.process.wait()
+            num_killed = await self._discard(worker)
+            return process_runner.RunResult(
+                end_reason=end_reason, return_code=return_code,
+                peak_rss_kb=peak_rss_kb, num_killed=num_killed)
+
+        # Kill anything left behind by the configuration, such as a browser
+        # that it failed to shut down, but keep the worker.
+        num_killed = 0
+        if len(process_runner.get_process_tree(
+                worker.process.pid, process_runner.list_processes())) > 1:
+            num_killed = await loop.run_in_executor(
+                None,
+                functools.partial(process_runner.kill_tree,
+                                  worker.process.pid, include_root=False))
+        worker.num_jobs += 1
+        if (worker.num_jobs >= self.max_jobs_per_worker or
+                worker.generation != self._generation):
+            await self._discard(worker, kill=False)
+        else:
+            self._idle.append(worker)
+        return process_runner.RunResult(
+            end_reason=end_reason, return_code=message['return_code'],
+            peak_rss_kb=peak_rss_kb, num_killed=num_killed)
+
+    async def restart(self):
+        """Replaces all workers, once they finish their current configuration."""
+        self._generation += 1
+        await self.close()
+
+    async def close(self):
+        """Stops all idle workers."""
+        while self._idle:
+            worker = self._idle.pop()
+            worker.close_jobs()
+            try:
+                await asyncio.wait_for(worker.process.wait(),
+                                       process_runner.KILL_GRACE_PERIOD)
+            except asyncio.TimeoutError:
+                await self._discard(worker)
+
+    def get_summary(self) -> str:
+        return ('Worker pool: %d configurations run by %d workers, '
+                '%d workers crashed' % (self.num_jobs, self.num_started,
+                                        self.num_crashed))
+
+
+def _send_message(output: TextIO, token: str, message: Mapping):
+    sys.stderr.flush()
+    sys.stdout.flush()
+    output.write('%s%s\n' % (token, json.dumps(message)))
+    output.flush()
+
+
+def run_job(config_module, config: str, environ: Mapping[str, str]) -> int:
+    """Runs `config` in this process, returning its exit status."""
+    saved_environ = {key: os.environ.get(key) for key in environ}
+    os.environ.update(environ)
+    try:
+        spec = getattr(config_module, 'CONFIG_' + config)()
+        module = cli.load_module(spec)
+        spec.setdefault('headless', True)
+        module.run(**spec)
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        for key, value in saved_environ.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--config-module', type=str, required=True)
+    ap.add_argument('--job-fd', type=int, required=True)
+    ap.add_argument('--preload', nargs='*', default=[])
+    args = ap.parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(filename)s:%(lineno)d [%(levelname)s] %(message)s')
+    token = os.environ.pop(TOKEN_ENV_VAR)
+    # Messages go to the original standard output, even if a configuration
+    # replaced `sys.stdout`.
+    output = sys.__stdout__
+    assert output is not None
+
+    sys.path.append(os.getcwd())
+    config_module = importlib.import_module(args.config_module)
+    for name in args.preload:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            # Reported again when a configuration uses the module.
+            print('Failed to preload %s: %r' % (name, e))
+
+    with open(args.job_fd, 'r', encoding='utf-8') as jobs:
+        for line in jobs:
+            job = json.loads(line)
+            return_code = run_job(config_module, job['config'],
+                                  job['environ'])
+            _send_message(output, token, dict(return_code=return_code))
+
+
+if __name__ == '__main__':
+    main()
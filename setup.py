@@ -95,6 +95,7 @@ setuptools.setup(
         'selenium',
         'ipython',
         'selenium-requests',
+        'requests',
         'chromedriver-binary',
         'beancount>=2.1.2',
         'atomicwrites>=1.3.0',
@@ -0,0 +1,107 @@
+import datetime
+import threading
+import time
+
+import pytest
+
+from finance_dl import backfill
+from finance_dl.backfill import Ledger, Window, plan_windows, run_backfill
+
+
+def d(day):
+    return datetime.date(2020, 1, 1) + datetime.timedelta(days=day)
+
+
+def test_plan_windows():
+    assert plan_windows(d(0), d(9), 4) == [
+        Window(d(0), d(3)), Window(d(4), d(7)), Window(d(8), d(9))
+    ]
+    assert plan_windows(d(0), d(9), 4, overlap_days=1) == [
+        Window(d(0), d(3)), Window(d(3), d(6)), Window(d(6), d(9))
+    ]
+    assert plan_windows(d(0), d(2), 30) == [Window(d(0), d(2))]
+    assert plan_windows(d(1), d(0), 30) == []
+    with pytest.raises(ValueError):
+        plan_windows(d(0), d(9), 2, overlap_days=2)
+
+
+def test_ledger(tmp_path):
+    path = str(tmp_path / backfill.LEDGER_NAME)
+    ledger = Ledger(path)
+    windows = plan_windows(d(0), d(9), 4)
+    ledger.add(windows)
+    ledger.mark_done(windows[1])
+    ledger = Ledger(path)
+    assert ledger.get_pending() == [windows[0], windows[2]]
+    # Windows already recorded are not planned again.
+    ledger.add(windows)
+    assert ledger.get_pending() == [windows[0], windows[2]]
+
+
+def test_run_backfill(tmp_path):
+    ledger = Ledger(str(tmp_path / backfill.LEDGER_NAME))
+    windows = plan_windows(d(0), d(99), 10)
+    fetched = []
+    lock = threading.Lock()
+    num_active = 0
+    max_active = 0
+
+    def fetch(window):
+        nonlocal num_active, max_active
+        with lock:
+            num_active += 1
+            max_active = max(max_active, num_active)
+        time.sleep(0.02)
+        with lock:
+            num_active -= 1
+            fetched.append(window)
+        if window == windows[3]:
+            raise RuntimeError('failed')
+        return window != windows[5]
+
+    with pytest.raises(RuntimeError):
+        run_backfill(ledger, windows, fetch, parallelism=3)
+    # All windows were attempted, at most 3 at once.
+    assert sorted(fetched) == windows
+    assert 1 < max_active <= 3
+    assert ledger.get_pending() == [windows[3], windows[5]]
+
+    # The next backfill only fetches the pending windows.
+    fetched.clear()
+    assert run_backfill(ledger, [], lambda window: True) == 2
+    assert ledger.get_pending() == []
+
+
+def test_run_backfill_should_stop(tmp_path):
+    ledger = Ledger(str(tmp_path / backfill.LEDGER_NAME))
+    windows = plan_windows(d(0), d(99), 10)
+    assert run_backfill(ledger, windows, lambda window: True,
+                        should_stop=lambda: True) == 0
+    assert ledger.get_pending() == windows
+
+
+def test_rate_limiter():
+    limiter = backfill.RateLimiter(0.05)
+    start_time = time.time()
+    for _ in range(3):
+        limiter.wait()
+    assert time.time() - start_time >= 0.1
+
+
+def test_run_backfill_gives_up_after_max_attempts(tmp_path):
+    path = str(tmp_path / backfill.LEDGER_NAME)
+    windows = plan_windows(d(0), d(19), 10)
+    fetched = []
+
+    def fetch(window):
+        fetched.append(window)
+        return window != windows[1]
+
+    for _ in range(2):
+        run_backfill(Ledger(path, max_attempts=2), windows, fetch)
+    assert fetched == windows + [windows[1]]
+    ledger = Ledger(path, max_attempts=2)
+    assert ledger.attempts[windows[1]] == 2
+    assert ledger.get_pending() == []
+    assert run_backfill(ledger, windows, fetch) == 0
+    assert len(fetched) == 3
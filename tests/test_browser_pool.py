@@ -0,0 +1,142 @@
+import os
+import tempfile
+
+from finance_dl import browser_pool
+
+
+class FakeDriver(object):
+    """Records the DevTools commands sent to a browser with simulated tabs."""
+
+    def __init__(self, history=(), cookie_domains=()):
+        self.command_executor = type('Executor', (), {'_commands': {}})()
+        self.handles = ['tab1', 'tab2']
+        self.current = 'tab1'
+        self.history = list(history)
+        self.cookie_domains = list(cookie_domains)
+        self.commands = []
+        self.alive = True
+        self.num_tabs_created = 0
+        driver = self
+
+        class SwitchTo(object):
+            def window(self, handle):
+                assert handle in driver.handles
+                driver.current = handle
+
+        self.switch_to = SwitchTo()
+
+    @property
+    def window_handles(self):
+        if not self.alive:
+            raise RuntimeError('browser is gone')
+        return list(self.handles)
+
+    def close(self):
+        self.handles.remove(self.current)
+
+    def quit(self):
+        self.alive = False
+
+    def execute(self, name, params):
+        assert name == 'executeCdpCommand'
+        cmd = params['cmd']
+        self.commands.append((cmd, params['params']))
+        if cmd == 'Page.getNavigationHistory':
+            return {'value': {'entries': [{'url': url} for url in self.history]}}
+        if cmd == 'Network.getAllCookies':
+            return {
+                'value': {
+                    'cookies': [{'domain': domain}
+                                for domain in self.cookie_domains]
+                }
+            }
+        if cmd == 'Target.createTarget':
+            self.num_tabs_created += 1
+            self.handles.append('new%d' % self.num_tabs_created)
+        return {'value': {}}
+
+
+class FakeScraper(object):
+    def __init__(self, driver):
+        self.driver = driver
+
+
+def make_session(driver):
+    return browser_pool.PooledSession(FakeScraper(driver), tempfile.mkdtemp())
+
+
+def test_reset_replaces_tabs_and_clears_site_data():
+    driver = FakeDriver(
+        history=['about:blank', 'https://bank.example.com/accounts?id=1'],
+        cookie_domains=['.login.example.com'])
+    session = make_session(driver)
+    with open(os.path.join(session.download_dir, 'statement.pdf'), 'w'):
+        pass
+
+    session.reset()
+
+    assert driver.handles == ['new1']
+    assert driver.current == 'new1'
+    cleared = [
+        params['origin'] for cmd, params in driver.commands
+        if cmd == 'Storage.clearDataForOrigin'
+    ]
+    assert cleared == [
+        'http://login.example.com', 'https://bank.example.com',
+        'https://login.example.com'
+    ]
+    assert all(params['storageTypes'] == 'all'
+               for cmd, params in driver.commands
+               if cmd == 'Storage.clearDataForOrigin')
+    assert ('Network.clearBrowserCookies', {}) in driver.commands
+    assert ('Network.clearBrowserCache', {}) in driver.commands
+    assert os.listdir(session.download_dir) == []
+    session.quit()
+
+
+class FakePool(browser_pool.BrowserPool):
+    def __init__(self, size, drivers):
+        super().__init__(size)
+        self.drivers = list(drivers)
+
+    def _launch(self):
+        return make_session(self.drivers.pop(0))
+
+
+def test_lease_reuses_reset_session():
+    driver = FakeDriver()
+    pool = FakePool(1, [driver])
+    pool.start()
+    with pool.lease() as session:
+        assert session.driver is driver
+    with pool.lease() as session:
+        assert session.driver is driver
+        assert session.num_leases == 2
+    assert pool.hits == 2
+    assert pool.misses == 0
+    pool.close()
+    assert not driver.alive
+
+
+def test_session_that_cannot_be_reset_is_relaunched():
+    driver = FakeDriver()
+    replacement = FakeDriver()
+    pool = FakePool(1, [driver, replacement])
+    pool.start()
+    with pool.lease() as session:
+        driver.alive = False
+    with pool.lease() as session:
+        assert session.driver is replacement
+    pool.close()
+
+
+def test_lease_yields_none_when_relaunch_fails():
+    driver = FakeDriver()
+    pool = FakePool(1, [driver])
+    pool.start()
+    driver.alive = False
+    with pool.lease() as session:
+        assert session is None
+    with pool.lease() as session:
+        assert session is None
+    assert pool.misses == 2
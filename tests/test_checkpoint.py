@@ -0,0 +1,88 @@
+import json
+
+from finance_dl import checkpoint
+from finance_dl.checkpoint import Checkpoint
+
+
+def test_checkpoint_journal_replay(tmp_path):
+    path = str(tmp_path / 'config.journal')
+    checkpoint = Checkpoint(path)
+    assert not checkpoint.has_records()
+    assert checkpoint.run_step('listing', lambda: ['a', 'b', 'c']) == [
+        'a', 'b', 'c'
+    ]
+    checkpoint.plan('invoice', ['a', 'b', 'c'])
+    with checkpoint.unit('invoice', 'a'):
+        pass
+    checkpoint.start('invoice', 'b')
+    # A record cut short when the run was killed.
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "done", "step": "inv')
+
+    resumed = Checkpoint(path)
+    assert resumed.run_step('listing', lambda: []) == ['a', 'b', 'c']
+    assert resumed.get_unfinished('invoice') == ['b', 'c']
+    assert resumed.get_in_flight('invoice') == ['b']
+    assert resumed.is_done('invoice', 'a')
+    assert not resumed.is_done('invoice', 'b')
+    assert resumed.describe() == (
+        'invoice: 2 of 3 unfinished, 1 in flight; listing: 1 done')
+    # Records appended after the incomplete one are kept.
+    resumed.mark_done('invoice', 'c')
+    assert Checkpoint(path).get_unfinished('invoice') == ['b']
+
+    resumed.clear()
+    assert not (tmp_path / 'config.journal').exists()
+    assert not Checkpoint(path).has_records()
+
+
+def test_checkpoint_legacy_file(tmp_path):
+    path = tmp_path / 'checkpoint.json'
+    path.write_text(
+        json.dumps({'invoice': {'a': {'duration': 2.0, 'result': None}}}))
+    checkpoint = Checkpoint(str(path))
+    assert checkpoint.is_done('invoice', 'a')
+    assert checkpoint.time_saved == 2.0
+    checkpoint.mark_done('invoice', 'b')
+    assert Checkpoint(str(path)).is_done('invoice', 'b')
+    assert Checkpoint(str(path)).is_done('invoice', 'a')
+
+
+def run_listing(path, listing, outcome=None):
+    """Simulates a run that lists `listing`, downloads its first unit, and
+    ends with `outcome`."""
+    journal = Checkpoint(path)
+    journal.begin_run()
+    units = journal.run_step('listing', lambda: listing)
+    journal.plan('invoice', units)
+    with journal.unit('invoice', units[0]):
+        pass
+    if outcome is not None:
+        journal.end_run(outcome)
+    return units
+
+
+def test_checkpoint_failed_run_does_not_suppress_listing(tmp_path):
+    path = str(tmp_path / 'config.journal')
+    run_listing(path, ['a', 'b'], checkpoint.FAILED)
+    # The listing is computed again, but completed units are kept.
+    assert run_listing(path, ['c', 'a', 'b'], checkpoint.PARTIAL) == [
+        'c', 'a', 'b'
+    ]
+    resumed = Checkpoint(path)
+    assert resumed.is_done('invoice', 'a')
+    # After a partial or killed run, the listing is reused.
+    assert resumed.get_unfinished('invoice') == ['b']
+    assert run_listing(path, ['d']) == ['c', 'a', 'b']
+
+
+def test_checkpoint_discarded_after_unsuccessful_runs(tmp_path):
+    path = str(tmp_path / 'config.journal')
+    run_listing(path, ['a', 'b'], checkpoint.PARTIAL)
+    for _ in range(checkpoint.MAX_UNSUCCESSFUL_RUNS - 1):
+        # Killed runs.
+        assert run_listing(path, ['c']) == ['a', 'b']
+    run_listing(path, ['c'], checkpoint.FAILED)
+    resumed = Checkpoint(path)
+    assert not resumed.has_records()
+    assert resumed.runs == []
@@ -0,0 +1,48 @@
+"""Regression test for the time from starting `finance_dl.cli` to `module.run`.
+
+Neither the CLI nor `finance_dl` itself may import the heavy dependencies of
+the scrapers; they are imported by the configuration's module, if needed.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Maximum time in seconds from starting the CLI to calling `module.run`, for a
+# module with no dependencies.  An interpreter starts in well under 0.1s.
+STARTUP_BUDGET = 1.0
+
+HEAVY_MODULES = [
+    'selenium', 'seleniumrequests', 'bs4', 'lxml', 'dateutil', 'jsonschema',
+    'openpyxl', 'atomicwrites', 'requests', 'urllib3', 'ofxclient', 'mintapi'
+]
+
+# Modules imported with `finance_dl.lazy` are in `sys.modules` with a subclass
+# of `ModuleType` until they are loaded.
+NOOP_MODULE = r'''
+import json, sys, time, types
+def run(heavy_modules, **kwargs):
+    loaded = [m for m in heavy_modules
+              if type(sys.modules.get(m)) is types.ModuleType]
+    print(json.dumps([time.time(), sorted(loaded)]))
+'''
+
+
+def test_cli_startup_time(tmp_path):
+    (tmp_path / 'startup_noop.py').write_text(NOOP_MODULE)
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join([str(tmp_path), package_dir]))
+    spec = json.dumps(dict(module='startup_noop', heavy_modules=HEAVY_MODULES))
+    durations = []
+    for _ in range(3):
+        start_time = time.time()
+        output = subprocess.check_output(
+            [sys.executable, '-m', 'finance_dl.cli', '--spec', spec], env=env,
+            universal_newlines=True)
+        run_time, heavy_modules = json.loads(output.splitlines()[-1])
+        assert heavy_modules == []
+        durations.append(run_time - start_time)
+    assert min(durations) < STARTUP_BUDGET
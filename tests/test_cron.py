@@ -0,0 +1,40 @@
+import datetime
+
+import pytest
+
+from finance_dl.cron import CronExpression
+
+
+def next_time(expression, after):
+    timestamp = CronExpression(expression).get_next_time(after.timestamp())
+    return datetime.datetime.fromtimestamp(timestamp)
+
+
+def test_cron_next_time():
+    # A Wednesday.
+    after = datetime.datetime(2024, 5, 15, 10, 30, 20)
+    assert next_time('* * * * *', after) == datetime.datetime(
+        2024, 5, 15, 10, 31)
+    assert next_time('*/15 * * * *', after) == datetime.datetime(
+        2024, 5, 15, 10, 45)
+    assert next_time('0 6 * * *', after) == datetime.datetime(
+        2024, 5, 16, 6, 0)
+    assert next_time('0 6 * * 1', after) == datetime.datetime(
+        2024, 5, 20, 6, 0)
+    assert next_time('0 6 * * 7', after) == datetime.datetime(
+        2024, 5, 19, 6, 0)
+    assert next_time('@monthly', after) == datetime.datetime(2024, 6, 1)
+    assert next_time('30 8-10,14 * * 1-5', after) == datetime.datetime(
+        2024, 5, 15, 14, 30)
+    # Either the day of the month or the day of the week.
+    assert next_time('0 0 1 * 5', after) == datetime.datetime(2024, 5, 17)
+    assert next_time('0 0 29 2 *', after) == datetime.datetime(2028, 2, 29)
+
+
+def test_cron_invalid():
+    for expression in ['* * * *', '60 * * * *', '* * * * 8', 'x * * * *',
+                       '*/0 * * * *']:
+        with pytest.raises(ValueError):
+            CronExpression(expression)
+    with pytest.raises(ValueError):
+        CronExpression('0 0 31 2 *').get_next_time(0)
@@ -0,0 +1,46 @@
+import os
+import threading
+import time
+
+import pytest
+
+from finance_dl import downloads
+
+
+def test_wait_for_download_ignores_partial_files(tmp_path):
+    partial_path = tmp_path / 'statement.pdf.crdownload'
+
+    def download():
+        partial_path.write_bytes(b'data')
+        time.sleep(0.1)
+        os.rename(partial_path, tmp_path / 'statement.pdf')
+
+    thread = threading.Thread(target=download)
+    thread.start()
+    name, path = downloads.wait_for_download(str(tmp_path), timeout=5)
+    thread.join()
+    assert name == 'statement.pdf'
+    assert path == str(tmp_path / 'statement.pdf')
+
+
+def test_wait_for_download_times_out(tmp_path):
+    (tmp_path / 'statement.pdf.crdownload').write_bytes(b'data')
+    with pytest.raises(TimeoutError):
+        downloads.wait_for_download(str(tmp_path), timeout=0.2)
+
+
+def test_wait_for_download_rejects_multiple_files(tmp_path):
+    (tmp_path / 'a.pdf').write_bytes(b'data')
+    (tmp_path / 'b.pdf').write_bytes(b'data')
+    with pytest.raises(RuntimeError):
+        downloads.wait_for_download(str(tmp_path), timeout=1)
+
+
+def test_move_into_place(tmp_path):
+    src = tmp_path / 'download' / 'a.pdf'
+    src.parent.mkdir()
+    src.write_bytes(b'data')
+    dest = tmp_path / 'out.pdf'
+    downloads.move_into_place(str(src), str(dest))
+    assert dest.read_bytes() == b'data'
+    assert not src.exists()
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from finance_dl import http_client
+from finance_dl.http_client import run_concurrently
+
+
+def test_run_concurrently_preserves_order_and_bounds_concurrency():
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    def func(x):
+        nonlocal active, max_active
+        with lock:
+            active += 1
+            max_active = max(max_active, active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+        return x * 2
+
+    assert run_concurrently(func, range(10), max_workers=3) == [
+        x * 2 for x in range(10)
+    ]
+    assert max_active <= 3
+
+
+def test_run_concurrently_raises_after_all_calls_finish():
+    done = []
+
+    def func(x):
+        if x == 0:
+            raise ValueError('failed')
+        time.sleep(0.01)
+        done.append(x)
+
+    with pytest.raises(ValueError):
+        run_concurrently(func, range(4), max_workers=4)
+    assert sorted(done) == [1, 2, 3]
+
+
+class FakeResponse(object):
+    def __init__(self, chunks, content_type):
+        self.chunks = chunks
+        self.headers = {'Content-Type': content_type}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+
+
+class FakeSession(object):
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get(self, url, stream=False):
+        return self.responses[url]
+
+
+def test_fetch_to_file_checks_magic(tmp_path):
+    session = FakeSession({
+        'pdf': FakeResponse([b'%P', b'DF-1.4\n', b'data'], 'application/pdf'),
+        'login': FakeResponse([b'<html>Please log in</html>'], 'text/html'),
+    })
+    pdf_path = str(tmp_path / 'a.pdf')
+    assert http_client.fetch_to_file(session, 'pdf', pdf_path,
+                                     magic=http_client.PDF_MAGIC) == 13
+    assert (tmp_path / 'a.pdf').read_bytes() == b'%PDF-1.4\ndata'
+    login_path = tmp_path / 'b.pdf'
+    with pytest.raises(RuntimeError, match='text/html'):
+        http_client.fetch_to_file(session, 'login', str(login_path),
+                                  magic=http_client.PDF_MAGIC)
+    assert not login_path.exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['a.pdf']
@@ -0,0 +1,27 @@
+import sys
+
+import pytest
+
+from finance_dl import lazy
+
+
+def test_import_module_defers_execution(tmp_path, monkeypatch):
+    (tmp_path / 'lazy_target.py').write_text(
+        'import sys\nsys.lazy_target_executed = True\nvalue = 42\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'lazy_target', raising=False)
+    try:
+        module = lazy.import_module('lazy_target')
+        assert not hasattr(sys, 'lazy_target_executed')
+        assert lazy.import_module('lazy_target') is module
+        assert module.value == 42
+        assert sys.lazy_target_executed
+    finally:
+        sys.modules.pop('lazy_target', None)
+        if hasattr(sys, 'lazy_target_executed'):
+            del sys.lazy_target_executed
+
+
+def test_import_module_missing():
+    with pytest.raises(ModuleNotFoundError):
+        lazy.import_module('finance_dl_no_such_module')
@@ -0,0 +1,38 @@
+import gzip
+import os
+
+from finance_dl.log_rotation import rotate_log
+
+
+def test_rotate_log(tmp_path):
+    path = str(tmp_path / 'chromedriver.log')
+    assert not rotate_log(path, max_bytes=10, backup_count=2)
+    for contents in [b'first run\n', b'second run\n', b'third run\n']:
+        with open(path, 'wb') as f:
+            f.write(contents)
+        assert not rotate_log(path, max_bytes=len(contents), backup_count=2)
+        assert rotate_log(path, max_bytes=5, backup_count=2)
+        assert not os.path.exists(path)
+    assert sorted(os.listdir(str(tmp_path))) == [
+        'chromedriver.log.1.gz', 'chromedriver.log.2.gz'
+    ]
+    with gzip.open(path + '.1.gz', 'rb') as f:
+        assert f.read() == b'third run\n'
+    with gzip.open(path + '.2.gz', 'rb') as f:
+        assert f.read() == b'second run\n'
+
+
+def test_rotate_log_copy_truncate(tmp_path):
+    path = str(tmp_path / 'chromedriver.log')
+    with open(path, 'ab') as writer:
+        writer.write(b'first\n')
+        writer.flush()
+        assert rotate_log(path, max_bytes=5, backup_count=1,
+                          copy_truncate=True)
+        # The writer keeps appending to the same, now empty, file.
+        writer.write(b'second\n')
+        writer.flush()
+    with open(path, 'rb') as f:
+        assert f.read() == b'second\n'
+    with gzip.open(path + '.1.gz', 'rb') as f:
+        assert f.read() == b'first\n'
@@ -0,0 +1,50 @@
+import asyncio
+import sys
+import time
+
+from finance_dl import process_runner
+
+# Starts a grandchild in a different process group, like
+# `chromedriver_wrapper` does, and then hangs without output.
+HANGING_SCRIPT = r'''
+import subprocess, sys, time
+child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'],
+                         start_new_session=True)
+print(child.pid, flush=True)
+time.sleep(60)
+'''
+
+
+def run(argv, **kwargs):
+    lines = []
+    result = asyncio.run(
+        process_runner.run_process(argv, lines.append, **kwargs))
+    return result, lines
+
+
+def test_run_process_collects_output():
+    result, lines = run(
+        [sys.executable, '-c', 'print("a"); print("b"); raise SystemExit(3)'])
+    assert result.end_reason == process_runner.EXITED
+    assert result.return_code == 3
+    assert lines == ['a\n', 'b\n']
+
+
+def test_run_process_inactivity_timeout_kills_process_tree():
+    start_time = time.time()
+    result, lines = run([sys.executable, '-c', HANGING_SCRIPT],
+                        inactivity_timeout=1)
+    assert time.time() - start_time < 30
+    assert result.end_reason == process_runner.INACTIVE
+    assert result.return_code != 0
+    assert result.num_killed >= 2
+    grandchild_pid = int(lines[0])
+    assert grandchild_pid not in process_runner.list_processes()
+
+
+def test_run_process_wall_clock_timeout():
+    result, _ = run([
+        sys.executable, '-c',
+        'import time\nwhile True:\n  print("x", flush=True)\n  time.sleep(0.1)'
+    ], timeout=1)
+    assert result.end_reason == process_runner.TIMEOUT
@@ -0,0 +1,103 @@
+import contextlib
+import os
+
+import pytest
+
+from finance_dl import profile_maintenance
+
+
+def write_file(path, size=10):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+
+
+def make_profile(profile_dir):
+    write_file(os.path.join(profile_dir, 'Local State'))
+    write_file(os.path.join(profile_dir, 'ShaderCache', 'data_0'), 100)
+    default = os.path.join(profile_dir, 'Default')
+    write_file(os.path.join(default, 'Preferences'))
+    write_file(os.path.join(default, 'Network', 'Cookies'))
+    write_file(os.path.join(default, 'Local Storage', 'leveldb', '000003.log'))
+    write_file(os.path.join(default, 'Cache', 'Cache_Data', 'data_1'), 1000)
+    write_file(os.path.join(default, 'Service Worker', 'CacheStorage', 'x'),
+               1000)
+    write_file(os.path.join(default, 'Service Worker', 'Database', 'y'))
+    write_file(os.path.join(default, 'History'), 500)
+
+
+def list_files(root):
+    return sorted(
+        os.path.relpath(os.path.join(dirpath, name), root)
+        for dirpath, _, filenames in os.walk(root) for name in filenames)
+
+
+KEPT_FILES = [
+    os.path.join('Default', 'Local Storage', 'leveldb', '000003.log'),
+    os.path.join('Default', 'Network', 'Cookies'),
+    os.path.join('Default', 'Preferences'),
+    os.path.join('Default', 'Service Worker', 'Database', 'y'),
+    'Local State',
+]
+
+
+def test_compact_profile_keeps_login_state(tmp_path):
+    profile_dir = str(tmp_path / 'profile')
+    make_profile(profile_dir)
+    size_before, size_after = profile_maintenance.compact_profile(profile_dir)
+    assert size_before == 2650
+    assert size_after == 50
+    assert list_files(profile_dir) == KEPT_FILES
+
+
+def test_compact_profile_refuses_profile_in_use(tmp_path):
+    profile_dir = str(tmp_path / 'profile')
+    make_profile(profile_dir)
+    os.symlink('host-1234', os.path.join(profile_dir, 'SingletonLock'))
+    with pytest.raises(RuntimeError):
+        profile_maintenance.compact_profile(profile_dir)
+
+
+def test_snapshot_and_restore(tmp_path):
+    profile_dir = str(tmp_path / 'profile')
+    snapshot_path = str(tmp_path / 'snapshot.tar.gz')
+    make_profile(profile_dir)
+    profile_maintenance.snapshot_profile(profile_dir, snapshot_path)
+    write_file(os.path.join(profile_dir, 'Default', 'Network', 'Cookies'), 3)
+    write_file(os.path.join(profile_dir, 'Default', 'Extra'))
+    profile_maintenance.restore_profile(snapshot_path, profile_dir)
+    assert list_files(profile_dir) == KEPT_FILES
+    with open(os.path.join(profile_dir, 'Default', 'Network', 'Cookies'),
+              'rb') as f:
+        assert f.read() == b'x' * 10
+    assert sorted(os.listdir(str(tmp_path))) == ['profile', 'snapshot.tar.gz']
+
+
+def test_measure_startup_time_uses_copy(tmp_path, monkeypatch):
+    from finance_dl import scrape_lib
+    profile_dir = str(tmp_path / 'profile')
+    make_profile(profile_dir)
+    launched_dirs = []
+
+    class FakeDriver(object):
+        def get(self, url):
+            pass
+
+    class FakeScraper(object):
+        driver = FakeDriver()
+
+    @contextlib.contextmanager
+    def temp_scraper(scraper_type, profile_dir, **kwargs):
+        launched_dirs.append(profile_dir)
+        assert list_files(profile_dir) == list_files(str(tmp_path /
+                                                         'profile'))
+        # Chrome repopulates caches on startup.
+        write_file(os.path.join(profile_dir, 'Default', 'Cache', 'new'))
+        yield FakeScraper()
+
+    monkeypatch.setattr(scrape_lib, 'temp_scraper', temp_scraper)
+    profile_maintenance.measure_startup_time(profile_dir)
+    assert launched_dirs[0] != profile_dir
+    assert not os.path.exists(launched_dirs[0])
+    assert not os.path.exists(
+        os.path.join(profile_dir, 'Default', 'Cache', 'new'))
@@ -0,0 +1,31 @@
+from finance_dl import refresh
+
+DAY = refresh.DAY
+
+
+def test_get_arrivals_merges_nearby_times():
+    assert refresh.get_arrivals([5 * DAY, 0, 60, 30 * DAY + 3600,
+                                 30 * DAY]) == [0, 5 * DAY, 30 * DAY]
+
+
+def test_estimate_cadence():
+    assert refresh.estimate_cadence([0, 30 * DAY]) is None
+    assert refresh.estimate_cadence([0, 30 * DAY, 61 * DAY,
+                                     91 * DAY]) == 30 * DAY
+
+
+def test_get_next_due():
+    assert refresh.get_next_due(None, None, None) == float('-inf')
+    # Without a known cadence, configurations are due daily.
+    assert refresh.get_next_due(100 * DAY, None, None) == 101 * DAY
+    # Monthly data is not checked again until shortly before it is expected.
+    assert refresh.get_next_due(100 * DAY, 100 * DAY,
+                                30 * DAY) == 124 * DAY
+    # Once it is expected, it is checked daily.
+    assert refresh.get_next_due(125 * DAY, 100 * DAY,
+                                30 * DAY) == 126 * DAY
+    # Long cadences are capped.
+    assert refresh.get_next_due(100 * DAY, 100 * DAY,
+                                365 * DAY) == 131 * DAY
+    assert refresh.get_next_due(100 * DAY, 100 * DAY, 30 * DAY,
+                                interval_override=7 * DAY) == 107 * DAY
@@ -0,0 +1,104 @@
+import asyncio
+import contextlib
+import http.server
+import json
+import socket
+import threading
+
+from finance_dl import remote_pool
+
+
+class StatusHandler(http.server.BaseHTTPRequestHandler):
+    ready = True
+
+    def do_GET(self):
+        body = json.dumps({'value': {'ready': self.ready}}).encode('utf-8')
+        self.send_response(200 if self.path == '/wd/hub/status' else 404)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve_status(ready=True):
+    handler = type('Handler', (StatusHandler, ), {'ready': ready})
+    server = http.server.HTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        yield 'http://127.0.0.1:%d/wd/hub' % server.server_port
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+
+
+def get_unused_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return 'http://127.0.0.1:%d/wd/hub' % sock.getsockname()[1]
+
+
+def test_remote_pool_health_check():
+    with serve_status() as healthy, serve_status(ready=False) as busy:
+        unreachable = get_unused_url()
+        assert remote_pool.check_endpoint(healthy)
+        assert not remote_pool.check_endpoint(busy)
+        assert not remote_pool.check_endpoint(unreachable)
+        pool = remote_pool.RemotePool([healthy, unreachable], slots=2)
+        pool.check_health()
+        assert pool.get_num_healthy() == 1
+        assert pool.capacity == 2
+        assert pool.uses_pool(unreachable)
+        assert pool.uses_pool(remote_pool.POOL)
+        assert not pool.uses_pool(None)
+
+
+def test_remote_pool_lease():
+    with serve_status() as first, serve_status() as second:
+        unreachable = get_unused_url()
+        pool = remote_pool.RemotePool([first, second, unreachable], slots=1,
+                                      health_check_interval=1000)
+        pool.check_health()
+        order = []
+
+        async def use(name):
+            async with pool.lease_async() as lease:
+                urls = lease.environ()[remote_pool.ENDPOINTS_ENV_VAR].split()
+                # The other healthy endpoint is the fallback.
+                assert sorted(urls) == sorted([first, second])
+                order.append((name, 'start', urls[0]))
+                await asyncio.sleep(0.05)
+                order.append((name, 'end', urls[0]))
+                lease.failed = name == 'c'
+
+        async def run():
+            await asyncio.gather(use('a'), use('b'), use('c'))
+
+        asyncio.run(run())
+        # Only two configurations run at once, one on each endpoint.
+        assert [event[:2] for event in order[:2]] == [('a', 'start'),
+                                                     ('b', 'start')]
+        assert {order[0][2], order[1][2]} == {first, second}
+        assert order.index(('c', 'start', order[-1][2])) > 2
+        assert sum(endpoint.num_leases for endpoint in pool.endpoints) == 3
+        assert sum(endpoint.num_failures for endpoint in pool.endpoints) == 1
+        # Still healthy after the failure.
+        assert pool.get_num_healthy() == 2
+
+
+def test_remote_pool_no_healthy_endpoint():
+    unreachable = get_unused_url()
+    pool = remote_pool.RemotePool([unreachable])
+    pool.check_health()
+
+    async def run():
+        async with pool.lease_async() as lease:
+            return lease.endpoint, lease.environ()
+
+    endpoint, environ = asyncio.run(run())
+    assert endpoint is None
+    assert environ == {remote_pool.ENDPOINTS_ENV_VAR: unreachable}
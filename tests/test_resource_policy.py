@@ -0,0 +1,35 @@
+import pytest
+
+from finance_dl.resource_policy import get_policy
+
+
+def test_get_policy_preset():
+    policy = get_policy('lean')
+    assert policy.name == 'lean'
+    assert '*.png' in policy.get_blocked_urls()
+    assert '*.png?*' in policy.get_blocked_urls()
+    assert get_policy('none').get_blocked_urls() == []
+
+
+def test_get_policy_dict_extends_base():
+    policy = get_policy({
+        'base': 'lean',
+        'block_types': ['font'],
+        'page_load_strategy': 'eager',
+    })
+    assert policy.name == 'custom'
+    assert policy.page_load_strategy == 'eager'
+    assert '*.woff2' in policy.get_blocked_urls()
+    assert '*.png' not in policy.get_blocked_urls()
+    assert '*://*.doubleclick.net/*' in policy.get_blocked_urls()
+
+
+def test_get_policy_rejects_invalid_values():
+    with pytest.raises(ValueError):
+        get_policy('unknown')
+    with pytest.raises(ValueError):
+        get_policy({'block_types': ['stylesheet']})
+    with pytest.raises(ValueError):
+        get_policy({'page_load_strategy': 'none'})
+    with pytest.raises(ValueError):
+        get_policy({'blocked': []})
@@ -0,0 +1,32 @@
+from finance_dl.run_history import PARTIAL, RunHistory, is_failure, percentile
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+
+
+def test_run_history_stats(tmp_path):
+    history = RunHistory(str(tmp_path / 'history.sqlite3'))
+    for i, status in enumerate(['SUCCESS', 'SUCCESS', 'FAILED', 'SUCCESS']):
+        run_id = history.start_run('amazon', 1000.0 * i)
+        history.finish_run(run_id, 1000.0 * i + 10 * (i + 1), status,
+                           return_code=0 if status == 'SUCCESS' else 1,
+                           peak_rss_kb=1024, files_written=2,
+                           bytes_written=100, retries=0)
+    # Unfinished runs are ignored.
+    history.start_run('amazon', 5000.0)
+    stats = history.get_stats('amazon')
+    assert stats.num_runs == 4
+    assert stats.failure_rate == 0.25
+    assert stats.p50_duration == 20
+    assert stats.p95_duration == 40
+    assert history.get_expected_durations(['amazon', 'ofx']) == {'amazon': 20}
+
+
+def test_run_history_partial_is_not_failure():
+    assert is_failure('FAILED with return code 1')
+    assert is_failure(None)
+    assert not is_failure('SUCCESS')
+    assert not is_failure(PARTIAL + ': 12 invoices remaining')
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from finance_dl.scheduler import (ResourceScheduler, get_config_resources,
+                                  get_literal_spec)
+
+
+def test_get_config_resources():
+    assert get_config_resources({}) == {'browser': 1, 'memory_mb': 500}
+    assert get_config_resources({
+        'connect_remote': 'http://chrome:4444/wd/hub',
+        'institution': 'paypal',
+        'resources': {'memory_mb': 800},
+    }) == {
+        'remote:http://chrome:4444/wd/hub': 1,
+        'institution:paypal': 1,
+    }
+
+
+def test_get_literal_spec():
+    def get_password():
+        raise AssertionError('configuration function was called')
+
+    def CONFIG_remote():
+        return dict(
+            module='finance_dl.amazon',
+            credentials={'password': get_password()},
+            output_directory=os.path.join('data', 'amazon'),
+            connect_remote='http://chrome:4444/wd/hub',
+            resources={'memory_mb': 800},
+        )
+
+    def CONFIG_display():
+        return {'module': 'finance_dl.ofx', 'cron': '0 6 * * *'}
+
+    assert get_literal_spec(CONFIG_remote) == {
+        'module': 'finance_dl.amazon',
+        'connect_remote': 'http://chrome:4444/wd/hub',
+        'resources': {'memory_mb': 800},
+    }
+    assert get_literal_spec(CONFIG_display) == {
+        'module': 'finance_dl.ofx',
+        'cron': '0 6 * * *',
+    }
+    assert get_literal_spec(lambda: None) == {}
+
+
+def run_jobs(scheduler, jobs):
+    running = set()
+    overlaps = []
+    order = []
+
+    async def func(job, resources):
+        order.append(job)
+        overlaps.append(frozenset(running | {job}))
+        running.add(job)
+        await asyncio.sleep(0.02)
+        running.remove(job)
+
+    asyncio.run(scheduler.run(jobs, func))
+    return order, overlaps
+
+
+def test_scheduler_shares_remote_slot_and_runs_others_in_parallel():
+    remote = {'remote:http://chrome': 1}
+    scheduler = ResourceScheduler({}, prefix_limits={'remote:': 1},
+                                  max_parallel=4)
+    order, overlaps = run_jobs(scheduler, [
+        ('amazon', remote),
+        ('paypal', remote),
+        ('ofx', {}),
+        ('gemini', {}),
+    ])
+    assert order[:3] == ['amazon', 'ofx', 'gemini']
+    assert order[3] == 'paypal'
+    assert not any({'amazon', 'paypal'} <= s for s in overlaps)
+    assert any({'amazon', 'ofx', 'gemini'} <= s for s in overlaps)
+
+
+def test_scheduler_limits_memory_and_runs_oversized_job_alone():
+    scheduler = ResourceScheduler({'memory_mb': 1000}, max_parallel=4)
+    order, overlaps = run_jobs(scheduler, [
+        ('a', {'memory_mb': 600}),
+        ('b', {'memory_mb': 600}),
+        ('c', {'memory_mb': 2000}),
+        ('d', {'memory_mb': 300}),
+    ])
+    assert order == ['a', 'd', 'b', 'c']
+    assert all(len(s) == 1 for s, job in zip(overlaps, order) if job == 'c')
+    assert not any({'a', 'b'} <= s for s in overlaps)
+
+
+def test_get_module_resources_does_not_import_module():
+    # The resources of `finance_dl.ofx` are read from its source, without
+    # importing `ofxclient`.
+    code = ('import sys\n'
+            'from finance_dl.scheduler import get_module_resources\n'
+            'print(get_module_resources("finance_dl.ofx"))\n'
+            'print(get_module_resources("finance_dl.amazon"))\n'
+            'print(sorted(m for m in sys.modules\n'
+            '             if m in ("finance_dl.ofx", "finance_dl.amazon")))\n')
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     cwd=package_dir, universal_newlines=True)
+    assert output.splitlines() == ["{'memory_mb': 100}", 'None', '[]']
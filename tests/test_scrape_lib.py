@@ -0,0 +1,237 @@
+import contextlib
+import time
+import urllib.parse
+
+import pytest
+from selenium.common.exceptions import JavascriptException, TimeoutException
+from selenium.webdriver.common.by import By
+
+from finance_dl import scrape_lib
+from finance_dl.scrape_lib import extract_table_data_from_rows
+
+
+def test_extract_table_data_from_rows_uses_header_names():
+    rows = [
+        [('Date ', None), ('Amount', None)],
+        [('2020-01-01', None), ('$1.00', None)],
+        [('2020-01-02', None), ('', None)],
+    ]
+    assert extract_table_data_from_rows(rows, ['Date', 'Amount']) == [
+        [('Date', '2020-01-01'), ('Amount', '$1.00')],
+        [('Date', '2020-01-02')],
+    ]
+
+
+def test_extract_table_data_from_rows_handles_colspan_and_nested_headers():
+    rows = [
+        [('Balance', '2')],
+        [('Start', None), ('End', None)],
+        [('1', None), ('2', None)],
+        [('3', '2')],
+    ]
+    assert extract_table_data_from_rows(rows, ['Balance', 'Start', 'End']) == [
+        [('Balance:Start', '1'), ('Balance:End', '2')],
+        [('Balance:Start:Balance:End', '3')],
+    ]
+
+
+class FakeTimeouts(object):
+    script = scrape_lib.DEFAULT_SCRIPT_TIMEOUT
+
+
+class FakeWaitDriver(object):
+    """Returns `results` from `execute_async_script` in turn, then times out."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.timeouts = FakeTimeouts()
+        self.script_timeouts = []
+
+    def set_script_timeout(self, timeout):
+        self.script_timeouts.append(timeout)
+        self.timeouts.script = timeout
+
+    def execute_async_script(self, script, args, timeout_ms):
+        if not self.results:
+            time.sleep(timeout_ms / 1000)
+            return ['timeout', None]
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def make_wait_scraper(results):
+    scraper = scrape_lib.Scraper.__new__(scrape_lib.Scraper)
+    scraper.driver = FakeWaitDriver(results)
+    scraper.wait_records = []
+    return scraper
+
+
+def test_wait_for_script_retries_after_navigation():
+    scraper = make_wait_scraper([
+        JavascriptException(
+            'javascript error: document unloaded while waiting for result'),
+        ['done', 'value'],
+    ])
+    assert scraper.wait_for_script('return 1;') == 'value'
+    assert scraper.wait_records[0].round_trips == 2
+    assert scraper.driver.script_timeouts == [35, 30]
+
+
+def test_wait_for_script_raises_condition_errors():
+    scraper = make_wait_scraper(
+        [['error', 'ReferenceError: foo is not defined']])
+    with pytest.raises(JavascriptException, match='foo is not defined'):
+        scraper.wait_for_script('return foo;')
+    assert scraper.wait_records[0].round_trips == 1
+    assert scraper.driver.timeouts.script == 30
+
+
+def test_wait_for_script_raises_script_errors():
+    scraper = make_wait_scraper(
+        [JavascriptException('javascript error: Unexpected identifier')])
+    with pytest.raises(JavascriptException, match='Unexpected identifier'):
+        scraper.wait_for_script('return foo bar;')
+    assert scraper.driver.timeouts.script == 30
+
+
+def test_wait_for_script_times_out():
+    scraper = make_wait_scraper([])
+    with pytest.raises(TimeoutException):
+        scraper.wait_for_script('return false;', timeout=0.1)
+    assert scraper.wait_records[0].round_trips >= 1
+    assert scraper.driver.timeouts.script == 30
+
+
+class FakeRunScraper(object):
+    def __init__(self, failures, healthy):
+        self.failures = failures
+        self.healthy = healthy
+
+    def run(self):
+        if self.failures:
+            raise self.failures.pop(0)
+
+    def is_session_healthy(self):
+        return self.healthy
+
+    def discard_downloads(self):
+        pass
+
+    def log_wait_summary(self):
+        pass
+
+    def log_page_load_summary(self):
+        pass
+
+
+def test_run_with_scraper_retries_launch_failures(monkeypatch, tmp_path):
+    launches = []
+    failures = [RuntimeError('failed')]
+
+    @contextlib.contextmanager
+    def temp_scraper(scraper_class, **kwargs):
+        launches.append(kwargs)
+        if len(launches) == 1:
+            raise RuntimeError('chromedriver failed to start')
+        yield FakeRunScraper(failures, healthy=False)
+
+    monkeypatch.setattr(scrape_lib, 'temp_scraper', temp_scraper)
+    scrape_lib.run_with_scraper(None, num_tries=3, headless=True,
+                                checkpoint_path=str(tmp_path / 'journal'))
+    # One failed launch, then a run that failed and relaunched the browser.
+    assert len(launches) == 3
+    assert all(kwargs['headless'] for kwargs in launches)
+
+    del launches[:]
+    with pytest.raises(RuntimeError, match='chromedriver'):
+        scrape_lib.run_with_scraper(None, num_tries=1, headless=True,
+                                    checkpoint_path=str(tmp_path / 'journal'))
+    assert len(launches) == 1
+
+
+@pytest.fixture(scope='module')
+def browser():
+    """Headless browser, if Chrome and chromedriver are available."""
+    with contextlib.ExitStack() as stack:
+        try:
+            scraper = stack.enter_context(
+                scrape_lib.temp_scraper(scrape_lib.Scraper))
+        except Exception as e:
+            pytest.skip('Cannot launch Chrome: %r' % e)
+        yield scraper
+
+
+def load_html(scraper, html):
+    scraper.driver.get('data:text/html;charset=utf-8,' +
+                       urllib.parse.quote(html))
+
+
+VISIBILITY_HTML = """
+<div class="x">shown</div>
+<div class="x" style="display: none">display none</div>
+<div class="x" style="visibility: hidden">visibility hidden</div>
+<div class="x" style="visibility: hidden"><span class="x"
+  style="visibility: visible">visible child</span></div>
+<div class="x" style="opacity: 0">transparent</div>
+<div class="x" style="width: 0; height: 0">zero size</div>
+<div class="x" style="width: 0; height: 0; overflow: visible">
+  <span>overflowing</span></div>
+<div class="x" style="width: 0; height: 0; overflow: hidden">
+  <span>clipped</span></div>
+<div class="x" style="position: absolute; left: -1000px">off screen</div>
+<details><summary class="x">summary</summary><div class="x">closed</div>
+</details>
+"""
+
+
+def test_wait_for_visible_matches_is_displayed(browser):
+    load_html(browser, VISIBILITY_HTML)
+    expected = [
+        x for x in browser.driver.find_elements(By.CLASS_NAME, 'x')
+        if x.is_displayed()
+    ]
+    assert browser.wait_for_visible(By.CSS_SELECTOR, '.x') == expected
+
+
+TABLE_HTML = """
+<table id="t">
+<thead><tr><th colspan="2">Balance&nbsp;due</th><th>  Notes  </th></tr></thead>
+<tbody>
+<tr><td>  a   b  </td><td style="text-transform: uppercase">upper</td>
+    <td style="text-transform: capitalize">two words</td></tr>
+<tr><td><p>para 1</p><p>para 2</p></td><td>line<br>break<br><br>x</td>
+    <td><pre>  pre
+  formatted </pre></td></tr>
+<tr><td style="display: none">hidden</td><td style="visibility: hidden">
+    gone <span style="visibility: visible">kept</span></td>
+    <td style="opacity: 0">transparent</td></tr>
+<tr><td><div style="width: 0; height: 0">overflow</div></td>
+    <td><div style="height: 0; overflow: hidden">clipped</div></td>
+    <td>zero&#8203;width<span style="display: block">block</span>after</td></tr>
+<tr><td style="white-space: nowrap">no
+wrap</td><td><span style="display: inline-block">ib</span> <b>bold</b></td>
+    <td>&nbsp;&nbsp;nbsp&nbsp;</td></tr>
+</tbody>
+</table>
+"""
+
+
+def test_get_table_rows_matches_element_text(browser):
+    load_html(browser, TABLE_HTML)
+    table = browser.driver.find_element(By.ID, 't')
+    assert scrape_lib.get_table_rows(table) == (
+        scrape_lib.get_table_rows_by_element(table))
+
+
+def test_find_table_by_headers_matches_is_displayed(browser):
+    load_html(
+        browser, TABLE_HTML + '<table style="display: none"><tr><td>Notes'
+        '</td></tr></table><table><tr><td>Notes</td></tr></table>')
+    expected = set(
+        x for x in browser.driver.find_elements(
+            By.XPATH, "//text()[contains(.,'Notes')]/ancestor::*[self::table][1]")
+        if x.is_displayed())
+    assert scrape_lib.find_table_by_headers(browser, ['Notes']) == expected
+    assert len(expected) == 2
@@ -0,0 +1,21 @@
+import pytest
+
+from finance_dl.time_budget import BudgetExhausted, TimeBudget
+
+
+def test_time_budget_unlimited():
+    budget = TimeBudget()
+    assert not budget.is_exhausted()
+    budget.check(10, 'invoices')
+
+
+def test_time_budget_exhausted():
+    budget = TimeBudget(0)
+    assert budget.is_exhausted()
+    # No work left.
+    budget.check(0, 'invoices')
+    with pytest.raises(BudgetExhausted) as e:
+        budget.check(3, 'invoices')
+    assert e.value.remaining == 3
+    assert str(e.value) == '3 invoices remaining'
+    assert not TimeBudget(3600).is_exhausted()
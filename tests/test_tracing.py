@@ -0,0 +1,67 @@
+import contextlib
+import json
+import time
+
+from finance_dl import tracing
+
+
+class FakeExecutor:
+    def execute(self, command, params):
+        return {'value': command}
+
+
+class FakeDriver:
+    def __init__(self):
+        self.command_executor = FakeExecutor()
+
+
+def test_command_tracer_records_commands_and_writes_chrome_trace(tmp_path):
+    tracer = tracing.CommandTracer()
+    driver = FakeDriver()
+    tracer.install(driver)
+    assert driver.command_executor.execute('findElements', {}) == {
+        'value': 'findElements'
+    }
+    assert [r.command for r in tracer.records] == ['findElements']
+
+    trace_path = tmp_path / 'trace.json'
+    tracer.write_chrome_trace(str(trace_path))
+    events = json.loads(trace_path.read_text())['traceEvents']
+    assert [(e['name'], e['ph']) for e in events] == [('findElements', 'X')]
+
+
+class FakeScraper:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def wait_for_script(self, condition):
+        time.sleep(0.05)
+        return self.driver.command_executor.execute('executeAsyncScript', {})
+
+    def wait_for_visible(self, locator):
+        return self.wait_for_script(locator)
+
+    @contextlib.contextmanager
+    def wait_for_page_load(self):
+        yield
+        time.sleep(0.05)
+
+
+def test_command_tracer_records_wall_time_of_waits():
+    tracer = tracing.CommandTracer()
+    driver = FakeDriver()
+    scraper = FakeScraper(driver)
+    tracer.install(driver, scraper=scraper)
+    assert scraper.wait_for_visible('a') == {'value': 'executeAsyncScript'}
+    with scraper.wait_for_page_load():
+        time.sleep(0.05)
+    driver.command_executor.execute('click', {})
+
+    # Nested waits are only counted once, and the body of
+    # `wait_for_page_load` is not counted as waiting.
+    assert [span.wait for span in tracer.wait_spans] == [
+        'wait_for_visible', 'wait_for_page_load'
+    ]
+    assert all(0.05 <= span.duration < 1 for span in tracer.wait_spans)
+    assert [r.command for r in tracer.records] == ['executeAsyncScript', 'click']
+    tracer.log_summary()
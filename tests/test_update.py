@@ -0,0 +1,174 @@
+import argparse
+import os
+import sys
+import time
+
+import pytest
+
+from finance_dl import remote_pool
+from finance_dl import update
+from finance_dl import work_queue
+
+CONFIG_MODULE = r'''
+def CONFIG_a(): return dict(module='job_module')
+def CONFIG_b(): return dict(module='job_module')
+'''
+
+
+@pytest.fixture
+def config_module(tmp_path, monkeypatch):
+    """Writes `update_test_config.py` and returns a function to rewrite it."""
+    path = tmp_path / 'update_test_config.py'
+    (tmp_path / 'job_module.py').write_text('def run(**kwargs): pass\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(sys, 'dont_write_bytecode', True)
+    num_writes = 0
+
+    def write(source):
+        nonlocal num_writes
+        path.write_text(source)
+        # Ensure that each version has a distinct modification time.
+        mtime = time.time() + num_writes
+        os.utime(str(path), (mtime, mtime))
+        num_writes += 1
+
+    write(CONFIG_MODULE)
+    yield write
+    sys.modules.pop('update_test_config', None)
+
+
+def make_daemon(tmp_path, **kwargs):
+    args = argparse.Namespace(config_module='update_test_config',
+                              log_dir=str(tmp_path), config=[],
+                              fixed_interval=False, retry_interval=60 * 60)
+    vars(args).update(kwargs)
+    return update.DaemonCommand(args)
+
+
+def test_config_spec_does_not_call_configuration(tmp_path, config_module):
+    config_module(r'''
+import os
+
+def get_password():
+    raise AssertionError('configuration function was called')
+
+def CONFIG_a():
+    return dict(module='job_module', password=get_password(),
+                output_directory=os.path.join('data', 'a'),
+                institution='bank')
+
+SCHEDULE_a = dict(output_directory='data/a', cron='@daily')
+''')
+    daemon = make_daemon(tmp_path)
+    assert daemon.get_config_spec('a') == dict(
+        module='job_module', institution='bank', output_directory='data/a',
+        cron='@daily')
+    assert daemon.get_config_resources('a') == dict(
+        browser=1, memory_mb=500, **{'institution:bank': 1})
+
+
+def test_daemon_reloads_changed_config_module(tmp_path, config_module):
+    daemon = make_daemon(tmp_path)
+    assert sorted(daemon.get_configs()) == ['a', 'b']
+    assert not daemon.reload_config_module()
+
+    config_module(r'''
+def CONFIG_a(): return dict(module='job_module', cron='0 6 * * *')
+def CONFIG_c(): return dict(module='job_module')
+''')
+    assert daemon.reload_config_module()
+    assert sorted(daemon.get_configs()) == ['a', 'c']
+    assert daemon.get_config_spec('a')['cron'] == '0 6 * * *'
+
+    # A module that fails to load leaves the previous configurations.
+    config_module('def CONFIG_d(:\n')
+    assert not daemon.reload_config_module()
+    assert sorted(daemon.get_configs()) == ['a', 'c']
+
+
+def test_daemon_skips_updated_and_recently_failed_configs(
+        tmp_path, config_module):
+    daemon = make_daemon(tmp_path, retry_interval=100)
+    with open(daemon.get_last_update_path('a'), 'w'):
+        pass
+    assert daemon.get_due_configs(['a', 'b'], verbose=False) == ['b']
+
+    cur_time = time.time()
+    run_id = daemon.history.start_run('b', cur_time - 10)
+    daemon.history.finish_run(run_id, cur_time - 5, 'FAILED with return code 1')
+    assert daemon.is_retry_pending('b', cur_time)
+    assert not daemon.is_retry_pending('b', cur_time + 100)
+    assert not daemon.is_retry_pending('a', cur_time)
+
+
+@pytest.mark.parametrize('fixed_interval', [False, True])
+def test_cron_schedule_applies_with_fixed_interval(tmp_path, config_module,
+                                                   fixed_interval):
+    last_update = time.time() - 2 * 24 * 60 * 60
+    # Yearly, about six months from now.
+    month = time.localtime(last_update + 180 * 24 * 60 * 60).tm_mon
+    config_module(r'''
+def CONFIG_a(): return dict(module='job_module', cron='0 0 1 %d *')
+def CONFIG_b(): return dict(module='job_module')
+''' % month)
+    daemon = make_daemon(tmp_path, fixed_interval=fixed_interval)
+    for config in ['a', 'b']:
+        path = daemon.get_last_update_path(config)
+        with open(path, 'w'):
+            pass
+        os.utime(path, (last_update, last_update))
+    assert daemon.get_next_due('a', last_update) > last_update + 24 * 60 * 60
+    assert daemon.get_due_configs(['a', 'b'], verbose=False) == ['b']
+
+
+@pytest.mark.parametrize('extra_args,expected', [
+    ([], ['b']),
+    (['--fixed-interval'], ['b']),
+    (['--force'], ['a', 'b']),
+])
+def test_enqueue_skips_recently_updated_configs(tmp_path, config_module,
+                                                monkeypatch, extra_args,
+                                                expected):
+    log_dir = tmp_path / 'logs'
+    log_dir.mkdir()
+    (log_dir / 'a.lastupdate').write_text('')
+    monkeypatch.setattr(sys, 'argv', [
+        'finance_dl.update', '--config-module', 'update_test_config',
+        '--log-dir', str(log_dir), 'enqueue', '--all'
+    ] + extra_args)
+    update.main()
+    queue = work_queue.WorkQueue(str(log_dir / 'queue.sqlite3'))
+    assert sorted(queue.get_entries()) == expected
+
+
+def test_worker_shares_remote_pool_capacity_across_hosts(
+        tmp_path, config_module, monkeypatch):
+    config_module(r'''
+def CONFIG_a(): return dict(module='job_module', connect_remote='pool')
+def CONFIG_b(): return dict(module='job_module', connect_remote='pool')
+def CONFIG_c(): return dict(module='job_module', connect_remote='http://a')
+def CONFIG_d(): return dict(module='job_module', connect_remote='http://x')
+def CONFIG_e(): return dict(module='job_module', connect_remote='http://x')
+''')
+    monkeypatch.setattr(sys, 'argv', [
+        'finance_dl.update', '--config-module', 'update_test_config',
+        '--log-dir', str(tmp_path), 'enqueue', '--all'
+    ])
+    update.main()
+
+    workers = []
+    for _ in range(2):
+        worker = update.WorkerCommand(
+            argparse.Namespace(config_module='update_test_config',
+                               log_dir=str(tmp_path), lease=60,
+                               institution_limit=1, remote_slots=1))
+        worker.remote_pool = remote_pool.RemotePool(['http://a', 'http://b'])
+        workers.append(worker)
+    claimed = [workers[0].claim(), workers[1].claim(), workers[0].claim(),
+               workers[1].claim(), workers[0].claim()]
+    # Two configurations use the pool of two endpoints at once, including
+    # those naming an endpoint of the pool, and one uses the endpoint outside
+    # the pool.
+    assert sorted(config for config in claimed if config is not None) == [
+        'a', 'b', 'd'
+    ]
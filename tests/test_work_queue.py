@@ -0,0 +1,91 @@
+import os
+
+from finance_dl import work_queue
+from finance_dl.work_queue import WorkQueue
+
+LEASE = 60
+
+
+def make_queue(tmpdir):
+    return WorkQueue(os.path.join(str(tmpdir), 'queue.sqlite3'))
+
+
+def test_work_queue_distinct_claims(tmpdir):
+    queue = make_queue(tmpdir)
+    assert queue.enqueue(['a', 'b', 'c'], priorities={'b': 10, 'c': 20},
+                         now=0) == ['a', 'b', 'c']
+    # Already pending.
+    assert queue.enqueue(['a'], now=1) == []
+    # Configurations without a priority first, then the longest first.
+    assert queue.claim('w1', LEASE, now=0) == 'a'
+    assert queue.claim('w2', LEASE, now=0) == 'c'
+    assert queue.claim('w1', LEASE, now=0) == 'b'
+    assert queue.claim('w2', LEASE, now=0) is None
+    assert queue.count_unfinished() == 3
+    assert queue.complete('w1', 'a', 'SUCCESS')
+    entries = queue.get_entries()
+    assert entries['a'].state == work_queue.DONE
+    assert entries['a'].status == 'SUCCESS'
+    assert entries['c'].worker == 'w2'
+    assert queue.count_unfinished() == 2
+    # Done configurations may be enqueued again.
+    assert queue.enqueue(['a'], now=2) == ['a']
+
+
+def test_work_queue_lease_expiry(tmpdir):
+    queue = make_queue(tmpdir)
+    queue.enqueue(['a'], now=0)
+    assert queue.claim('w1', LEASE, now=0) == 'a'
+    # Heartbeats keep the lease.
+    assert queue.heartbeat('w1', ['a'], LEASE, now=50) == []
+    assert queue.claim('w2', LEASE, now=100) is None
+    # The worker died: another worker claims the configuration again.
+    assert queue.claim('w2', LEASE, now=200) == 'a'
+    assert queue.heartbeat('w1', ['a'], LEASE, now=210) == ['a']
+    assert not queue.complete('w1', 'a', 'SUCCESS')
+    assert queue.get_entries()['a'].state == work_queue.CLAIMED
+    # After `MAX_ATTEMPTS` expired leases, the configuration fails.
+    assert queue.claim('w3', LEASE, now=300) == 'a'
+    assert queue.claim('w3', LEASE, now=400) is None
+    entry = queue.get_entries()['a']
+    assert entry.state == work_queue.DONE
+    assert entry.attempts == work_queue.MAX_ATTEMPTS
+    assert entry.status.startswith('FAILED')
+
+
+def test_work_queue_shared_resources(tmpdir):
+    queue = make_queue(tmpdir)
+    resources = {
+        'a': {'institution:bank': 1, 'memory': 500},
+        'b': {'institution:bank': 1},
+        'c': {'remote:grid': 1},
+        'd': {'remote:grid': 1},
+    }
+    queue.enqueue(['a', 'b', 'c', 'd'], resources=resources, now=0)
+    limits = {'remote:': 2}
+    assert queue.claim('w1', LEASE, limits, now=0) == 'a'
+    assert queue.claim('w2', LEASE, limits, now=0) == 'c'
+    assert queue.claim('w2', LEASE, limits, now=0) == 'd'
+    assert queue.claim('w2', LEASE, limits, now=0) is None
+    queue.complete('w1', 'a', 'SUCCESS')
+    assert queue.claim('w2', LEASE, limits, now=0) == 'b'
+
+
+def test_work_queue_shared_resource_aliases(tmpdir):
+    queue = make_queue(tmpdir)
+    resources = {
+        'a': {'remote:pool': 1},
+        'b': {'remote:http://a': 1},
+        'c': {'remote:http://b': 1},
+        'd': {'remote:http://x': 1},
+    }
+    queue.enqueue(['a', 'b', 'c', 'd'], resources=resources, now=0)
+    limits = {'remote:': 1, 'remote:pool': 2}
+    aliases = {
+        'remote:http://a': 'remote:pool',
+        'remote:http://b': 'remote:pool',
+    }
+    claims = [
+        queue.claim('w', LEASE, limits, aliases, now=0) for _ in range(4)
+    ]
+    assert claims == ['a', 'b', 'd', None]
@@ -0,0 +1,99 @@
+import asyncio
+import os
+
+from finance_dl import process_runner
+from finance_dl import worker_pool
+
+JOB_MODULE = r'''
+import os, sys, time
+num_runs = 0
+def run(name, crash=False, hang=False, **kwargs):
+    global num_runs
+    num_runs += 1
+    print(name, os.getpid(), num_runs, os.environ.get('JOB_VAR'), end='')
+    if crash:
+        sys.stdout.flush()
+        os._exit(5)
+    if hang:
+        time.sleep(60)
+    if name == 'fail':
+        raise RuntimeError('failed')
+'''
+
+CONFIG_MODULE = r'''
+def CONFIG_a(): return dict(module='job_module', name='a')
+def CONFIG_b(): return dict(module='job_module', name='b')
+def CONFIG_fail(): return dict(module='job_module', name='fail')
+def CONFIG_crash(): return dict(module='job_module', name='crash', crash=True)
+def CONFIG_hang(): return dict(module='job_module', name='hang', hang=True)
+'''
+
+
+def make_pool(tmp_path, **kwargs):
+    (tmp_path / 'job_module.py').write_text(JOB_MODULE)
+    (tmp_path / 'job_config.py').write_text(CONFIG_MODULE)
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join([str(tmp_path), package_dir]))
+    return worker_pool.WorkerPool('job_config', preload=['job_module'],
+                                  env=env, **kwargs)
+
+
+def run_configs(pool, jobs):
+    async def run_all():
+        results = []
+        for config, kwargs in jobs:
+            lines = []
+            result = await pool.run(config, lines.append, **kwargs)
+            results.append((result, lines))
+        await pool.close()
+        return results
+
+    return asyncio.run(run_all())
+
+
+def test_worker_pool_reuses_worker(tmp_path):
+    pool = make_pool(tmp_path)
+    results = run_configs(pool, [
+        ('a', dict(environ={'JOB_VAR': 'x'})),
+        ('fail', {}),
+        ('b', {}),
+    ])
+    (result_a, lines_a), (result_fail, lines_fail), (result_b,
+                                                      lines_b) = results
+    assert result_a.return_code == 0
+    assert result_fail.return_code == 1
+    assert result_b.return_code == 0
+    name, pid_a, num_runs, job_var = lines_a[0].split()
+    assert (name, num_runs, job_var) == ('a', '1', 'x')
+    assert lines_fail[-1].startswith('RuntimeError')
+    # The environment of the previous configuration was restored.
+    assert lines_b[0].split()[1:] == [pid_a, '3', 'None']
+    assert pool.num_started == 1
+
+
+def test_worker_pool_replaces_crashed_worker(tmp_path):
+    pool = make_pool(tmp_path)
+    results = run_configs(pool, [('crash', {}), ('a', {})])
+    (result_crash, lines_crash), (result_a, lines_a) = results
+    assert result_crash.end_reason == process_runner.EXITED
+    assert result_crash.return_code == 5
+    assert lines_crash[0].split()[0] == 'crash'
+    assert result_a.return_code == 0
+    assert lines_a[0].split()[2] == '1'
+    assert pool.num_started == 2
+    assert pool.num_crashed == 1
+
+
+def test_worker_pool_timeout_kills_worker(tmp_path):
+    pool = make_pool(tmp_path, max_jobs_per_worker=2)
+    results = run_configs(pool, [
+        ('hang', dict(inactivity_timeout=1)),
+        ('a', {}),
+        ('b', {}),
+        ('a', {}),
+    ])
+    assert results[0][0].end_reason == process_runner.INACTIVE
+    assert [result.return_code for result, _ in results[1:]] == [0, 0, 0]
+    # One worker for `hang`, and two for the remaining configurations.
+    assert pool.num_started == 3